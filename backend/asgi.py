@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Desliga as conexões persistentes (CONN_MAX_AGE), que só valem no WSGI
+os.environ['PESSOA_ASGI'] = '1'
 
 application = get_asgi_application()
@@ -1,8 +1,96 @@
 from django.contrib import admin
-from .models import Pessoa
+from .models import Pessoa, Tarefa
+from . import estatisticas
+from . import fragmentos
+from . import mudancas
+from .cache import cache_pessoas
+from .normalizacao import chave_cpf
 
 @admin.register(Pessoa)
 class PessoaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'cpf', 'data_nasc', 'sexo', 'altura', 'peso')
     search_fields = ('nome', 'cpf')
-    list_filter = ('sexo',) 
\ No newline at end of file
+    list_filter = ('sexo',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Mesmo caminho indexado da API: CPF pela chave numérica, nome pela
+        # busca por prefixo/trigramas em vez de ILIKE '%termo%'
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        chave = chave_cpf(search_term)
+        if chave is not None:
+            return queryset.using(fragmentos.do_cpf(chave)).filter(cpf_num=chave), False
+        return queryset.buscar(search_term), False
+
+    def get_object(self, request, object_id, from_field=None):
+        # A listagem mostra o banco padrão; a pessoa aberta pode estar em
+        # qualquer fragmento (ex.: vinda da busca por CPF)
+        if not fragmentos.ativo():
+            return super().get_object(request, object_id, from_field)
+        for alias in fragmentos.fragmentos():
+            with fragmentos.usando(alias):
+                obj = super().get_object(request, object_id, from_field)
+            if obj is not None:
+                return obj
+        return None
+
+    @staticmethod
+    def _fragmento(obj):
+        # Banco de onde a instância foi lida; None fora do modo fragmentado
+        return obj._state.db if fragmentos.ativo() else None
+
+    def save_model(self, request, obj, form, change):
+        destino = fragmentos.do_cpf(chave_cpf(obj.cpf))
+        origem = self._fragmento(obj) if change else destino
+        if origem != destino:
+            self._mover(obj, origem, destino)
+        else:
+            # O admin já roda a alteração dentro de uma transação no default;
+            # a do fragmento é própria
+            with fragmentos.atomico(destino):
+                antigo = None
+                if change:
+                    linha = Pessoa.objects.select_for_update().filter(pk=obj.pk).values_list(*estatisticas.CAMPOS).first()
+                    antigo = estatisticas.Registro(*linha) if linha else None
+                super().save_model(request, obj, form, change)
+                estatisticas.aplicar([obj], [antigo] if antigo else [])
+        anteriores = [str(chave_cpf(form.initial['cpf']))] if change and 'cpf' in form.initial else []
+        cache_pessoas.invalidar(str(obj.cpf_num), *anteriores)
+
+    @staticmethod
+    def _mover(obj, origem, destino):
+        # CPF alterado para outro fragmento: a pessoa muda de banco com o mesmo id
+        with fragmentos.atomico(origem):
+            antiga = Pessoa.objects.select_for_update().only('id', *estatisticas.CAMPOS).get(pk=obj.pk)
+            Pessoa.objects.filter(pk=obj.pk).delete()
+            estatisticas.aplicar(removidos=[antiga])
+        with fragmentos.atomico(destino):
+            obj._state.db = None
+            obj.save(force_insert=True)
+            estatisticas.aplicar([obj])
+
+    def delete_model(self, request, obj):
+        with fragmentos.atomico(self._fragmento(obj)):
+            # Antes do delete(), que zera o id da instância
+            mudancas.registrar_exclusoes([obj])
+            super().delete_model(request, obj)
+            estatisticas.aplicar(removidos=[obj])
+        cache_pessoas.invalidar(str(obj.cpf_num))
+
+    def delete_queryset(self, request, queryset):
+        with fragmentos.atomico(queryset.db if fragmentos.ativo() else None):
+            removidas = list(queryset.select_for_update().only('id', 'cpf', 'cpf_num', *estatisticas.CAMPOS))
+            super().delete_queryset(request, queryset)
+            estatisticas.aplicar(removidos=removidas)
+            mudancas.registrar_exclusoes(removidas)
+        cache_pessoas.invalidar(*(str(p.cpf_num) for p in removidas))
+
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'progresso', 'total', 'tentativas', 'criado_em', 'concluido_em')
+    list_filter = ('estado', 'tipo')
+    # Parâmetros de um lote podem ter milhares de pessoas
+    exclude = ('parametros',)
+    readonly_fields = ('tipo', 'estado', 'tentativas', 'progresso', 'total', 'resultado', 'erro', 'trabalhador',
+                       'iniciado_em', 'concluido_em')
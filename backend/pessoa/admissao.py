@@ -0,0 +1,328 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+# Controle de admissão da API: cada processo atende no máximo
+# PESSOA_ADMISSAO[classe]['concorrencia'] requisições de cada classe ao mesmo
+# tempo; as excedentes esperam em uma fila de até 'fila' lugares por no máximo
+# 'espera' segundos. Fila cheia ou espera vencida respondem 503 na hora, em vez
+# de acumular requisições atrás do pool de conexões
+
+PREFIXO_ADMITIDO = '/api/pessoa/'
+# Rotas caras: varrem a tabela ou gravam muitas pessoas. O resto é pontual
+ROTAS_PESADAS = {
+    'pessoa-listar', 'pessoa-exportar', 'pessoa-criar-lote', 'pessoa-sincronizar',
+    'pessoa-mudancas', 'pessoa-peso-ideal-lote',
+}
+# Monitoramento continua respondendo durante a sobrecarga
+ROTAS_LIVRES = {'pessoa-cache', 'pessoa-conexoes', 'pessoa-admissao'}
+MAXIMO_CLIENTES = 100000
+
+
+class _Espera:
+    __slots__ = ('concedida', 'avisar')
+
+    def __init__(self, avisar):
+        self.concedida = False
+        self.avisar = avisar
+
+
+class Limitador:
+    def __init__(self, classe: str, concorrencia: int, fila: int, espera: float):
+        self.classe = classe
+        self.concorrencia = concorrencia
+        self.fila = fila
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._esperando: deque = deque()
+        self.em_uso = 0
+        self.admitidas = 0
+        self.rejeitadas = {'fila_cheia': 0, 'espera_esgotada': 0}
+
+    def _pedir(self, avisar) -> Tuple[Optional[bool], Optional[_Espera]]:
+        # True: admitida; False: fila cheia; None: entrou na fila
+        with self._lock:
+            if self.em_uso < self.concorrencia and not self._esperando:
+                self.em_uso += 1
+                self.admitidas += 1
+                return True, None
+            if len(self._esperando) >= self.fila:
+                self.rejeitadas['fila_cheia'] += 1
+                return False, None
+            espera = _Espera(avisar)
+            self._esperando.append(espera)
+            return None, espera
+
+    def _desistir(self, espera: _Espera, rejeitar: bool = True) -> bool:
+        # Espera vencida; se a vaga chegou nesse meio tempo, fica com ela
+        with self._lock:
+            if espera.concedida:
+                return True
+            self._esperando.remove(espera)
+            if rejeitar:
+                self.rejeitadas['espera_esgotada'] += 1
+            return False
+
+    def entrar(self) -> bool:
+        evento = threading.Event()
+        admitida, espera = self._pedir(evento.set)
+        if admitida is not None:
+            return admitida
+        evento.wait(self.espera)
+        return self._desistir(espera)
+
+    async def aentrar(self) -> bool:
+        laco = asyncio.get_running_loop()
+        futuro = laco.create_future()
+
+        def avisar():
+            laco.call_soon_threadsafe(lambda: futuro.done() or futuro.set_result(True))
+
+        admitida, espera = self._pedir(avisar)
+        if admitida is not None:
+            return admitida
+        try:
+            await asyncio.wait_for(futuro, self.espera)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Cliente desconectou: devolve a vaga se ela já tinha chegado
+            if self._desistir(espera, rejeitar=False):
+                self.sair()
+            raise
+        return self._desistir(espera)
+
+    def sair(self) -> None:
+        # A vaga passa direto para o primeiro da fila, por ordem de chegada
+        with self._lock:
+            if self._esperando:
+                espera = self._esperando.popleft()
+                espera.concedida = True
+                self.admitidas += 1
+                espera.avisar()
+            else:
+                self.em_uso -= 1
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'concorrencia': self.concorrencia,
+                'fila': self.fila,
+                'em_uso': self.em_uso,
+                'aguardando': len(self._esperando),
+                'admitidas': self.admitidas,
+                'rejeitadas': dict(self.rejeitadas),
+            }
+
+
+class BaldeFichas:
+    # Um balde por cliente, com até rajada fichas repostas a taxa por segundo;
+    # os clientes mais antigos saem do mapa quando ele passa de MAXIMO_CLIENTES
+    def __init__(self, taxa: float, rajada: float):
+        self.taxa = taxa
+        self.rajada = rajada
+        self._lock = threading.Lock()
+        self._baldes: OrderedDict = OrderedDict()
+        self.rejeitadas = 0
+
+    def retirar(self, cliente: str) -> float:
+        # 0 se a requisição passa; senão, segundos até a próxima ficha
+        agora = time.monotonic()
+        with self._lock:
+            fichas, ultimo = self._baldes.pop(cliente, (self.rajada, agora))
+            fichas = min(self.rajada, fichas + (agora - ultimo) * self.taxa)
+            if fichas >= 1:
+                fichas -= 1
+                espera = 0.0
+            else:
+                self.rejeitadas += 1
+                espera = (1 - fichas) / self.taxa
+            self._baldes[cliente] = (fichas, agora)
+            if len(self._baldes) > MAXIMO_CLIENTES:
+                self._baldes.popitem(last=False)
+        return espera
+
+
+_lock = threading.Lock()
+_limitadores: Dict[str, Limitador] = {}
+_balde: Optional[BaldeFichas] = None
+
+
+def _limitador(classe: str) -> Optional[Limitador]:
+    configuracao = (getattr(settings, 'PESSOA_ADMISSAO', None) or {}).get(classe)
+    if not configuracao:
+        return None
+    parametros = (configuracao['concorrencia'], configuracao['fila'], configuracao['espera'])
+    with _lock:
+        limitador = _limitadores.get(classe)
+        # Limites alterados (ex.: override_settings): novo limitador; as
+        # requisições em curso devolvem a vaga ao antigo
+        if limitador is None or (limitador.concorrencia, limitador.fila, limitador.espera) != parametros:
+            limitador = _limitadores[classe] = Limitador(classe, *parametros)
+        return limitador
+
+
+def _balde_fichas() -> Optional[BaldeFichas]:
+    global _balde
+    taxa = getattr(settings, 'PESSOA_ADMISSAO_TAXA', None)
+    if not taxa:
+        return None
+    with _lock:
+        if _balde is None or (_balde.taxa, _balde.rajada) != tuple(taxa):
+            _balde = BaldeFichas(*taxa)
+        return _balde
+
+
+def limpar() -> None:
+    global _balde
+    with _lock:
+        _limitadores.clear()
+        _balde = None
+
+
+def estatisticas_admissao() -> Dict[str, Any]:
+    with _lock:
+        limitadores = dict(_limitadores)
+        balde = _balde
+    return {
+        'classes': {classe: limitador.estatisticas() for classe, limitador in limitadores.items()},
+        'limitadas_por_taxa': balde.rejeitadas if balde is not None else 0,
+    }
+
+
+def _cliente(request) -> str:
+    # Atrás de um proxy, PESSOA_ADMISSAO_CLIENTE aponta o cabeçalho com o IP
+    # real (ex.: HTTP_X_FORWARDED_FOR); vale o primeiro endereço da lista
+    valor = request.META.get(getattr(settings, 'PESSOA_ADMISSAO_CLIENTE', 'REMOTE_ADDR'), '')
+    return valor.split(',')[0].strip()
+
+
+def _classe(request) -> Optional[str]:
+    try:
+        correspondencia = resolve(request.path_info)
+    except Resolver404:
+        return None
+    # Adiantado para o MetricasMiddleware nomear a view das rejeitadas
+    request.resolver_match = correspondencia
+    if correspondencia.url_name in ROTAS_LIVRES:
+        return None
+    return 'pesada' if correspondencia.url_name in ROTAS_PESADAS else 'pontual'
+
+
+def _recusar(status: int, mensagem: str, depois: float) -> JsonResponse:
+    response = JsonResponse({'error': mensagem}, status=status)
+    response['Retry-After'] = str(max(1, math.ceil(depois)))
+    return response
+
+
+def _triagem(request) -> Tuple[Optional[JsonResponse], Optional[Limitador]]:
+    if not request.path.startswith(PREFIXO_ADMITIDO):
+        return None, None
+    classe = _classe(request)
+    if classe is None:
+        return None, None
+    balde = _balde_fichas()
+    if balde is not None:
+        espera = balde.retirar(_cliente(request))
+        if espera:
+            return _recusar(429, 'Limite de requisições excedido', espera), None
+    return None, _limitador(classe)
+
+
+def _sobrecarga() -> JsonResponse:
+    return _recusar(503, 'Serviço sobrecarregado, tente novamente', getattr(settings, 'PESSOA_ADMISSAO_RETRY_AFTER', 1))
+
+
+class _CorpoComVaga:
+    # Corpo de uma resposta em streaming (exportação) que segura a vaga até
+    # terminar de ser enviado. O servidor chama close() no fim ou na
+    # desconexão, inclusive antes do primeiro bloco, quando o finally do
+    # gerador não chegaria a rodar
+    def __init__(self, conteudo, limitador: Limitador):
+        self._conteudo = conteudo
+        self._limitador = limitador
+
+    def _devolver(self) -> None:
+        limitador, self._limitador = self._limitador, None
+        if limitador is not None:
+            limitador.sair()
+
+    def close(self) -> None:
+        self._devolver()
+
+    def __iter__(self):
+        try:
+            yield from self._conteudo
+        finally:
+            self._devolver()
+
+
+class _CorpoAssincronoComVaga(_CorpoComVaga):
+    # Sem __iter__: o StreamingHttpResponse passa a tratá-lo como assíncrono
+    __iter__ = None
+
+    async def __aiter__(self):
+        try:
+            async for parte in self._conteudo:
+                yield parte
+        finally:
+            self._devolver()
+
+
+def _liberar_ao_fim(response, limitador: Limitador):
+    if not response.streaming:
+        limitador.sair()
+        return response
+    corpo = _CorpoAssincronoComVaga if response.is_async else _CorpoComVaga
+    response.streaming_content = corpo(response.streaming_content, limitador)
+    return response
+
+
+class AdmissaoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recusa, limitador = _triagem(request)
+        if recusa is not None:
+            return recusa
+        if limitador is None:
+            return self.get_response(request)
+        if not limitador.entrar():
+            return _sobrecarga()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            limitador.sair()
+            raise
+        return _liberar_ao_fim(response, limitador)
+
+    async def __acall__(self, request):
+        recusa, limitador = _triagem(request)
+        if recusa is not None:
+            return recusa
+        if limitador is None:
+            return await self.get_response(request)
+        if not await limitador.aentrar():
+            return _sobrecarga()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            limitador.sair()
+            raise
+        return _liberar_ao_fim(response, limitador)
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class PessoaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'backend.pessoa' 
\ No newline at end of file
+    name = 'backend.pessoa'
+
+    def ready(self):
+        # Registra o contador de conexões abertas e a medição das consultas
+        from . import conexoes, metricas  # noqa: F401
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+TAMANHO_LOCAL_PADRAO = 10000
+TTL_PADRAO = 30
+
+_AUSENTE = object()
+
+
+# Cache em memória do processo, limitado por quantidade e com expiração
+class CacheLRU:
+    def __init__(self, tamanho_maximo: int, ttl: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._itens: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str) -> Any:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return _AUSENTE
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return _AUSENTE
+            self._itens.move_to_end(chave)
+            return valor
+
+    def gravar(self, chave: str, valor: Any) -> None:
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave: str) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+class _Carga:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro: Optional[BaseException] = None
+
+
+# Cache de leitura em duas camadas: um LRU local ao processo e, opcionalmente,
+# um alias do framework de cache do Django compartilhado entre processos.
+# Leituras simultâneas da mesma chave ausente são agrupadas em uma única carga.
+class CachePessoas:
+    PREFIXO = 'pessoa:cpf:'
+
+    def __init__(self):
+        self._local: Optional[CacheLRU] = None
+        self._lock = threading.Lock()
+        self._em_andamento: Dict[str, _Carga] = {}
+        # No caminho assíncrono as cargas são agrupadas por laço de eventos
+        self._em_andamento_async: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._invalidacoes = 0
+        self._contadores = {
+            'acertos_local': 0,
+            'acertos_compartilhado': 0,
+            'faltas': 0,
+            'coalescidas': 0,
+            'invalidacoes': 0,
+        }
+
+    @property
+    def local(self) -> CacheLRU:
+        if self._local is None:
+            self._local = CacheLRU(
+                getattr(settings, 'PESSOA_CACHE_TAMANHO_LOCAL', TAMANHO_LOCAL_PADRAO),
+                getattr(settings, 'PESSOA_CACHE_TTL', TTL_PADRAO)
+            )
+        return self._local
+
+    @property
+    def compartilhado(self):
+        alias = getattr(settings, 'PESSOA_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def _contar(self, contador: str) -> None:
+        with self._lock:
+            self._contadores[contador] += 1
+
+    def obter(self, chave: str, carregador: Callable[[], Any]) -> Any:
+        valor = self.local.obter(chave)
+        if valor is not _AUSENTE:
+            self._contar('acertos_local')
+            return valor
+
+        compartilhado = self.compartilhado
+        if compartilhado is not None:
+            valor = compartilhado.get(self.PREFIXO + chave, _AUSENTE)
+            if valor is not _AUSENTE:
+                self._contar('acertos_compartilhado')
+                self.local.gravar(chave, valor)
+                return valor
+
+        with self._lock:
+            carga = self._em_andamento.get(chave)
+            lider = carga is None
+            if lider:
+                carga = self._em_andamento[chave] = _Carga()
+                invalidacoes = self._invalidacoes
+                self._contadores['faltas'] += 1
+            else:
+                self._contadores['coalescidas'] += 1
+
+        if not lider:
+            carga.evento.wait()
+            if carga.erro is not None:
+                raise carga.erro
+            return carga.valor
+
+        try:
+            carga.valor = carregador()
+            # Ausências não são guardadas: um cadastro feito por outro caminho
+            # apareceria só depois do TTL
+            if carga.valor is not None:
+                with self._lock:
+                    # Uma invalidação durante a carga pode tornar o valor obsoleto
+                    gravar = invalidacoes == self._invalidacoes
+                if gravar:
+                    self.local.gravar(chave, carga.valor)
+                    if compartilhado is not None:
+                        compartilhado.set(self.PREFIXO + chave, carga.valor, self.local.ttl)
+            return carga.valor
+        except BaseException as e:
+            carga.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            carga.evento.set()
+
+    async def aobter(self, chave: str, carregador: Callable[[], Awaitable[Any]]) -> Any:
+        # Versão para views assíncronas: quem espera uma carga em andamento
+        # aguarda um Future em vez de bloquear o laço de eventos
+        valor = self.local.obter(chave)
+        if valor is not _AUSENTE:
+            self._contar('acertos_local')
+            return valor
+
+        compartilhado = self.compartilhado
+        if compartilhado is not None:
+            valor = await compartilhado.aget(self.PREFIXO + chave, _AUSENTE)
+            if valor is not _AUSENTE:
+                self._contar('acertos_compartilhado')
+                self.local.gravar(chave, valor)
+                return valor
+
+        loop = asyncio.get_running_loop()
+        chave_carga = (id(loop), chave)
+        futuro = self._em_andamento_async.get(chave_carga)
+        if futuro is not None:
+            self._contar('coalescidas')
+            return await asyncio.shield(futuro)
+
+        futuro = self._em_andamento_async[chave_carga] = loop.create_future()
+        with self._lock:
+            invalidacoes = self._invalidacoes
+            self._contadores['faltas'] += 1
+        try:
+            valor = await carregador()
+            if valor is not None:
+                with self._lock:
+                    gravar = invalidacoes == self._invalidacoes
+                if gravar:
+                    self.local.gravar(chave, valor)
+                    if compartilhado is not None:
+                        await compartilhado.aset(self.PREFIXO + chave, valor, self.local.ttl)
+            futuro.set_result(valor)
+            return valor
+        except BaseException as e:
+            futuro.set_exception(e)
+            # Marca a exceção como lida caso ninguém esteja aguardando
+            futuro.exception()
+            raise
+        finally:
+            del self._em_andamento_async[chave_carga]
+
+    def invalidar(self, *chaves: str) -> None:
+        with self._lock:
+            self._invalidacoes += 1
+            self._contadores['invalidacoes'] += len(chaves)
+        for chave in chaves:
+            self.local.remover(chave)
+        compartilhado = self.compartilhado
+        if compartilhado is not None and chaves:
+            compartilhado.delete_many([self.PREFIXO + chave for chave in chaves])
+
+    def limpar(self) -> None:
+        self._local = None
+        with self._lock:
+            self._invalidacoes += 1
+            for contador in self._contadores:
+                self._contadores[contador] = 0
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            dados = dict(self._contadores)
+        leituras = dados['acertos_local'] + dados['acertos_compartilhado'] + dados['faltas'] + dados['coalescidas']
+        dados['itens_local'] = len(self.local)
+        dados['taxa_acerto'] = round(
+            (dados['acertos_local'] + dados['acertos_compartilhado']) / leituras, 4
+        ) if leituras else 0.0
+        return dados
+
+
+cache_pessoas = CachePessoas()
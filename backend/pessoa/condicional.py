@@ -0,0 +1,88 @@
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .services import PessoaService
+
+
+# Os validadores são calculados uma vez por requisição e reaproveitados pelas
+# funções de ETag e Last-Modified do decorator condition
+def _memorizar(request, chave: str, calcular):
+    validadores = request.__dict__.setdefault('_validadores_pessoa', {})
+    if chave not in validadores:
+        validadores[chave] = calcular()
+    return validadores[chave]
+
+
+def versao_pessoa(pessoa) -> Optional[Tuple[str, datetime]]:
+    if pessoa is None or pessoa.atualizado_em is None:
+        return None
+    return f"{pessoa.id}-{pessoa.atualizado_em.timestamp()}", pessoa.atualizado_em
+
+
+def versao_listagem(request, ultima_alteracao: Optional[datetime], ultima_exclusao: int) -> Tuple[str, Optional[datetime]]:
+    parametros = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.items()))
+    versao = f"{ultima_alteracao.timestamp() if ultima_alteracao else 0}-{ultima_exclusao}-{parametros}"
+    return hashlib.md5(versao.encode('utf-8')).hexdigest(), ultima_alteracao
+
+
+def _validador_pessoa(request, cpf: str) -> Optional[Tuple[str, datetime]]:
+    # A consulta passa pelo cache de CPF; a resposta 200 reaproveita a mesma entrada
+    return _memorizar(request, f'pessoa:{cpf}', lambda: versao_pessoa(PessoaService.pesquisar_por_cpf(cpf)))
+
+
+def _validador_listagem(request) -> Tuple[str, Optional[datetime]]:
+    return _memorizar(request, 'listagem', lambda: versao_listagem(request, *PessoaService.marca_dagua()))
+
+
+# Equivalentes ao decorator condition para views assíncronas, em que os
+# validadores são obtidos pela própria view
+def resposta_condicional(request, etag: str, ultima_alteracao: Optional[datetime]) -> Optional[HttpResponse]:
+    timestamp = int(ultima_alteracao.timestamp()) if ultima_alteracao else None
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=timestamp)
+
+
+def aplicar_validadores(response: HttpResponse, etag: str, ultima_alteracao: Optional[datetime]) -> HttpResponse:
+    response.headers.setdefault('ETag', quote_etag(etag))
+    if ultima_alteracao is not None:
+        response.headers.setdefault('Last-Modified', http_date(int(ultima_alteracao.timestamp())))
+    return response
+
+
+def variante_campos(request, etag: str) -> str:
+    # ?fields= muda o corpo da resposta: cada projeção tem sua própria ETag
+    campos = request.GET.get('fields')
+    if not campos:
+        return etag
+    return f"{etag}-{hashlib.md5(campos.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _etag_pessoa(prefixo: str):
+    def etag(request, cpf):
+        validador = _validador_pessoa(request, cpf)
+        return variante_campos(request, f"{prefixo}-{validador[0]}") if validador else None
+    return etag
+
+
+def _ultima_alteracao_pessoa(request, cpf):
+    validador = _validador_pessoa(request, cpf)
+    return validador[1] if validador else None
+
+
+condicional_pessoa = condition(
+    etag_func=_etag_pessoa('pessoa'), last_modified_func=_ultima_alteracao_pessoa
+)
+
+condicional_peso_ideal = condition(
+    etag_func=_etag_pessoa('peso-ideal'), last_modified_func=_ultima_alteracao_pessoa
+)
+
+condicional_listagem = condition(
+    etag_func=lambda request: _validador_listagem(request)[0],
+    last_modified_func=lambda request: _validador_listagem(request)[1]
+)
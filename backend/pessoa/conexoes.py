@@ -0,0 +1,55 @@
+import threading
+from typing import Any, Dict
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_lock = threading.Lock()
+_abertas: Dict[str, int] = {}
+
+
+def _ao_conectar(sender, connection, **kwargs):
+    with _lock:
+        _abertas[connection.alias] = _abertas.get(connection.alias, 0) + 1
+
+
+connection_created.connect(_ao_conectar, dispatch_uid='pessoa_conexoes_abertas')
+
+
+def modo_conexao(alias: str = 'default') -> str:
+    configuracao = connections[alias].settings_dict
+    if configuracao.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    return 'persistente' if configuracao.get('CONN_MAX_AGE') else 'sem_reuso'
+
+
+def estatisticas_conexoes(alias: str = 'default') -> Dict[str, Any]:
+    conexao = connections[alias]
+    with _lock:
+        abertas = _abertas.get(alias, 0)
+    # No modo pool, conexoes_abertas conta as retiradas do pool feitas pelo Django
+    dados: Dict[str, Any] = {
+        'modo': modo_conexao(alias),
+        'conexoes_abertas': abertas,
+        'conn_max_age': conexao.settings_dict.get('CONN_MAX_AGE'),
+        'health_checks': conexao.settings_dict.get('CONN_HEALTH_CHECKS'),
+    }
+    pool = getattr(conexao, 'pool', None) if dados['modo'] == 'pool' else None
+    if pool is not None:
+        # Contadores acumulados do psycopg_pool desde a criação do pool
+        estatisticas = pool.get_stats()
+        pedidos = estatisticas.get('requests_num', 0)
+        dados['pool'] = {
+            'tamanho_minimo': estatisticas.get('pool_min'),
+            'tamanho_maximo': estatisticas.get('pool_max'),
+            'tamanho': estatisticas.get('pool_size'),
+            'disponiveis': estatisticas.get('pool_available'),
+            'aguardando': estatisticas.get('requests_waiting', 0),
+            'pedidos': pedidos,
+            'pedidos_enfileirados': estatisticas.get('requests_queued', 0),
+            'pedidos_com_erro': estatisticas.get('requests_errors', 0),
+            'espera_total_ms': estatisticas.get('requests_wait_ms', 0),
+            'espera_media_ms': round(estatisticas.get('requests_wait_ms', 0) / pedidos, 3) if pedidos else 0.0,
+            'conexoes_criadas': estatisticas.get('connections_num', 0),
+        }
+    return dados
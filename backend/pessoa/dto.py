@@ -1,8 +1,8 @@
 from dataclasses import dataclass
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
 
-@dataclass
+@dataclass(slots=True)
 class PessoaDTO:
     nome: str
     cpf: str
@@ -12,7 +12,7 @@ class PessoaDTO:
     peso: float
     id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class PessoaResponseDTO:
     id: int
     nome: str
@@ -24,9 +24,90 @@ class PessoaResponseDTO:
     peso_ideal: Optional[float] = None
     status: Optional[str] = None
     status_peso: Optional[str] = None
+    atualizado_em: Optional[datetime] = None
+    criado_em: Optional[datetime] = None
 
-@dataclass
+@dataclass(slots=True)
 class PesoIdealDTO:
     peso_ideal: float
     status: str
-    status_peso: str 
\ No newline at end of file
+    status_peso: str 
+
+@dataclass(slots=True)
+class PesoIdealLoteDTO:
+    cpf: str
+    encontrado: bool
+    peso_ideal: Optional[float] = None
+    status: Optional[str] = None
+    status_peso: Optional[str] = None
+    diferenca: Optional[float] = None
+
+@dataclass(slots=True)
+class PaginaDTO:
+    resultados: List[PessoaResponseDTO]
+    proximo: Optional[str] = None
+    anterior: Optional[str] = None
+
+@dataclass(slots=True)
+class ResultadoLoteDTO:
+    indice: int
+    sucesso: bool
+    cpf: Optional[str] = None
+    id: Optional[int] = None
+    erros: Optional[Dict[str, List[str]]] = None
+
+@dataclass(slots=True)
+class RelatorioLoteDTO:
+    criados: int
+    falhas: int
+    resultados: List[ResultadoLoteDTO]
+
+@dataclass(slots=True)
+class SincronizacaoDTO:
+    inseridas: int
+    atualizadas: int
+    inalteradas: int
+    falhas: int
+    resultados: List[ResultadoLoteDTO]
+
+@dataclass(slots=True)
+class EstatisticasPopulacaoDTO:
+    total: int
+    por_sexo: Dict[str, int]
+    por_faixa_etaria: Dict[str, int]
+    por_status_peso: Dict[str, int]
+    grupos: List[Dict[str, Any]]
+    altura: Dict[str, Dict[str, Optional[float]]]
+    peso: Dict[str, Dict[str, Optional[float]]]
+
+@dataclass(slots=True)
+class TarefaDTO:
+    id: int
+    tipo: str
+    estado: str
+    tentativas: int
+    max_tentativas: int
+    progresso: int
+    total: Optional[int] = None
+    resultado: Any = None
+    erro: str = ''
+    criado_em: Optional[datetime] = None
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+
+@dataclass(slots=True)
+class ExclusaoDTO:
+    id: int
+    cpf: str
+    excluido_em: datetime
+
+@dataclass(slots=True)
+class MudancasDTO:
+    alteradas: List[PessoaResponseDTO]
+    excluidas: List[ExclusaoDTO]
+    proximo: str
+    ha_mais: bool
+
+def como_dict(dto: Any, campos: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    # DTOs com slots não têm __dict__; campos limita a resposta a parte deles
+    return {campo: getattr(dto, campo) for campo in (campos or dto.__slots__)}
@@ -0,0 +1,232 @@
+import math
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import fragmentos
+from . import peso_ideal as peso
+from .dto import EstatisticasPopulacaoDTO
+from .models import HistogramaPessoa, Pessoa, ResumoPessoa
+
+FAIXAS_ETARIAS = (
+    (0, 17, '0-17'),
+    (18, 29, '18-29'),
+    (30, 39, '30-39'),
+    (40, 49, '40-49'),
+    (50, 59, '50-59'),
+    (60, None, '60+'),
+)
+PERCENTIS = (5, 25, 50, 75, 95)
+
+# Linhas por INSERT ... ON CONFLICT, abaixo do limite de parâmetros do SQLite
+LINHAS_POR_UPSERT = 500
+TAMANHO_BLOCO = 5000
+
+_CHAVE_RESUMO = ('sexo', 'ano_nasc', 'status_peso')
+_SOMAS_RESUMO = ('quantidade', 'soma_altura', 'soma_altura_quadrados', 'soma_peso', 'soma_peso_quadrados')
+_CHAVE_HISTOGRAMA = ('medida', 'sexo', 'classe')
+
+
+class Registro(NamedTuple):
+    sexo: str
+    data_nasc: date
+    altura: float
+    peso: float
+
+
+CAMPOS = Registro._fields
+
+
+def registro(pessoa: Any) -> Registro:
+    # Instâncias recém-criadas guardam os valores como vieram na requisição
+    # (data e números em texto); to_python os deixa como o banco devolveria
+    return Registro(*(Pessoa._meta.get_field(campo).to_python(getattr(pessoa, campo)) for campo in CAMPOS))
+
+
+def _classe(valor: float, escala: int) -> int:
+    # round() evita que 1.7 * 100 = 169.999... caia na classe anterior
+    return math.floor(round(valor * escala, 6))
+
+
+class _Deltas:
+    def __init__(self):
+        self.resumo: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+        self.histograma: Counter = Counter()
+
+    def somar(self, r: Registro, sinal: int) -> None:
+        status_peso = peso.classificar(r.peso - peso.calcular(r.sexo, r.altura))
+        linha = self.resumo[(r.sexo, r.data_nasc.year, status_peso)]
+        linha[0] += sinal
+        linha[1] += sinal * r.altura
+        linha[2] += sinal * r.altura ** 2
+        linha[3] += sinal * r.peso
+        linha[4] += sinal * r.peso ** 2
+        self.histograma[('altura', r.sexo, _classe(r.altura, 100))] += sinal
+        self.histograma[('peso', r.sexo, _classe(r.peso, 1))] += sinal
+
+    def linhas_resumo(self) -> List[tuple]:
+        # Uma alteração que não muda o grupo gera +1 e -1 na mesma chave
+        return [
+            (*chave, *valores) for chave, valores in self.resumo.items()
+            if valores[0] or any(abs(v) > 1e-9 for v in valores[1:])
+        ]
+
+    def linhas_histograma(self) -> List[tuple]:
+        return [(*chave, quantidade) for chave, quantidade in self.histograma.items() if quantidade]
+
+
+def _somar_no_banco(modelo, chave: Tuple[str, ...], somas: Tuple[str, ...], linhas: List[tuple]) -> None:
+    # No banco da transação da escrita: o default ou o fragmento da pessoa
+    connection = connections[fragmentos.banco()]
+    q = connection.ops.quote_name
+    tabela = q(modelo._meta.db_table)
+    colunas = ', '.join(q(c) for c in chave + somas)
+    atualizacoes = ', '.join(f"{q(c)} = {tabela}.{q(c)} + EXCLUDED.{q(c)}" for c in somas)
+    marcadores = '(' + ', '.join(['%s'] * (len(chave) + len(somas))) + ')'
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(linhas), LINHAS_POR_UPSERT):
+            bloco = linhas[inicio:inicio + LINHAS_POR_UPSERT]
+            cursor.execute(
+                f"INSERT INTO {tabela} ({colunas}) VALUES {', '.join([marcadores] * len(bloco))} "
+                f"ON CONFLICT ({', '.join(q(c) for c in chave)}) DO UPDATE SET {atualizacoes}",
+                [valor for linha in bloco for valor in linha]
+            )
+
+
+def aplicar(adicionados: Iterable[Any] = (), removidos: Iterable[Any] = ()) -> None:
+    # Deve rodar na mesma transação da escrita em Pessoa
+    deltas = _Deltas()
+    for pessoa in adicionados:
+        deltas.somar(registro(pessoa), 1)
+    for pessoa in removidos:
+        deltas.somar(registro(pessoa), -1)
+    resumo, histograma = deltas.linhas_resumo(), deltas.linhas_histograma()
+    if resumo:
+        _somar_no_banco(ResumoPessoa, _CHAVE_RESUMO, _SOMAS_RESUMO, resumo)
+    if histograma:
+        _somar_no_banco(HistogramaPessoa, _CHAVE_HISTOGRAMA, ('quantidade',), histograma)
+
+
+def reconstruir() -> int:
+    # Cada fragmento tem o resumo das suas pessoas
+    return sum(fragmentos.espalhar(_reconstruir))
+
+
+def _reconstruir(alias: Optional[str]) -> int:
+    connection = connections[fragmentos.banco()]
+    with transaction.atomic(using=connection.alias):
+        if connection.vendor == 'postgresql':
+            # Escritas concorrentes esperam a reconstrução terminar para somar
+            # seus deltas, em vez de serem apagadas por ela
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {ResumoPessoa._meta.db_table}, {HistogramaPessoa._meta.db_table} IN EXCLUSIVE MODE"
+                )
+        deltas = _Deltas()
+        total = 0
+        for linha in Pessoa.objects.order_by().values_list(*CAMPOS).iterator(chunk_size=TAMANHO_BLOCO):
+            deltas.somar(Registro(*linha), 1)
+            total += 1
+        ResumoPessoa.objects.all().delete()
+        HistogramaPessoa.objects.all().delete()
+        ResumoPessoa.objects.bulk_create(
+            [ResumoPessoa(**dict(zip(_CHAVE_RESUMO + _SOMAS_RESUMO, linha))) for linha in deltas.linhas_resumo()],
+            batch_size=LINHAS_POR_UPSERT
+        )
+        HistogramaPessoa.objects.bulk_create(
+            [HistogramaPessoa(**dict(zip(_CHAVE_HISTOGRAMA + ('quantidade',), linha))) for linha in deltas.linhas_histograma()],
+            batch_size=LINHAS_POR_UPSERT
+        )
+    return total
+
+
+def faixa_etaria(ano_nasc: int, hoje: date) -> str:
+    # Idade pelo ano de nascimento: quem ainda não fez aniversário no ano
+    # conta um ano a mais
+    idade = hoje.year - ano_nasc
+    for minimo, maximo, rotulo in FAIXAS_ETARIAS:
+        if maximo is None or idade <= maximo:
+            return rotulo
+    return FAIXAS_ETARIAS[-1][2]
+
+
+def _descrever(quantidade: int, soma: float, soma_quadrados: float) -> Dict[str, Optional[float]]:
+    if not quantidade:
+        return {'media': None, 'desvio_padrao': None}
+    media = soma / quantidade
+    return {
+        'media': round(media, 2),
+        'desvio_padrao': round(math.sqrt(max(soma_quadrados / quantidade - media ** 2, 0.0)), 2),
+    }
+
+
+def _percentis(classes: Dict[int, int], escala: int) -> Dict[str, Optional[float]]:
+    total = sum(classes.values())
+    resultado: Dict[str, Optional[float]] = {}
+    ordenadas = sorted(classes.items())
+    for p in PERCENTIS:
+        if not total:
+            resultado[f'p{p}'] = None
+            continue
+        # Posto mais próximo; o valor é o limite inferior da classe
+        alvo, acumulado = max(1, math.ceil(p / 100 * total)), 0
+        for classe, quantidade in ordenadas:
+            acumulado += quantidade
+            if acumulado >= alvo:
+                resultado[f'p{p}'] = classe / escala
+                break
+    return resultado
+
+
+def consultar(hoje: Optional[date] = None) -> EstatisticasPopulacaoDTO:
+    # Lê apenas os grupos e as classes do histograma, não as pessoas
+    hoje = hoje or timezone.localdate()
+    por_sexo, por_faixa, por_status = Counter(), Counter(), Counter()
+    grupos: Counter = Counter()
+    somas: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+    # Com a tabela fragmentada, soma os grupos e as classes de todos os fragmentos
+    partes = fragmentos.espalhar(lambda alias: (
+        list(ResumoPessoa.objects.using(alias).filter(quantidade__gt=0).values_list(*_CHAVE_RESUMO, *_SOMAS_RESUMO)),
+        list(HistogramaPessoa.objects.using(alias).filter(quantidade__gt=0).values_list(*_CHAVE_HISTOGRAMA, 'quantidade')),
+    ))
+    for sexo, ano_nasc, status_peso, *valores in (linha for resumo, _ in partes for linha in resumo):
+        faixa = faixa_etaria(ano_nasc, hoje)
+        quantidade = valores[0]
+        por_sexo[sexo] += quantidade
+        por_faixa[faixa] += quantidade
+        por_status[status_peso] += quantidade
+        grupos[(sexo, faixa, status_peso)] += quantidade
+        for chave in ('geral', sexo):
+            for i, valor in enumerate(valores):
+                somas[chave][i] += valor
+
+    classes: Dict[Tuple[str, str], Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    for medida, sexo, classe, quantidade in (linha for _, histograma in partes for linha in histograma):
+        classes[(medida, 'geral')][classe] += quantidade
+        classes[(medida, sexo)][classe] += quantidade
+
+    medidas = {}
+    for medida, indice, escala in (('altura', 1, 100), ('peso', 3, 1)):
+        medidas[medida] = {
+            chave: {
+                **_descrever(int(somas[chave][0]), somas[chave][indice], somas[chave][indice + 1]),
+                **_percentis(classes[(medida, chave)], escala),
+            }
+            for chave in ('geral', *sorted(por_sexo))
+        }
+
+    return EstatisticasPopulacaoDTO(
+        total=sum(por_sexo.values()),
+        por_sexo=dict(sorted(por_sexo.items())),
+        por_faixa_etaria={rotulo: por_faixa[rotulo] for _, _, rotulo in FAIXAS_ETARIAS},
+        por_status_peso={status: por_status[status] for status in peso.DESCRICOES},
+        grupos=[
+            {'sexo': sexo, 'faixa_etaria': faixa, 'status_peso': status_peso, 'quantidade': quantidade}
+            for (sexo, faixa, status_peso), quantidade in sorted(grupos.items())
+        ],
+        altura=medidas['altura'],
+        peso=medidas['peso'],
+    )
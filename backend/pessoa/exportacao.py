@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Sequence, Tuple
+
+CAMPOS = ('id', 'nome', 'cpf', 'data_nasc', 'sexo', 'altura', 'peso')
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Linhas agrupadas por bloco enviado ao cliente
+LINHAS_POR_BLOCO = 500
+
+
+def _linha_ndjson(linha: Sequence) -> str:
+    registro = dict(zip(CAMPOS, linha))
+    registro['data_nasc'] = registro['data_nasc'].isoformat()
+    return json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+def _formatador_csv() -> Callable[[Sequence], str]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+
+    def formatar(linha: Sequence) -> str:
+        escritor.writerow(linha)
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return texto
+    return formatar
+
+
+def _formatador(formato: str) -> Tuple[str, Callable[[Sequence], str]]:
+    if formato == 'csv':
+        formatar = _formatador_csv()
+        return formatar(CAMPOS), formatar
+    return '', _linha_ndjson
+
+
+def gerar(formato: str, linhas: Iterable[Sequence]) -> Iterator[bytes]:
+    cabecalho, formatar = _formatador(formato)
+    bloco = [cabecalho]
+    for linha in linhas:
+        bloco.append(formatar(linha))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield ''.join(bloco).encode('utf-8')
+            bloco = []
+    if bloco:
+        yield ''.join(bloco).encode('utf-8')
+
+
+async def agerar(formato: str, linhas: AsyncIterable[Sequence]) -> AsyncIterator[bytes]:
+    cabecalho, formatar = _formatador(formato)
+    bloco = [cabecalho]
+    async for linha in linhas:
+        bloco.append(formatar(linha))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield ''.join(bloco).encode('utf-8')
+            bloco = []
+    if bloco:
+        yield ''.join(bloco).encode('utf-8')
+
+
+def _compressor():
+    # wbits=31 produz o contêiner gzip; a memória fica limitada à janela do zlib
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def comprimir_gzip(blocos: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = _compressor()
+    for bloco in blocos:
+        saida = compressor.compress(bloco)
+        if saida:
+            yield saida
+    yield compressor.flush()
+
+
+async def acomprimir_gzip(blocos: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    compressor = _compressor()
+    async for bloco in blocos:
+        saida = compressor.compress(bloco)
+        if saida:
+            yield saida
+    yield compressor.flush()
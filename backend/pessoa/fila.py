@@ -0,0 +1,191 @@
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Tarefa
+from .roteador import primario
+
+logger = logging.getLogger(__name__)
+
+# Fila de tarefas longas guardada no próprio banco, sem broker externo. A view
+# enfileira e responde 202; o manage.py run_pessoa_worker reserva as tarefas
+# com SELECT ... FOR UPDATE SKIP LOCKED e as executa
+
+# tipo -> função que recebe a Tarefa reservada e devolve o resultado (JSON)
+TIPOS: Dict[str, Callable[[Tarefa], Any]] = {}
+
+
+def tipo_tarefa(nome: str):
+    def registrar(funcao):
+        TIPOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def identificar_trabalhador() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _reserva() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'PESSOA_TAREFA_RESERVA', 300))
+
+
+def enfileirar(tipo: str, parametros: Dict[str, Any], total: Optional[int] = None) -> Tarefa:
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    return Tarefa.objects.create(
+        tipo=tipo, parametros=parametros, total=total,
+        max_tentativas=getattr(settings, 'PESSOA_TAREFA_TENTATIVAS', 3)
+    )
+
+
+def reservar(trabalhador: str) -> Optional[Tarefa]:
+    # Pendentes já disponíveis e também as que estão executando com a reserva
+    # vencida, de um trabalhador que morreu no meio. SKIP LOCKED faz cada
+    # trabalhador pular as linhas que outro está reservando, sem esperar
+    while True:
+        agora = timezone.now()
+        with transaction.atomic():
+            tarefa = (
+                Tarefa.objects.select_for_update(skip_locked=True)
+                .filter(estado__in=[Tarefa.PENDENTE, Tarefa.EXECUTANDO], disponivel_em__lte=agora)
+                .order_by('disponivel_em', 'id')
+                .first()
+            )
+            if tarefa is None:
+                return None
+            if tarefa.estado == Tarefa.EXECUTANDO and tarefa.tentativas >= tarefa.max_tentativas:
+                logger.error(f"Tarefa {tarefa.id} abandonada por {tarefa.trabalhador} na última tentativa")
+                Tarefa.objects.filter(pk=tarefa.pk).update(
+                    estado=Tarefa.FALHOU, erro='Reserva expirada: o trabalhador parou no meio da tarefa',
+                    concluido_em=agora
+                )
+                continue
+            # O filtro pelo estado lido protege bancos sem SKIP LOCKED (SQLite),
+            # em que dois trabalhadores podem ler a mesma linha
+            reservadas = Tarefa.objects.filter(
+                pk=tarefa.pk, estado=tarefa.estado, disponivel_em=tarefa.disponivel_em
+            ).update(
+                estado=Tarefa.EXECUTANDO, trabalhador=trabalhador, tentativas=tarefa.tentativas + 1,
+                disponivel_em=agora + _reserva(), iniciado_em=tarefa.iniciado_em or agora
+            )
+            if not reservadas:
+                continue
+        tarefa.refresh_from_db()
+        return tarefa
+
+
+def avancar(tarefa: Tarefa, progresso: int, resultado: Any = None) -> None:
+    # Chamado pela tarefa a cada bloco, de preferência na mesma transação do
+    # bloco: o progresso gravado é o ponto de retomada de uma nova tentativa.
+    # Também renova a reserva do trabalhador
+    tarefa.progresso, tarefa.resultado = progresso, resultado
+    Tarefa.objects.filter(pk=tarefa.pk).update(
+        progresso=progresso, resultado=resultado, disponivel_em=timezone.now() + _reserva()
+    )
+
+
+def executar(tarefa: Tarefa) -> bool:
+    try:
+        resultado = TIPOS[tarefa.tipo](tarefa)
+    except Exception as e:
+        _falhar(tarefa, e)
+        return False
+    Tarefa.objects.filter(pk=tarefa.pk).update(
+        estado=Tarefa.CONCLUIDA, resultado=resultado, erro='', concluido_em=timezone.now()
+    )
+    logger.info(f"Tarefa {tarefa.id} ({tarefa.tipo}) concluída na tentativa {tarefa.tentativas}")
+    return True
+
+
+def _falhar(tarefa: Tarefa, erro: Exception) -> None:
+    agora = timezone.now()
+    if tarefa.tentativas < tarefa.max_tentativas:
+        # Espera dobra a cada tentativa
+        espera = getattr(settings, 'PESSOA_TAREFA_ESPERA', 5) * 2 ** (tarefa.tentativas - 1)
+        logger.warning(f"Tarefa {tarefa.id} ({tarefa.tipo}) falhou, nova tentativa em {espera}s: {erro}")
+        Tarefa.objects.filter(pk=tarefa.pk).update(
+            estado=Tarefa.PENDENTE, erro=str(erro), disponivel_em=agora + timedelta(seconds=espera)
+        )
+    else:
+        logger.error(f"Tarefa {tarefa.id} ({tarefa.tipo}) falhou após {tarefa.tentativas} tentativas: {erro}")
+        Tarefa.objects.filter(pk=tarefa.pk).update(estado=Tarefa.FALHOU, erro=str(erro), concluido_em=agora)
+
+
+def trabalhar(parar: threading.Event, intervalo: float = 1.0, ate_esvaziar: bool = False) -> int:
+    # Laço de um trabalhador; devolve quantas tarefas executou
+    trabalhador = identificar_trabalhador()
+    executadas = 0
+    # As tarefas escrevem e releem o que escreveram: nada de réplicas
+    with primario():
+        while not parar.is_set():
+            close_old_connections()
+            try:
+                tarefa = reservar(trabalhador)
+            except DatabaseError as e:
+                # Banco reiniciando ou, no SQLite, outro processo escrevendo
+                logger.warning(f"Trabalhador {trabalhador} não conseguiu consultar a fila: {e}")
+                parar.wait(intervalo)
+                continue
+            if tarefa is None:
+                if ate_esvaziar:
+                    break
+                parar.wait(intervalo)
+                continue
+            try:
+                executar(tarefa)
+            except DatabaseError as e:
+                # Sem registrar o desfecho, a tarefa volta à fila quando a reserva vencer
+                logger.error(f"Trabalhador {trabalhador} não conseguiu registrar a tarefa {tarefa.id}: {e}")
+            executadas += 1
+    return executadas
+
+
+def _em_blocos(tarefa: Tarefa, processar: Callable[[List[Dict[str, Any]]], Any], contadores: Tuple[str, ...]) -> Dict[str, Any]:
+    # Processa parametros['itens'] em blocos a partir do progresso salvo,
+    # somando os contadores do relatório de cada bloco. Só as falhas são
+    # guardadas: o resultado é regravado a cada bloco
+    from .dto import como_dict
+
+    itens: List[Dict[str, Any]] = tarefa.parametros['itens']
+    tamanho = getattr(settings, 'PESSOA_LOTE_BATCH_SIZE', 1000)
+    resultado = tarefa.resultado or {**dict.fromkeys(contadores, 0), 'resultados': []}
+    for inicio in range(tarefa.progresso, len(itens), tamanho):
+        with transaction.atomic():
+            relatorio = processar(itens[inicio:inicio + tamanho])
+            for contador in contadores:
+                resultado[contador] += getattr(relatorio, contador)
+            for item in relatorio.resultados:
+                if not item.sucesso:
+                    item.indice += inicio
+                    resultado['resultados'].append(como_dict(item))
+            avancar(tarefa, min(inicio + tamanho, len(itens)), resultado)
+    return resultado
+
+
+@tipo_tarefa('criar_lote')
+def _criar_lote(tarefa: Tarefa) -> Dict[str, Any]:
+    from .services import PessoaService
+
+    return _em_blocos(tarefa, PessoaService.criar_lote, ('criados', 'falhas'))
+
+
+@tipo_tarefa('sincronizar')
+def _sincronizar(tarefa: Tarefa) -> Dict[str, Any]:
+    from .services import PessoaService
+
+    return _em_blocos(tarefa, PessoaService.sincronizar, ('inseridas', 'atualizadas', 'inalteradas', 'falhas'))
+
+
+@tipo_tarefa('reconstruir_estatisticas')
+def _reconstruir_estatisticas(tarefa: Tarefa) -> Dict[str, Any]:
+    from . import estatisticas
+
+    return {'pessoas': estatisticas.reconstruir()}
@@ -0,0 +1,300 @@
+import contextvars
+import hashlib
+import heapq
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Collate
+
+from .models import Pessoa, PessoaExcluida
+
+# Modo fragmentado (opcional): com PESSOA_FRAGMENTOS = [alias, ...], cada
+# pessoa fica em um só desses bancos, escolhido pelo hash do CPF. As operações
+# por CPF vão direto ao fragmento; listagens e estatísticas consultam todos em
+# paralelo e juntam os resultados. Novos fragmentos entram sempre no fim da
+# lista: o jump hash só move para o novo fragmento as pessoas que passam a
+# pertencer a ele (manage.py rebalance_pessoa_shards)
+
+# Tabelas gravadas junto com a pessoa, na mesma transação: ficam no fragmento
+MODELOS_FRAGMENTADOS = {'pessoa', 'pessoaexcluida', 'resumopessoa', 'histogramapessoa'}
+# Cada fragmento gera ids a partir de indice * FAIXA_IDS: continuam únicos
+# entre fragmentos, inclusive depois de uma pessoa mudar de fragmento, e
+# desempatam a ordenação (nome, id) da listagem
+FAIXA_IDS = 10 ** 12
+
+T = TypeVar('T')
+
+_atual: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('pessoa_fragmento', default=None)
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def fragmentos() -> List[str]:
+    return list(getattr(settings, 'PESSOA_FRAGMENTOS', []))
+
+
+def ativo() -> bool:
+    return len(fragmentos()) > 1
+
+
+def jump_hash(chave: int, baldes: int) -> int:
+    # Lamping e Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    b, j = -1, 0
+    while j < baldes:
+        b = j
+        chave = (chave * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((chave >> 33) + 1)))
+    return b
+
+
+def indice_do_cpf(chave: int, baldes: int) -> int:
+    # CPFs próximos viram chaves de 64 bits bem espalhadas antes do jump hash
+    espalhada = int.from_bytes(hashlib.blake2b(str(chave).encode('ascii'), digest_size=8).digest(), 'big')
+    return jump_hash(espalhada, baldes)
+
+
+def do_cpf(chave: Optional[int]) -> Optional[str]:
+    # None fora do modo fragmentado: o roteamento normal decide
+    lista = fragmentos()
+    if len(lista) < 2 or chave is None:
+        return None
+    return lista[indice_do_cpf(chave, len(lista))]
+
+
+def banco() -> str:
+    # Banco das escritas e transações da operação atual
+    return _atual.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def usando(alias: Optional[str]):
+    if alias is None:
+        yield
+        return
+    token = _atual.set(alias)
+    try:
+        yield
+    finally:
+        _atual.reset(token)
+
+
+@contextmanager
+def atomico(alias: Optional[str] = None):
+    # Transação no fragmento alias (ou no default), com as escritas roteadas para ele
+    with usando(alias), transaction.atomic(using=banco()):
+        yield
+
+
+def agrupar(chaves: Dict[Any, int]) -> Dict[Optional[str], Dict[Any, int]]:
+    # Itens de um lote (índice -> cpf_num) por fragmento, na ordem original
+    grupos: Dict[Optional[str], Dict[Any, int]] = {}
+    for item, chave in chaves.items():
+        grupos.setdefault(do_cpf(chave), {})[item] = chave
+    return grupos
+
+
+class RoteadorFragmentos:
+    def _fragmento(self, model, hints) -> Optional[str]:
+        if model._meta.app_label != 'pessoa' or model._meta.model_name not in MODELOS_FRAGMENTADOS:
+            return None
+        atual = _atual.get()
+        if atual is None:
+            # Instância lida de um fragmento (ex.: pelo admin) é gravada nele
+            instancia = hints.get('instance')
+            if instancia is not None and instancia._state.db in fragmentos():
+                return instancia._state.db
+        return atual
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        return self._fragmento(model, hints)
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        return self._fragmento(model, hints)
+
+
+def _em_fragmento(funcao: Callable[[Optional[str]], T], alias: str) -> T:
+    # Roda numa thread do executor, com conexões próprias
+    close_old_connections()
+    try:
+        with usando(alias):
+            return funcao(alias)
+    finally:
+        close_old_connections()
+
+
+def _executor_compartilhado() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PESSOA_FRAGMENTOS_THREADS', 8), thread_name_prefix='pessoa-fragmento'
+            )
+        return _executor
+
+
+def espalhar(funcao: Callable[[Optional[str]], T]) -> List[T]:
+    # Chama funcao(alias) em cada fragmento, em paralelo; fora do modo
+    # fragmentado, uma vez com None, na thread atual
+    lista = fragmentos()
+    if len(lista) < 2:
+        return [funcao(None)]
+    executor = _executor_compartilhado()
+    # Cada tarefa leva uma cópia do contexto (ex.: fixação no primário)
+    futuros = [executor.submit(contextvars.copy_context().run, _em_fragmento, funcao, alias) for alias in lista]
+    return [futuro.result() for futuro in futuros]
+
+
+def _ordem(consulta) -> List[str]:
+    if consulta.query.order_by:
+        return list(consulta.query.order_by)
+    return list(consulta.model._meta.ordering) if consulta.query.default_ordering else []
+
+
+def reunir(consulta, limite: Optional[int] = None) -> List[tuple]:
+    # Executa um values_list() em todos os fragmentos e intercala as linhas
+    # (k-way merge) pela ordenação da própria consulta; cada fragmento devolve
+    # no máximo limite linhas. Textos são comparados por code point: a ordem de
+    # cada fragmento precisa ser a mesma (ver por_nome)
+    if not ativo():
+        return list(consulta[:limite] if limite is not None else consulta)
+    ordem = _ordem(consulta)
+    campos = list(consulta._fields)
+    # Colunas da ordenação que não estão no values_list entram só para o merge
+    extras = [c.lstrip('-') for c in ordem if c.lstrip('-') not in campos]
+    if extras:
+        # Anotações fora do values_list (ex.: nome_ordem de por_nome) voltam ao SELECT
+        anotacoes = {c: consulta.query.annotations[c] for c in extras if c in consulta.query.annotations}
+        consulta = consulta.annotate(**anotacoes).values_list(*campos, *extras)
+    todas = campos + extras
+    posicoes = [todas.index(c.lstrip('-')) for c in ordem]
+    decrescentes = [c.startswith('-') for c in ordem]
+
+    def ler(alias):
+        parcial = consulta.using(alias)
+        return list(parcial[:limite] if limite is not None else parcial)
+
+    listas = espalhar(ler)
+    if not ordem:
+        linhas = [linha for lista in listas for linha in lista]
+    elif all(decrescentes):
+        linhas = list(heapq.merge(*listas, key=lambda l: tuple(l[p] for p in posicoes), reverse=True))
+    else:
+        # Ordenações mistas só descem por colunas numéricas (relevância da busca)
+        linhas = list(heapq.merge(*listas, key=lambda l: tuple(
+            -l[p] if d else l[p] for p, d in zip(posicoes, decrescentes)
+        )))
+    if limite is not None:
+        linhas = linhas[:limite]
+    return [linha[:len(campos)] for linha in linhas] if extras else linhas
+
+
+def por_nome(consulta) -> Tuple[Any, str]:
+    # Campo para ordenar e paginar por (nome, id). Com fragmentos, cada um
+    # ordena o nome por code point, como o merge do reunir: no PostgreSQL,
+    # COLLATE "C" (o SQLite já compara em BINARY). Sem fragmentos vale a
+    # collation da coluna, que usa o índice (nome, id)
+    if not ativo():
+        return consulta, 'nome'
+    nome = Collate('nome', 'C') if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql' else F('nome')
+    return consulta.annotate(nome_ordem=nome), 'nome_ordem'
+
+
+def encadear(consulta, chunk_size: int) -> Iterable[tuple]:
+    # Exportação: percorre os fragmentos um após o outro, com cursor do lado do
+    # servidor em cada um; a ordem vale dentro de cada fragmento
+    if not ativo():
+        return consulta.iterator(chunk_size=chunk_size)
+    return (linha for alias in fragmentos() for linha in consulta.using(alias).iterator(chunk_size=chunk_size))
+
+
+def preparar_ids() -> None:
+    # As exclusões também: o feed de mudanças desempata pelo id entre fragmentos
+    for indice, alias in enumerate(fragmentos()):
+        if indice:
+            for modelo in (Pessoa, PessoaExcluida):
+                _avancar_sequencia(alias, modelo._meta.db_table, indice * FAIXA_IDS)
+
+
+def _avancar_sequencia(alias: str, tabela: str, inicio: int) -> None:
+    # Só avança: um fragmento que já gera ids na sua faixa continua de onde parou
+    conexao = connections[alias]
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [tabela])
+            sequencia = cursor.fetchone()[0]
+            cursor.execute(f"SELECT setval(%s, GREATEST((SELECT last_value FROM {sequencia}), %s))", [sequencia, inicio])
+        elif conexao.vendor == 'sqlite':
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s", [inicio, tabela])
+            if not cursor.rowcount:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [tabela, inicio])
+        else:
+            raise NotImplementedError(f"Faixas de id não suportadas no banco {conexao.vendor}")
+
+
+def rebalancear(tamanho_bloco: int = 1000, simular: bool = False) -> Dict[Tuple[str, str], int]:
+    # Percorre cada fragmento por id e move as pessoas cujo CPF pertence a
+    # outro. Cada bloco é copiado para o destino e só depois apagado da origem:
+    # se o comando parar no meio, rodá-lo de novo termina o trabalho sem
+    # duplicar pessoas nem estatísticas. Escritas devem estar paradas enquanto
+    # ele roda
+    campos = Pessoa._meta.concrete_fields
+    nomes = [campo.attname for campo in campos]
+    posicao_id, posicao_cpf = nomes.index('id'), nomes.index('cpf_num')
+    movidas: Counter = Counter()
+    for origem in fragmentos():
+        ultimo = 0
+        while True:
+            linhas = list(
+                Pessoa.objects.using(origem).filter(id__gt=ultimo).order_by('id').values_list(*nomes)[:tamanho_bloco]
+            )
+            if not linhas:
+                break
+            ultimo = linhas[-1][posicao_id]
+            por_destino: Dict[str, List[tuple]] = defaultdict(list)
+            for linha in linhas:
+                destino = do_cpf(linha[posicao_cpf])
+                if destino != origem:
+                    por_destino[destino].append(linha)
+            for destino, grupo in por_destino.items():
+                if not simular:
+                    _mover(origem, destino, grupo)
+                movidas[(origem, destino)] += len(grupo)
+    return dict(movidas)
+
+
+def _mover(origem: str, destino: str, linhas: Sequence[tuple]) -> None:
+    from . import estatisticas
+
+    campos = Pessoa._meta.concrete_fields
+    nomes = [campo.attname for campo in campos]
+    posicao_id, posicao_cpf = nomes.index('id'), nomes.index('cpf_num')
+    posicoes_registro = [nomes.index(campo) for campo in estatisticas.CAMPOS]
+
+    def registros(grupo):
+        return [estatisticas.Registro(*(linha[p] for p in posicoes_registro)) for linha in grupo]
+
+    with atomico(destino):
+        existentes = set(
+            Pessoa.objects.filter(cpf_num__in=[linha[posicao_cpf] for linha in linhas]).values_list('cpf_num', flat=True)
+        )
+        novas = [linha for linha in linhas if linha[posicao_cpf] not in existentes]
+        if novas:
+            # INSERT direto: bulk_create reescreveria criado_em e atualizado_em
+            conexao = connections[destino]
+            q = conexao.ops.quote_name
+            with conexao.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {q(Pessoa._meta.db_table)} ({', '.join(q(campo.column) for campo in campos)}) "
+                    f"VALUES ({', '.join(['%s'] * len(campos))})",
+                    [[campo.get_db_prep_save(valor, conexao) for campo, valor in zip(campos, linha)] for linha in novas]
+                )
+            estatisticas.aplicar(registros(novas))
+    with atomico(origem):
+        Pessoa.objects.filter(id__in=[linha[posicao_id] for linha in linhas]).delete()
+        estatisticas.aplicar(removidos=registros(linhas))
@@ -0,0 +1,275 @@
+import csv
+import io
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import estatisticas
+from . import fragmentos
+from .cache import cache_pessoas
+from .models import Pessoa
+from .normalizacao import chave_cpf, normalizar_busca, normalizar_cpf, normalizar_data, normalizar_positivo, normalizar_sexo
+
+COLUNAS = ('nome', 'cpf', 'data_nasc', 'sexo', 'altura', 'peso')
+
+IGNORAR = 'ignorar'
+ATUALIZAR = 'atualizar'
+
+TABELA_STAGING = 'pessoa_importacao'
+
+
+@dataclass
+class ResumoImportacaoDTO:
+    lidas: int = 0
+    inseridas: int = 0
+    atualizadas: int = 0
+    ignoradas: int = 0
+    rejeitadas: int = 0
+
+
+def normalizar_linha(linha: Dict[str, str]) -> Dict:
+    nome = (linha.get('nome') or '').strip()
+    if not nome:
+        raise ValueError("Nome é obrigatório")
+    if len(nome) > 100:
+        raise ValueError("Nome deve ter no máximo 100 caracteres")
+    return {
+        'nome': nome,
+        'cpf': normalizar_cpf(linha.get('cpf')),
+        'data_nasc': normalizar_data(linha.get('data_nasc')),
+        'sexo': normalizar_sexo(linha.get('sexo')),
+        'altura': normalizar_positivo(linha.get('altura'), 'Altura'),
+        'peso': normalizar_positivo(linha.get('peso'), 'Peso'),
+    }
+
+
+def _blocos(leitor: Iterable[Dict[str, str]], tamanho: int) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    bloco = []
+    # A linha 1 é o cabeçalho
+    for numero, linha in enumerate(leitor, start=2):
+        bloco.append((numero, linha))
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _copiar(cursor, sql: str, buffer: io.StringIO) -> None:
+    # psycopg2 expõe copy_expert; o psycopg 3 usa cursor.copy()
+    if hasattr(cursor, 'copy_expert'):
+        cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.copy(sql) as copia:
+            copia.write(buffer.getvalue())
+
+
+class _CarregadorPostgres:
+    def __init__(self, conflito: str, banco: str):
+        self.conflito = conflito
+        self.banco = banco
+
+    def __enter__(self):
+        with connections[self.banco].cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {TABELA_STAGING} ("
+                "linha integer, nome varchar(100), nome_busca varchar(100), cpf varchar(14), cpf_num bigint, data_nasc date, "
+                "sexo varchar(1), altura double precision, peso double precision)"
+            )
+        return self
+
+    def __exit__(self, *exc):
+        with connections[self.banco].cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABELA_STAGING}")
+
+    def carregar(self, registros: List[Tuple[int, Dict]]) -> Tuple[int, int, int]:
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        for numero, r in registros:
+            escritor.writerow([
+                numero, r['nome'], normalizar_busca(r['nome']), r['cpf'], chave_cpf(r['cpf']),
+                r['data_nasc'].isoformat(), r['sexo'], r['altura'], r['peso']
+            ])
+        buffer.seek(0)
+
+        # DISTINCT ON mantém a última ocorrência de cada CPF do bloco; sem isso
+        # o ON CONFLICT DO UPDATE falharia ao tocar a mesma linha duas vezes
+        # criado_em não tem default no banco e fica fora do DO UPDATE: numa
+        # atualização vale a data original
+        if self.conflito == ATUALIZAR:
+            acao = (
+                "DO UPDATE SET nome = EXCLUDED.nome, nome_busca = EXCLUDED.nome_busca, data_nasc = EXCLUDED.data_nasc, "
+                "sexo = EXCLUDED.sexo, altura = EXCLUDED.altura, peso = EXCLUDED.peso, "
+                "atualizado_em = EXCLUDED.atualizado_em"
+            )
+        else:
+            acao = "DO NOTHING"
+        with transaction.atomic(using=self.banco), connections[self.banco].cursor() as cursor:
+            _copiar(
+                cursor,
+                f"COPY {TABELA_STAGING} (linha, nome, nome_busca, cpf, cpf_num, data_nasc, sexo, altura, peso) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            cursor.execute(
+                f"INSERT INTO pessoa_pessoa (nome, nome_busca, cpf, cpf_num, data_nasc, sexo, altura, peso, atualizado_em, criado_em) "
+                f"SELECT DISTINCT ON (cpf_num) nome, nome_busca, cpf, cpf_num, data_nasc, sexo, altura, peso, now(), now() "
+                f"FROM {TABELA_STAGING} ORDER BY cpf_num, linha DESC "
+                f"ON CONFLICT (cpf_num) {acao} RETURNING (xmax = 0)"
+            )
+            inseridas_flags = [linha[0] for linha in cursor.fetchall()]
+            cursor.execute(f"TRUNCATE {TABELA_STAGING}")
+        inseridas = sum(1 for f in inseridas_flags if f)
+        atualizadas = len(inseridas_flags) - inseridas
+        return inseridas, atualizadas, len(registros) - inseridas - atualizadas
+
+
+class _CarregadorORM:
+    def __init__(self, conflito: str, banco: str, tamanho_lote: int):
+        self.conflito = conflito
+        self.banco = banco
+        self.tamanho_lote = tamanho_lote
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    def carregar(self, registros: List[Tuple[int, Dict]]) -> Tuple[int, int, int]:
+        # A última ocorrência de cada CPF no bloco prevalece, como no COPY
+        unicos = {chave_cpf(r['cpf']): r for _, r in registros}
+        pessoas_banco = Pessoa.objects.using(self.banco)
+        existentes = set(
+            pessoas_banco.filter(cpf_num__in=list(unicos)).values_list('cpf_num', flat=True)
+        )
+        pessoas = [Pessoa(**r) for r in unicos.values()]
+        for pessoa in pessoas:
+            pessoa.preencher_derivados()
+        with transaction.atomic(using=self.banco):
+            if self.conflito == ATUALIZAR:
+                pessoas_banco.bulk_create(
+                    pessoas, batch_size=self.tamanho_lote, update_conflicts=True,
+                    unique_fields=['cpf_num'], update_fields=['nome', 'nome_busca', 'data_nasc', 'sexo', 'altura', 'peso', 'atualizado_em']
+                )
+                atualizadas = len(existentes)
+            else:
+                pessoas_banco.bulk_create(pessoas, batch_size=self.tamanho_lote, ignore_conflicts=True)
+                atualizadas = 0
+        inseridas = len(unicos) - len(existentes)
+        return inseridas, atualizadas, len(registros) - inseridas - atualizadas
+
+
+def importar_csv(
+    arquivo: TextIO,
+    conflito: str = IGNORAR,
+    tamanho_bloco: int = 5000,
+    delimitador: str = ',',
+    rejeitados: Optional[TextIO] = None,
+    progresso: Optional[Callable[[ResumoImportacaoDTO], None]] = None,
+) -> ResumoImportacaoDTO:
+    leitor = csv.DictReader(arquivo, delimiter=delimitador)
+    faltantes = [c for c in COLUNAS if c not in (leitor.fieldnames or [])]
+    if faltantes:
+        raise ValueError(f"Colunas ausentes no arquivo: {', '.join(faltantes)}")
+
+    escritor_rejeitados = None
+    if rejeitados is not None:
+        escritor_rejeitados = csv.writer(rejeitados)
+        escritor_rejeitados.writerow(['linha', *leitor.fieldnames, 'motivo'])
+
+    resumo = ResumoImportacaoDTO()
+    with _carregador(conflito, tamanho_bloco) as carregador:
+        for bloco in _blocos(leitor, tamanho_bloco):
+            validos = []
+            for numero, linha in bloco:
+                try:
+                    validos.append((numero, normalizar_linha(linha)))
+                except ValueError as e:
+                    resumo.rejeitadas += 1
+                    if escritor_rejeitados:
+                        escritor_rejeitados.writerow([numero, *(linha.get(c) for c in leitor.fieldnames), str(e)])
+            _carregar(carregador, validos, resumo)
+            resumo.lidas += len(bloco)
+            if progresso:
+                progresso(resumo)
+    _finalizar(resumo)
+    return resumo
+
+
+def importar_registros(
+    registros: Iterable[Dict],
+    conflito: str = IGNORAR,
+    tamanho_bloco: int = 5000,
+    progresso: Optional[Callable[[ResumoImportacaoDTO], None]] = None,
+) -> ResumoImportacaoDTO:
+    # Registros já no formato de normalizar_linha, sem nova validação
+    resumo = ResumoImportacaoDTO()
+    with _carregador(conflito, tamanho_bloco) as carregador:
+        for bloco in _blocos(registros, tamanho_bloco):
+            _carregar(carregador, bloco, resumo)
+            resumo.lidas += len(bloco)
+            if progresso:
+                progresso(resumo)
+    _finalizar(resumo)
+    return resumo
+
+
+class _CarregadorFragmentado:
+    # Separa cada bloco pelo fragmento do CPF; o carregador de cada banco é
+    # aberto na primeira linha que cai nele e fechado no fim da importação
+    def __init__(self, conflito: str, tamanho_bloco: int):
+        self.conflito = conflito
+        self.tamanho_bloco = tamanho_bloco
+        self._carregadores: Dict[str, object] = {}
+
+    def __enter__(self):
+        self._pilha = ExitStack()
+        return self
+
+    def __exit__(self, *exc):
+        self._carregadores.clear()
+        return self._pilha.__exit__(*exc)
+
+    def _abrir(self, banco: str):
+        carregador = self._carregadores.get(banco)
+        if carregador is None:
+            if connections[banco].vendor == 'postgresql':
+                carregador = _CarregadorPostgres(self.conflito, banco)
+            else:
+                carregador = _CarregadorORM(self.conflito, banco, tamanho_lote=min(self.tamanho_bloco, 1000))
+            carregador = self._carregadores[banco] = self._pilha.enter_context(carregador)
+        return carregador
+
+    def carregar(self, registros: List[Tuple[int, Dict]]) -> Tuple[int, int, int]:
+        por_banco: Dict[str, List[Tuple[int, Dict]]] = {}
+        for numero, r in registros:
+            banco = fragmentos.do_cpf(chave_cpf(r['cpf'])) or DEFAULT_DB_ALIAS
+            por_banco.setdefault(banco, []).append((numero, r))
+        totais = [0, 0, 0]
+        for banco, parte in por_banco.items():
+            for i, valor in enumerate(self._abrir(banco).carregar(parte)):
+                totais[i] += valor
+        return tuple(totais)
+
+
+def _carregador(conflito: str, tamanho_bloco: int):
+    return _CarregadorFragmentado(conflito, tamanho_bloco)
+
+
+def _carregar(carregador, registros: List[Tuple[int, Dict]], resumo: ResumoImportacaoDTO) -> None:
+    if not registros:
+        return
+    inseridas, atualizadas, ignoradas = carregador.carregar(registros)
+    if atualizadas:
+        cache_pessoas.invalidar(*(str(chave_cpf(r['cpf'])) for _, r in registros))
+    resumo.inseridas += inseridas
+    resumo.atualizadas += atualizadas
+    resumo.ignoradas += ignoradas
+
+
+def _finalizar(resumo: ResumoImportacaoDTO) -> None:
+    if resumo.inseridas or resumo.atualizadas:
+        # Uma carga em massa não passa pelos deltas do PessoaService
+        estatisticas.reconstruir()
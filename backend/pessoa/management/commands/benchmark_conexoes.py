@@ -0,0 +1,124 @@
+import copy
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from ...medicao import resumir_latencias
+from ...models import Pessoa
+
+SEM_REUSO = 'sem_reuso'
+PERSISTENTE = 'persistente'
+POOL = 'pool'
+MODOS = (SEM_REUSO, PERSISTENTE, POOL)
+
+
+def _configuracao(base: dict, modo: str, tamanho_pool: int) -> dict:
+    configuracao = copy.deepcopy(base)
+    opcoes = configuracao['OPTIONS'] = dict(configuracao.get('OPTIONS') or {})
+    opcoes.pop('pool', None)
+    if modo == POOL:
+        configuracao['CONN_MAX_AGE'] = 0
+        opcoes['pool'] = {'min_size': 1, 'max_size': tamanho_pool}
+    elif modo == PERSISTENTE:
+        configuracao['CONN_MAX_AGE'] = 600
+        configuracao['CONN_HEALTH_CHECKS'] = True
+    else:
+        configuracao['CONN_MAX_AGE'] = 0
+    return configuracao
+
+
+def _pool_disponivel() -> bool:
+    if connections['default'].vendor != 'postgresql':
+        return False
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência por requisição sem reuso de conexão, com conexões persistentes e com pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=1000, help='Requisições simuladas por modo')
+        parser.add_argument('--threads', type=int, default=4, help='Requisições simultâneas')
+        parser.add_argument('--pool-max', type=int, default=4, help='Tamanho máximo do pool no modo pool')
+        parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def handle(self, *args, **options):
+        if options['requisicoes'] < 1 or options['threads'] < 1:
+            raise CommandError('--requisicoes e --threads devem ser positivos')
+        base = connections['default'].settings_dict
+        # A consulta medida é a da pesquisa por CPF: pela chave numérica indexada
+        chave = Pessoa.objects.values_list('cpf_num', flat=True).first() or 0
+
+        resultados = {}
+        for modo in options['modos']:
+            if modo == POOL and not _pool_disponivel():
+                self.stderr.write('Modo pool ignorado: requer PostgreSQL com psycopg 3 e psycopg_pool')
+                continue
+            resultados[modo] = self._medir(
+                f'benchmark_{modo}', _configuracao(base, modo, options['pool_max']), chave,
+                options['requisicoes'], options['threads']
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados))
+            return
+        for modo, resultado in resultados.items():
+            self.stdout.write(
+                f"{modo:<12} {resultado['vazao_rps']:>9} req/s | p50 {resultado['p50_ms']} ms | "
+                f"p95 {resultado['p95_ms']} ms | p99 {resultado['p99_ms']} ms | "
+                f"{resultado['conexoes_abertas']} conexões abertas"
+            )
+
+    def _medir(self, alias: str, configuracao: dict, chave: int, requisicoes: int, threads: int) -> dict:
+        connections.settings[alias] = configuracao
+        abertas = []
+
+        def executar(quantidade):
+            conexao = connections[alias]
+            latencias = []
+            try:
+                for _ in range(quantidade):
+                    inicio = time.perf_counter()
+                    # Mesmo ciclo dos sinais request_started/request_finished
+                    conexao.close_if_unusable_or_obsolete()
+                    Pessoa.objects.using(alias).filter(cpf_num=chave).values_list('id', flat=True).first()
+                    conexao.close_if_unusable_or_obsolete()
+                    latencias.append(time.perf_counter() - inicio)
+            finally:
+                conexao.close()
+            return latencias
+
+        # No modo pool o sinal marca cada retirada do pool; as conexões
+        # realmente abertas vêm das estatísticas do psycopg_pool
+        def contar(sender, connection, **kwargs):
+            if connection.alias == alias:
+                abertas.append(1)
+
+        connection_created.connect(contar, weak=False)
+        try:
+            partes = [requisicoes // threads + (1 if i < requisicoes % threads else 0) for i in range(threads)]
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                latencias = [l for parte in executor.map(executar, partes) for l in parte]
+            duracao = time.perf_counter() - inicio
+        finally:
+            connection_created.disconnect(contar)
+            conexoes_abertas = len(abertas)
+            if configuracao['OPTIONS'].get('pool'):
+                conexoes_abertas = connections[alias].pool.get_stats().get('connections_num', 0)
+                connections[alias].close_pool()
+            del connections.settings[alias]
+
+        resultado = resumir_latencias(latencias, duracao)
+        resultado['conexoes_abertas'] = conexoes_abertas
+        return resultado
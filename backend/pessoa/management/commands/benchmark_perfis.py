@@ -0,0 +1,134 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PERFIS = ('backend.settings', 'backend.settings_api')
+# Rota medida: passa por todos os middlewares e não consulta o banco
+CAMINHO = '/api/pessoa/cache/'
+
+# Roda em um processo novo por medição, como um worker recém-iniciado:
+# imprime uma linha ao responder a primeira requisição e, no fim, o JSON
+MEDICAO = r'''
+import time
+inicio = time.perf_counter()
+import json, sys
+from wsgiref.util import setup_testing_defaults
+import django
+django.setup()
+importacao = time.perf_counter() - inicio
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+from django.urls import resolve
+
+caminho, requisicoes = sys.argv[1], int(sys.argv[2])
+
+
+def ambiente():
+    dados = {'PATH_INFO': caminho, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(dados)
+    return dados
+
+
+def responder(status, cabecalhos):
+    responder.status = status
+
+
+aplicacao = WSGIHandler()
+b''.join(aplicacao(ambiente(), responder))
+primeira = time.perf_counter() - inicio
+print('pronto', flush=True)
+if not responder.status.startswith('200'):
+    raise SystemExit(f'{caminho} respondeu {responder.status}')
+
+antes = time.perf_counter()
+for _ in range(requisicoes):
+    b''.join(aplicacao(ambiente(), responder))
+completa = (time.perf_counter() - antes) / requisicoes
+
+# A mesma view chamada direto: a diferença é o custo do handler, da resolução
+# da URL e dos middlewares
+view = resolve(caminho).func
+pedidos = [WSGIRequest(ambiente()) for _ in range(requisicoes)]
+antes = time.perf_counter()
+for pedido in pedidos:
+    view(pedido).render()
+so_view = (time.perf_counter() - antes) / requisicoes
+
+print(json.dumps({
+    'importacao_ms': importacao * 1000,
+    'primeira_resposta_ms': primeira * 1000,
+    'requisicao_us': completa * 1e6,
+    'sobrecarga_us': (completa - so_view) * 1e6,
+    'middlewares': len(settings.MIDDLEWARE),
+    'apps': len(settings.INSTALLED_APPS),
+    'modulos': len(sys.modules),
+    'numpy': 'numpy' in sys.modules,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Compara perfis de configuração: tempo de importação, início do worker até a primeira '
+            'resposta e custo dos middlewares por requisição')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfis', nargs='+', default=list(PERFIS), help='Módulos de configuração comparados')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Processos iniciados por perfil (vale a mediana)')
+        parser.add_argument('--requisicoes', type=int, default=2000, help='Requisições medidas em cada processo')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1 or options['requisicoes'] < 1:
+            raise CommandError('--repeticoes e --requisicoes devem ser positivos')
+
+        resultados = {
+            perfil: self._medir(perfil, options['repeticoes'], options['requisicoes']) for perfil in options['perfis']
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados))
+            return
+        for perfil, resultado in resultados.items():
+            self.stdout.write(
+                f"{perfil:<24} importação {resultado['importacao_ms']} ms | "
+                f"worker pronto em {resultado['inicio_worker_ms']} ms | "
+                f"requisição {resultado['requisicao_us']} µs, {resultado['sobrecarga_us']} µs fora da view | "
+                f"{resultado['apps']} apps, {resultado['middlewares']} middlewares, {resultado['modulos']} módulos"
+            )
+
+    def _medir(self, perfil: str, repeticoes: int, requisicoes: int) -> dict:
+        ambiente = {**os.environ, 'DJANGO_SETTINGS_MODULE': perfil}
+        medidas = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            processo = subprocess.Popen(
+                [sys.executable, '-c', MEDICAO, CAMINHO, str(requisicoes)],
+                cwd=settings.BASE_DIR, env=ambiente, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+            # Do fork até a primeira resposta, incluindo o início do interpretador
+            pronto = processo.stdout.readline()
+            inicio_worker = time.perf_counter() - inicio
+            # Não usa communicate(): ele lê direto do descritor e perderia o que
+            # o readline() acima já trouxe para o buffer (às vezes, o JSON todo)
+            saida = processo.stdout.read()
+            erros = processo.stderr.read()
+            processo.wait()
+            if processo.returncode or pronto.strip() != 'pronto':
+                raise CommandError(f'Falha ao medir {perfil}:\n{erros.strip()}')
+            medida = json.loads(saida)
+            medida['inicio_worker_ms'] = inicio_worker * 1000
+            medidas.append(medida)
+
+        resultado = {}
+        for chave in ('importacao_ms', 'inicio_worker_ms', 'primeira_resposta_ms', 'requisicao_us', 'sobrecarga_us'):
+            resultado[chave] = round(statistics.median(m[chave] for m in medidas), 1)
+        for chave in ('middlewares', 'apps', 'modulos', 'numpy'):
+            resultado[chave] = medidas[-1][chave]
+        return resultado
@@ -0,0 +1,187 @@
+import json
+import logging
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ...cache import cache_pessoas
+from ...importacao import importar_registros
+from ...medicao import resumir_latencias
+from ...models import Pessoa
+from ...normalizacao import chave_cpf
+from ...sintetico import LIMITE_INDICE, cpf_sintetico, gerar_pessoas
+
+OPERACOES = ('criar', 'pesquisar', 'peso_ideal', 'listar', 'atualizar', 'excluir')
+TAMANHOS = (1000, 100_000, 1_000_000)
+# Requisições extras de cada operação medidas com tracemalloc, fora das latências
+AMOSTRA_MEMORIA = 20
+# Pessoas criadas (e depois excluídas) durante a medição, longe da base semeada
+INICIO_NOVOS = LIMITE_INDICE // 2
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, vazão e pico de memória das rotas de pessoa com bases sintéticas de vários tamanhos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS),
+                            help='Tamanhos da base, em ordem crescente (padrão: 1000 100000 1000000)')
+        parser.add_argument('--requisicoes', type=int, default=200, help='Requisições medidas por operação')
+        parser.add_argument('--operacoes', nargs='+', choices=OPERACOES, default=list(OPERACOES))
+        parser.add_argument('--semente', type=int, default=0)
+        parser.add_argument('--saida', help='Arquivo JSON de resultados (padrão: saída padrão)')
+        parser.add_argument('--banco-atual', action='store_true',
+                            help='Usa o banco configurado em vez de criar um banco de teste; grava nele')
+        parser.add_argument('--manter-banco', action='store_true',
+                            help='Reaproveita o banco de teste entre execuções, como o --keepdb do test')
+
+    def handle(self, *args, **options):
+        tamanhos = options['tamanhos']
+        if options['requisicoes'] < 1 or any(t < 1 for t in tamanhos):
+            raise CommandError('--tamanhos e --requisicoes devem ser positivos')
+        if tamanhos != sorted(tamanhos):
+            raise CommandError('--tamanhos deve estar em ordem crescente')
+        if max(tamanhos) > INICIO_NOVOS:
+            raise CommandError(f'O maior tamanho suportado é {INICIO_NOVOS}')
+
+        try:
+            setup_test_environment()
+            ambiente_proprio = True
+        except RuntimeError:
+            # Já preparado, como quando o comando roda dentro da suíte de testes
+            ambiente_proprio = False
+        # Os logs INFO de cada requisição poluiriam a saída e a medição
+        logging.disable(logging.INFO)
+        nome_original = None
+        if not options['banco_atual']:
+            nome_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['manter_banco'])
+        try:
+            resultados = self._executar(tamanhos, options)
+        finally:
+            if nome_original is not None:
+                connection.creation.destroy_test_db(nome_original, verbosity=0, keepdb=options['manter_banco'])
+            logging.disable(logging.NOTSET)
+            if ambiente_proprio:
+                teardown_test_environment()
+
+        saida = json.dumps(resultados, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida + '\n')
+            self.stderr.write(f"Resultados gravados em {options['saida']}")
+        else:
+            self.stdout.write(saida)
+
+    def _executar(self, tamanhos, options) -> dict:
+        resultados = {
+            'ambiente': {
+                'banco': connection.vendor,
+                'commit': _commit(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'requisicoes': options['requisicoes'],
+                'semente': options['semente'],
+            },
+            'resultados': {},
+        }
+        cliente = APIClient()
+        semeadas = 0
+        for tamanho in tamanhos:
+            inicio = time.perf_counter()
+            importar_registros(gerar_pessoas(tamanho - semeadas, inicio=semeadas, semente=options['semente']))
+            semeadura = time.perf_counter() - inicio
+            semeadas = tamanho
+            self.stderr.write(f"Base com {tamanho} pessoas semeada em {semeadura:.1f}s")
+
+            aleatorio = random.Random(f"{options['semente']}:{tamanho}")
+            existentes = [cpf_sintetico(aleatorio.randrange(tamanho)) for _ in range(options['requisicoes'] + AMOSTRA_MEMORIA)]
+            novos = list(gerar_pessoas(options['requisicoes'] + AMOSTRA_MEMORIA, inicio=INICIO_NOVOS, semente=options['semente']))
+            for pessoa in novos:
+                pessoa['data_nasc'] = pessoa['data_nasc'].isoformat()
+            requisicoes = self._requisicoes(existentes, novos)
+
+            operacoes = {}
+            for operacao in (o for o in OPERACOES if o in options['operacoes']):
+                operacoes[operacao] = self._medir(cliente, requisicoes[operacao], options['requisicoes'])
+                self.stderr.write(f"  {operacao:<11} p50 {operacoes[operacao]['p50_ms']} ms | "
+                                  f"p99 {operacoes[operacao]['p99_ms']} ms | {operacoes[operacao]['vazao_rps']} req/s")
+            if 'criar' in operacoes and 'excluir' not in operacoes:
+                # Mantém a base no tamanho semeado para o próximo tamanho
+                Pessoa.objects.filter(cpf_num__in=[chave_cpf(p['cpf']) for p in novos]).delete()
+
+            resultados['resultados'][str(tamanho)] = {
+                'pessoas': Pessoa.objects.count(),
+                'semeadura_s': round(semeadura, 2),
+                'operacoes': operacoes,
+            }
+        return resultados
+
+    @staticmethod
+    def _requisicoes(existentes, novos) -> dict:
+        # (método, caminho, corpo, status esperado) de cada requisição
+        def url(nome, *args):
+            return reverse(f'backend.pessoa:{nome}', args=args)
+
+        return {
+            'criar': [('post', url('pessoa-criar'), p, 201) for p in novos],
+            'pesquisar': [('get', url('pessoa-pesquisar', cpf), None, 200) for cpf in existentes],
+            'peso_ideal': [('get', url('pessoa-peso-ideal', cpf), None, 200) for cpf in existentes],
+            'listar': [('get', f"{url('pessoa-listar')}?limite=50", None, 200) for _ in existentes],
+            'atualizar': [
+                ('patch', url('pessoa-atualizar', cpf), {'peso': 60.0 + i % 40}, 200) for i, cpf in enumerate(existentes)
+            ],
+            'excluir': [('delete', url('pessoa-excluir', p['cpf']), None, 204) for p in novos],
+        }
+
+    @staticmethod
+    def _medir(cliente, requisicoes, quantidade: int) -> dict:
+        # Cada operação começa com o cache de pessoas frio
+        cache_pessoas.limpar()
+        latencias, erros = [], 0
+
+        def enviar(metodo, caminho, corpo, esperado):
+            nonlocal erros
+            resposta = getattr(cliente, metodo)(caminho, corpo, format='json') if corpo else getattr(cliente, metodo)(caminho)
+            if resposta.status_code != esperado:
+                erros += 1
+
+        inicio = time.perf_counter()
+        for requisicao in requisicoes[:quantidade]:
+            antes = time.perf_counter()
+            enviar(*requisicao)
+            latencias.append(time.perf_counter() - antes)
+        duracao = time.perf_counter() - inicio
+
+        pico = 0
+        tracemalloc.start()
+        try:
+            for requisicao in requisicoes[quantidade:]:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                enviar(*requisicao)
+                pico = max(pico, tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+
+        resultado = resumir_latencias(latencias, duracao)
+        resultado['erros'] = erros
+        resultado['pico_memoria_kb'] = round(pico / 1024, 1)
+        return resultado
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importacao import ATUALIZAR, IGNORAR, importar_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa pessoas de um arquivo CSV (COPY no PostgreSQL, bulk_create nos demais bancos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='CSV com as colunas nome, cpf, data_nasc, sexo, altura, peso')
+        parser.add_argument('--conflito', choices=[IGNORAR, ATUALIZAR], default=IGNORAR,
+                            help='O que fazer quando o CPF já existe (padrão: ignorar)')
+        parser.add_argument('--bloco', type=int, default=5000, help='Linhas validadas e carregadas por vez')
+        parser.add_argument('--delimitador', default=',')
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--rejeitados', help='Arquivo CSV para as linhas rejeitadas (padrão: <arquivo>.rejeitados.csv)')
+
+    def handle(self, *args, **options):
+        caminho_rejeitados = options['rejeitados'] or f"{options['arquivo']}.rejeitados.csv"
+
+        def progresso(resumo):
+            self.stdout.write(
+                f"{resumo.lidas} linhas lidas: {resumo.inseridas} inseridas, "
+                f"{resumo.atualizadas} atualizadas, {resumo.ignoradas} ignoradas, "
+                f"{resumo.rejeitadas} rejeitadas"
+            )
+
+        try:
+            with open(options['arquivo'], newline='', encoding=options['encoding']) as arquivo, \
+                    open(caminho_rejeitados, 'w', newline='', encoding='utf-8') as rejeitados:
+                resumo = importar_csv(
+                    arquivo,
+                    conflito=options['conflito'],
+                    tamanho_bloco=options['bloco'],
+                    delimitador=options['delimitador'],
+                    rejeitados=rejeitados,
+                    progresso=progresso,
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Erro ao importar pessoas: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída: {resumo.inseridas} inseridas, {resumo.atualizadas} atualizadas, "
+            f"{resumo.ignoradas} ignoradas, {resumo.rejeitadas} rejeitadas"
+        ))
+        if resumo.rejeitadas:
+            self.stdout.write(f"Linhas rejeitadas gravadas em {caminho_rejeitados}")
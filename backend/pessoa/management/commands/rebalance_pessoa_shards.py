@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import fragmentos
+
+
+class Command(BaseCommand):
+    help = 'Prepara as faixas de id dos fragmentos de PESSOA_FRAGMENTOS e move cada pessoa para o fragmento do seu CPF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloco', type=int, default=getattr(settings, 'PESSOA_LOTE_BATCH_SIZE', 1000),
+                            help='Pessoas lidas de cada fragmento por vez')
+        parser.add_argument('--simular', action='store_true',
+                            help='Só conta quantas pessoas seriam movidas, sem alterar os bancos')
+
+    def handle(self, *args, **options):
+        if not fragmentos.ativo():
+            raise CommandError('Configure ao menos dois bancos em PESSOA_FRAGMENTOS')
+        if options['bloco'] < 1:
+            raise CommandError('--bloco deve ser positivo')
+
+        inicio = time.perf_counter()
+        if not options['simular']:
+            fragmentos.preparar_ids()
+        movidas = fragmentos.rebalancear(options['bloco'], options['simular'])
+        verbo = 'seriam movidas' if options['simular'] else 'movidas'
+        for (origem, destino), quantidade in sorted(movidas.items()):
+            self.stdout.write(f"{origem} -> {destino}: {quantidade} pessoas {verbo}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(movidas.values())} pessoas {verbo} em {time.perf_counter() - inicio:.2f}s"
+        ))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...estatisticas import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Recalcula do zero o resumo e os histogramas usados pelas estatísticas da população'
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Estatísticas reconstruídas a partir de {total} pessoas em {time.perf_counter() - inicio:.2f}s"
+        ))
@@ -0,0 +1,66 @@
+import multiprocessing
+import signal
+import threading
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ... import fila
+
+
+def _parar_com_sinais(parar) -> dict:
+    # SIGTERM/SIGINT terminam a tarefa em andamento antes de sair; devolve os
+    # tratadores anteriores
+    return {sinal: signal.signal(sinal, lambda *_: parar.set()) for sinal in (signal.SIGINT, signal.SIGTERM)}
+
+
+def _processo(parar, intervalo: float, ate_esvaziar: bool) -> None:
+    # Com spawn (Windows, macOS) o processo filho começa sem o Django carregado
+    django.setup()
+    _parar_com_sinais(parar)
+    fila.trabalhar(parar, intervalo, ate_esvaziar)
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas enfileiradas (lotes grandes, reconstrução das estatísticas) com um ou mais processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=1, help='Processos trabalhadores (padrão: 1)')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos entre consultas à fila quando ela está vazia')
+        parser.add_argument('--ate-esvaziar', action='store_true',
+                            help='Sai quando não houver mais tarefas disponíveis, em vez de aguardar novas')
+
+    def handle(self, *args, **options):
+        processos, intervalo, ate_esvaziar = options['processos'], options['intervalo'], options['ate_esvaziar']
+        if processos < 1 or intervalo <= 0:
+            raise CommandError('--processos e --intervalo devem ser positivos')
+
+        if processos == 1:
+            parar = threading.Event()
+            anteriores = _parar_com_sinais(parar)
+            try:
+                executadas = fila.trabalhar(parar, intervalo, ate_esvaziar)
+            finally:
+                for sinal, tratador in anteriores.items():
+                    signal.signal(sinal, tratador)
+            self.stdout.write(f"{executadas} tarefas executadas")
+            return
+
+        parar = multiprocessing.Event()
+        _parar_com_sinais(parar)
+        # Conexões abertas não podem ser herdadas pelos processos filhos
+        connections.close_all()
+        filhos = [
+            multiprocessing.Process(target=_processo, args=(parar, intervalo, ate_esvaziar), daemon=False)
+            for _ in range(processos)
+        ]
+        for filho in filhos:
+            filho.start()
+        self.stdout.write(f"{processos} trabalhadores iniciados")
+        for filho in filhos:
+            filho.join()
+        falhas = [filho.exitcode for filho in filhos if filho.exitcode]
+        if falhas:
+            raise CommandError(f"{len(falhas)} trabalhadores terminaram com erro")
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importacao import ATUALIZAR, IGNORAR, importar_registros
+from ...sintetico import LIMITE_INDICE, gerar_pessoas
+
+
+class Command(BaseCommand):
+    help = 'Gera pessoas sintéticas (CPFs válidos, alturas e pesos realistas) com a mesma carga do import_pessoas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quantidade', type=int, help='Quantidade de pessoas a gerar')
+        parser.add_argument('--inicio', type=int, default=0,
+                            help='Índice da primeira pessoa; o mesmo índice gera sempre o mesmo CPF')
+        parser.add_argument('--semente', type=int, default=0, help='Semente dos nomes, datas e medidas')
+        parser.add_argument('--bloco', type=int, default=5000, help='Pessoas carregadas por vez')
+        parser.add_argument('--conflito', choices=[IGNORAR, ATUALIZAR], default=IGNORAR,
+                            help='O que fazer quando o CPF já existe (padrão: ignorar)')
+
+    def handle(self, *args, **options):
+        quantidade, inicio = options['quantidade'], options['inicio']
+        if quantidade < 1 or options['bloco'] < 1:
+            raise CommandError('quantidade e --bloco devem ser positivos')
+        if inicio < 0 or inicio + quantidade > LIMITE_INDICE:
+            raise CommandError(f'Os índices gerados devem ficar entre 0 e {LIMITE_INDICE - 1}')
+
+        def progresso(resumo):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{resumo.lidas} de {quantidade} geradas")
+
+        comeco = time.perf_counter()
+        resumo = importar_registros(
+            gerar_pessoas(quantidade, inicio=inicio, semente=options['semente']),
+            conflito=options['conflito'],
+            tamanho_bloco=options['bloco'],
+            progresso=progresso,
+        )
+        duracao = time.perf_counter() - comeco
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo.inseridas} inseridas, {resumo.atualizadas} atualizadas, {resumo.ignoradas} ignoradas "
+            f"em {duracao:.2f}s ({resumo.lidas / duracao:.0f} pessoas/s)"
+        ))
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...medicao import resumir_latencias
+
+
+async def _requisitar(host: str, porta: int, caminho: str) -> int:
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        escritor.write(
+            f"GET {caminho} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+        )
+        await escritor.drain()
+        status = int((await leitor.readline()).split()[1])
+        # Lê a resposta inteira, como um cliente real faria
+        while await leitor.read(65536):
+            pass
+        return status
+    finally:
+        escritor.close()
+
+
+async def _executar(url: str, conexoes: int, duracao: float, lentos: int):
+    partes = urlsplit(url)
+    host, porta = partes.hostname, partes.port or 80
+    caminho = partes.path + (f"?{partes.query}" if partes.query else '')
+    latencias, erros = [], 0
+    fim = time.monotonic() + duracao
+
+    async def cliente():
+        nonlocal erros
+        while time.monotonic() < fim:
+            inicio = time.monotonic()
+            try:
+                status = await _requisitar(host, porta, caminho)
+            except (OSError, ValueError, IndexError):
+                erros += 1
+                continue
+            if status >= 500:
+                erros += 1
+            else:
+                latencias.append(time.monotonic() - inicio)
+
+    async def cliente_lento():
+        # Abre a conexão e envia a requisição aos poucos, segurando o worker
+        try:
+            _, escritor = await asyncio.open_connection(host, porta)
+        except OSError:
+            return
+        try:
+            escritor.write(f"GET {caminho} HTTP/1.1\r\n".encode())
+            while time.monotonic() < fim:
+                escritor.write(b"X-Lento: 1\r\n")
+                await escritor.drain()
+                await asyncio.sleep(1)
+        except OSError:
+            pass
+        finally:
+            escritor.close()
+
+    inicio = time.monotonic()
+    await asyncio.gather(
+        *(cliente() for _ in range(conexoes)),
+        *(cliente_lento() for _ in range(lentos)),
+    )
+    return latencias, erros, time.monotonic() - inicio
+
+
+class Command(BaseCommand):
+    help = 'Gera carga HTTP contra um servidor em execução e mede latência e vazão'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='URL completa, ex.: http://127.0.0.1:8000/api/pessoa/async/pesquisar/')
+        parser.add_argument('--conexoes', type=int, default=50, help='Clientes simultâneos')
+        parser.add_argument('--duracao', type=float, default=10, help='Duração em segundos')
+        parser.add_argument('--lentos', type=int, default=0,
+                            help='Conexões extras que enviam cabeçalhos aos poucos durante todo o teste')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado em JSON')
+
+    def handle(self, *args, **options):
+        if not options['url'].startswith('http://'):
+            raise CommandError('Apenas URLs http:// são suportadas')
+        latencias, erros, duracao = asyncio.run(_executar(
+            options['url'], options['conexoes'], options['duracao'], options['lentos']
+        ))
+        resultado = resumir_latencias(latencias, duracao)
+        resultado['erros'] = erros
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultado))
+            return
+        self.stdout.write(
+            f"{resultado['requisicoes']} requisições em {duracao:.1f}s ({resultado['vazao_rps']} req/s), "
+            f"{erros} erros"
+        )
+        self.stdout.write(
+            f"p50 {resultado['p50_ms']} ms | p95 {resultado['p95_ms']} ms | "
+            f"p99 {resultado['p99_ms']} ms | máx {resultado['max_ms']} ms"
+        )
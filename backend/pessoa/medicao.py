@@ -0,0 +1,22 @@
+import math
+from typing import Dict, List, Sequence
+
+
+def percentil(valores: Sequence[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    # Método do posto mais próximo
+    posicao = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[posicao]
+
+
+def resumir_latencias(latencias: List[float], duracao: float) -> Dict[str, float]:
+    return {
+        'requisicoes': len(latencias),
+        'vazao_rps': round(len(latencias) / duracao, 1) if duracao else 0.0,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+        'max_ms': round(max(latencias) * 1000, 2) if latencias else 0.0,
+    }
@@ -0,0 +1,383 @@
+import atexit
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from .admissao import estatisticas_admissao
+from .cache import cache_pessoas
+
+PREFIXO_INSTRUMENTADO = '/api/pessoa/'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+INTERVALO_GRAVACAO_PADRAO = 5.0
+
+# Limites superiores das classes de cada histograma
+HISTOGRAMAS = {
+    'pessoa_requisicao_duracao_segundos': (
+        'Duração das requisições por view',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    ),
+    'pessoa_requisicao_consultas': (
+        'Consultas ao banco por requisição',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'pessoa_resposta_tamanho_bytes': (
+        'Tamanho do corpo das respostas (exceto as em streaming)',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+CONTADORES = {
+    'pessoa_requisicoes_total': 'Requisições por view, método e status',
+    'pessoa_consultas_duracao_segundos_total': 'Tempo gasto em consultas ao banco por view',
+    'pessoa_cache_leituras_total': 'Leituras do cache de pessoas por resultado',
+    'pessoa_admissao_rejeitadas_total': 'Requisições recusadas pelo controle de admissão por classe e motivo',
+}
+# Valores instantâneos; com vários workers, a soma de todos os processos
+MEDIDORES = {
+    'pessoa_admissao_em_uso': 'Requisições em atendimento por classe de admissão',
+    'pessoa_admissao_aguardando': 'Requisições na fila de admissão por classe',
+}
+
+Rotulos = Tuple[Tuple[str, str], ...]
+Chave = Tuple[str, Rotulos]
+
+
+class _Fragmento:
+    # Cada thread escreve apenas no próprio fragmento; a exportação copia e
+    # soma todos, então o caminho da requisição não disputa locks
+    def __init__(self):
+        self.contadores: Dict[Chave, float] = {}
+        self.histogramas: Dict[Chave, List[float]] = {}
+
+    def somar(self, nome: str, rotulos: Rotulos, valor: float = 1) -> None:
+        chave = (nome, rotulos)
+        self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, rotulos: Rotulos, valor: float) -> None:
+        limites = HISTOGRAMAS[nome][1]
+        chave = (nome, rotulos)
+        classes = self.histogramas.get(chave)
+        if classes is None:
+            # Uma posição por limite, uma para +Inf, a soma e a contagem
+            classes = self.histogramas[chave] = [0] * (len(limites) + 3)
+        classes[bisect_left(limites, valor)] += 1
+        classes[-2] += valor
+        classes[-1] += 1
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._local = threading.local()
+        self._fragmentos: List[_Fragmento] = []
+        self._lock = threading.Lock()
+        self._ultima_gravacao = 0.0
+
+    @property
+    def fragmento(self) -> _Fragmento:
+        fragmento = getattr(self._local, 'fragmento', None)
+        if fragmento is None:
+            fragmento = self._local.fragmento = _Fragmento()
+            with self._lock:
+                self._fragmentos.append(fragmento)
+        return fragmento
+
+    def registrar_requisicao(self, view: str, metodo: str, status: int, duracao: float,
+                             consultas: int, tempo_consultas: float, tamanho: Optional[int]) -> None:
+        fragmento = self.fragmento
+        rotulos = (('view', view),)
+        fragmento.somar('pessoa_requisicoes_total', (('view', view), ('metodo', metodo), ('status', str(status))))
+        fragmento.somar('pessoa_consultas_duracao_segundos_total', rotulos, tempo_consultas)
+        fragmento.observar('pessoa_requisicao_duracao_segundos', rotulos, duracao)
+        fragmento.observar('pessoa_requisicao_consultas', rotulos, consultas)
+        if tamanho is not None:
+            fragmento.observar('pessoa_resposta_tamanho_bytes', rotulos, tamanho)
+        self._gravar_periodicamente()
+
+    def instantaneo(self) -> Tuple[Dict[Chave, float], Dict[Chave, List[float]]]:
+        contadores: Dict[Chave, float] = {}
+        histogramas: Dict[Chave, List[float]] = {}
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        for fragmento in fragmentos:
+            # dict.copy() é atômico sob o GIL mesmo com a thread dona escrevendo
+            _somar(contadores, histogramas, fragmento.contadores.copy(), fragmento.histogramas.copy())
+        cache = cache_pessoas.estatisticas()
+        for resultado in ('acertos_local', 'acertos_compartilhado', 'faltas', 'coalescidas'):
+            contadores[('pessoa_cache_leituras_total', (('resultado', resultado),))] = cache[resultado]
+        admissao = estatisticas_admissao()
+        for classe, dados in admissao['classes'].items():
+            contadores[('pessoa_admissao_em_uso', (('classe', classe),))] = dados['em_uso']
+            contadores[('pessoa_admissao_aguardando', (('classe', classe),))] = dados['aguardando']
+            for motivo, quantidade in dados['rejeitadas'].items():
+                contadores[('pessoa_admissao_rejeitadas_total', (('classe', classe), ('motivo', motivo)))] = quantidade
+        if admissao['limitadas_por_taxa']:
+            chave = ('pessoa_admissao_rejeitadas_total', (('classe', 'todas'), ('motivo', 'taxa')))
+            contadores[chave] = admissao['limitadas_por_taxa']
+        return contadores, histogramas
+
+    def limpar(self) -> None:
+        with self._lock:
+            for fragmento in self._fragmentos:
+                fragmento.contadores.clear()
+                fragmento.histogramas.clear()
+
+    def _gravar_periodicamente(self) -> None:
+        diretorio = getattr(settings, 'PESSOA_METRICAS_DIR', None)
+        if not diretorio:
+            return
+        intervalo = getattr(settings, 'PESSOA_METRICAS_INTERVALO', INTERVALO_GRAVACAO_PADRAO)
+        agora = time.monotonic()
+        if agora - self._ultima_gravacao < intervalo or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._ultima_gravacao = agora
+        finally:
+            self._lock.release()
+        self.gravar(diretorio)
+
+    def gravar(self, diretorio: str) -> None:
+        # Um arquivo por processo, trocado atomicamente; o /metrics de qualquer
+        # worker soma os arquivos de todos
+        contadores, histogramas = self.instantaneo()
+        dados = {
+            'contadores': [[nome, rotulos, valor] for (nome, rotulos), valor in contadores.items()],
+            'histogramas': [[nome, rotulos, classes] for (nome, rotulos), classes in histogramas.items()],
+        }
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, f'metricas-{os.getpid()}.json')
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        os.replace(temporario, caminho)
+
+    def exportar(self) -> str:
+        contadores, histogramas = self.instantaneo()
+        diretorio = getattr(settings, 'PESSOA_METRICAS_DIR', None)
+        if diretorio:
+            proprio = os.path.join(diretorio, f'metricas-{os.getpid()}.json')
+            for caminho in glob.glob(os.path.join(diretorio, 'metricas-*.json')):
+                if caminho == proprio:
+                    continue
+                pid = _pid(caminho)
+                if pid is not None and not _processo_vivo(pid):
+                    marcar_processo_encerrado(pid, diretorio)
+                try:
+                    with open(caminho, encoding='utf-8') as arquivo:
+                        dados = json.load(arquivo)
+                except (OSError, ValueError):
+                    continue
+                _somar(
+                    contadores, histogramas,
+                    {(nome, _rotulos(rotulos)): valor for nome, rotulos, valor in dados['contadores']},
+                    {(nome, _rotulos(rotulos)): classes for nome, rotulos, classes in dados['histogramas']},
+                )
+        return _formatar(contadores, histogramas)
+
+
+def _pid(caminho: str) -> Optional[int]:
+    try:
+        return int(os.path.basename(caminho)[len('metricas-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def _processo_vivo(pid: int) -> bool:
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def marcar_processo_encerrado(pid: int, diretorio: Optional[str] = None) -> None:
+    # Um worker encerrado sai dos medidores (valores instantâneos), mas os
+    # contadores e histogramas dele continuam somando no /metrics. O exportar()
+    # faz isso ao encontrar o arquivo de um processo que não existe mais; o
+    # hook child_exit do gunicorn pode chamá-la assim que o worker sai
+    diretorio = diretorio or getattr(settings, 'PESSOA_METRICAS_DIR', None)
+    if not diretorio:
+        return
+    caminho = os.path.join(diretorio, f'metricas-{pid}.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+    except (OSError, ValueError):
+        return
+    contadores = [linha for linha in dados['contadores'] if linha[0] not in MEDIDORES]
+    if len(contadores) == len(dados['contadores']):
+        return
+    dados['contadores'] = contadores
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, caminho)
+
+
+def _rotulos(rotulos) -> Rotulos:
+    return tuple((chave, valor) for chave, valor in rotulos)
+
+
+def _somar(contadores, histogramas, novos_contadores, novos_histogramas) -> None:
+    for chave, valor in novos_contadores.items():
+        contadores[chave] = contadores.get(chave, 0) + valor
+    for chave, classes in novos_histogramas.items():
+        atuais = histogramas.get(chave)
+        histogramas[chave] = list(classes) if atuais is None else [a + b for a, b in zip(atuais, classes)]
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def _serie(nome: str, rotulos: Rotulos, valor: float) -> str:
+    texto = ','.join(f'{chave}="{_escapar(v)}"' for chave, v in rotulos)
+    return f"{nome}{{{texto}}} {_numero(valor)}" if texto else f"{nome} {_numero(valor)}"
+
+
+def _formatar(contadores: Dict[Chave, float], histogramas: Dict[Chave, List[float]]) -> str:
+    linhas = []
+    for nome, descricao in CONTADORES.items():
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} counter']
+        linhas += [_serie(nome, rotulos, valor) for (n, rotulos), valor in sorted(contadores.items()) if n == nome]
+
+    for nome, descricao in MEDIDORES.items():
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} gauge']
+        linhas += [_serie(nome, rotulos, valor) for (n, rotulos), valor in sorted(contadores.items()) if n == nome]
+
+    leituras = {dict(rotulos)['resultado']: valor for (n, rotulos), valor in contadores.items() if n == 'pessoa_cache_leituras_total'}
+    total = sum(leituras.values())
+    acertos = leituras.get('acertos_local', 0) + leituras.get('acertos_compartilhado', 0)
+    linhas += [
+        '# HELP pessoa_cache_taxa_acerto Fração das leituras por CPF atendidas pelo cache',
+        '# TYPE pessoa_cache_taxa_acerto gauge',
+        _serie('pessoa_cache_taxa_acerto', (), round(acertos / total, 4) if total else 0.0),
+    ]
+
+    for nome, (descricao, limites) in HISTOGRAMAS.items():
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} histogram']
+        for (n, rotulos), classes in sorted(histogramas.items()):
+            if n != nome:
+                continue
+            acumulado = 0
+            for limite, quantidade in zip((*limites, '+Inf'), classes):
+                acumulado += quantidade
+                linhas.append(_serie(f'{nome}_bucket', (*rotulos, ('le', _numero(limite) if limite != '+Inf' else limite)), acumulado))
+            linhas.append(_serie(f'{nome}_sum', rotulos, classes[-2]))
+            linhas.append(_serie(f'{nome}_count', rotulos, classes[-1]))
+    return '\n'.join(linhas) + '\n'
+
+
+registro_metricas = RegistroMetricas()
+
+
+class _Consultas:
+    # As consultas de uma requisição podem rodar em várias threads ao mesmo
+    # tempo (fragmentos.espalhar leva o contexto junto): a soma usa um lock
+    __slots__ = ('quantidade', 'tempo', '_lock')
+
+    def __init__(self):
+        self.quantidade = 0
+        self.tempo = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, duracao: float) -> None:
+        with self._lock:
+            self.quantidade += 1
+            self.tempo += duracao
+
+
+# Visível também nas threads do sync_to_async, que copiam o contexto, ao
+# contrário de connection.execute_wrapper, que vale só para a thread atual
+_consultas_requisicao: contextvars.ContextVar[Optional[_Consultas]] = contextvars.ContextVar(
+    'pessoa_consultas_requisicao', default=None
+)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    consultas = _consultas_requisicao.get()
+    if consultas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        consultas.registrar(time.perf_counter() - inicio)
+
+
+def _ao_conectar(sender, connection, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _medir_consulta)
+
+
+connection_created.connect(_ao_conectar, dispatch_uid='pessoa_metricas_consultas')
+
+
+def _gravar_ao_sair():
+    diretorio = getattr(settings, 'PESSOA_METRICAS_DIR', None)
+    if diretorio:
+        registro_metricas.gravar(diretorio)
+
+
+atexit.register(_gravar_ao_sair)
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith(PREFIXO_INSTRUMENTADO):
+            return self.get_response(request)
+        consultas, inicio = _Consultas(), time.perf_counter()
+        token = _consultas_requisicao.set(consultas)
+        try:
+            response = self.get_response(request)
+        finally:
+            _consultas_requisicao.reset(token)
+        self._registrar(request, response, time.perf_counter() - inicio, consultas)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith(PREFIXO_INSTRUMENTADO):
+            return await self.get_response(request)
+        consultas, inicio = _Consultas(), time.perf_counter()
+        token = _consultas_requisicao.set(consultas)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _consultas_requisicao.reset(token)
+        self._registrar(request, response, time.perf_counter() - inicio, consultas)
+        return response
+
+    @staticmethod
+    def _registrar(request, response, duracao: float, consultas: _Consultas) -> None:
+        # Nome da rota em vez do caminho, para não criar uma série por CPF
+        correspondencia = getattr(request, 'resolver_match', None)
+        view = correspondencia.view_name if correspondencia else 'nao_encontrada'
+        tamanho = None if response.streaming else len(response.content)
+        registro_metricas.registrar_requisicao(
+            view, request.method, response.status_code, duracao, consultas.quantidade, consultas.tempo, tamanho
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pessoa',
+            options={'ordering': ['nome', 'id'], 'verbose_name': 'Pessoa', 'verbose_name_plural': 'Pessoas'},
+        ),
+        migrations.AddIndex(
+            model_name='pessoa',
+            index=models.Index(fields=['nome', 'id'], name='pessoa_nome_id_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 11:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0002_pessoa_nome_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pessoa',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Atualizado em'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 15:10
+
+import re
+from collections import defaultdict
+
+from django.db import migrations, models
+
+TAMANHO_LOTE = 1000
+
+
+def preencher_cpf_num(apps, schema_editor):
+    Pessoa = apps.get_model('pessoa', 'Pessoa')
+    por_numero = defaultdict(list)
+    invalidos = []
+    lote = []
+    for pessoa in Pessoa.objects.only('id', 'cpf').order_by('id').iterator(chunk_size=TAMANHO_LOTE):
+        digitos = re.sub(r'\D', '', pessoa.cpf)
+        if len(digitos) != 11:
+            invalidos.append(pessoa.id)
+            continue
+        pessoa.cpf = f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+        pessoa.cpf_num = int(digitos)
+        por_numero[pessoa.cpf_num].append(pessoa.id)
+        lote.append(pessoa)
+        if len(lote) >= TAMANHO_LOTE:
+            Pessoa.objects.bulk_update(lote, ['cpf', 'cpf_num'])
+            lote = []
+    if lote:
+        Pessoa.objects.bulk_update(lote, ['cpf', 'cpf_num'])
+
+    # A mesma pessoa gravada com e sem pontuação precisa ser resolvida à mão
+    duplicados = [ids for ids in por_numero.values() if len(ids) > 1]
+    if invalidos or duplicados:
+        raise RuntimeError(
+            f"Não foi possível preencher cpf_num: ids com CPF sem 11 dígitos {invalidos[:20]}, "
+            f"ids com o mesmo CPF {duplicados[:20]}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0003_pessoa_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pessoa',
+            name='cpf_num',
+            field=models.BigIntegerField(editable=False, null=True, verbose_name='CPF (numérico)'),
+        ),
+        migrations.RunPython(preencher_cpf_num, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pessoa',
+            name='cpf_num',
+            field=models.BigIntegerField(editable=False, unique=True, verbose_name='CPF (numérico)'),
+        ),
+        migrations.AlterField(
+            model_name='pessoa',
+            name='cpf',
+            field=models.CharField(max_length=14, verbose_name='CPF'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 16:05
+
+import unicodedata
+
+from django.db import migrations, models
+
+TAMANHO_LOTE = 1000
+
+
+def _normalizar_busca(valor):
+    decomposto = unicodedata.normalize('NFKD', valor or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def preencher_nome_busca(apps, schema_editor):
+    Pessoa = apps.get_model('pessoa', 'Pessoa')
+    lote = []
+    for pessoa in Pessoa.objects.only('id', 'nome').order_by('id').iterator(chunk_size=TAMANHO_LOTE):
+        pessoa.nome_busca = _normalizar_busca(pessoa.nome)
+        lote.append(pessoa)
+        if len(lote) >= TAMANHO_LOTE:
+            Pessoa.objects.bulk_update(lote, ['nome_busca'])
+            lote = []
+    if lote:
+        Pessoa.objects.bulk_update(lote, ['nome_busca'])
+
+
+def criar_indice_trigramas(apps, schema_editor):
+    # pg_trgm só existe no PostgreSQL; nos demais bancos a busca cai para LIKE
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS pessoa_nome_busca_trgm_idx "
+        "ON pessoa_pessoa USING gin (nome_busca gin_trgm_ops)"
+    )
+
+
+def remover_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS pessoa_nome_busca_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0004_pessoa_cpf_num'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pessoa',
+            name='nome_busca',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Nome para busca'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(preencher_nome_busca, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pessoa',
+            index=models.Index(fields=['nome_busca'], name='pessoa_nome_busca_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(criar_indice_trigramas, remover_indice_trigramas),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-18 17:20
+
+import math
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+
+from backend.pessoa import peso_ideal
+
+
+def _classe(valor, escala):
+    return math.floor(round(valor * escala, 6))
+
+
+def preencher_resumo(apps, schema_editor):
+    # Carga inicial; depois disso o resumo é mantido pelas escritas e pode ser
+    # refeito com manage.py rebuild_pessoa_stats
+    Pessoa = apps.get_model('pessoa', 'Pessoa')
+    ResumoPessoa = apps.get_model('pessoa', 'ResumoPessoa')
+    HistogramaPessoa = apps.get_model('pessoa', 'HistogramaPessoa')
+    resumo = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+    histograma = Counter()
+    linhas = Pessoa.objects.order_by().values_list('sexo', 'data_nasc', 'altura', 'peso').iterator(chunk_size=5000)
+    for sexo, data_nasc, altura, peso in linhas:
+        status_peso = peso_ideal.classificar(peso - peso_ideal.calcular(sexo, altura))
+        somas = resumo[(sexo, data_nasc.year, status_peso)]
+        for i, valor in enumerate((1, altura, altura ** 2, peso, peso ** 2)):
+            somas[i] += valor
+        histograma[('altura', sexo, _classe(altura, 100))] += 1
+        histograma[('peso', sexo, _classe(peso, 1))] += 1
+    ResumoPessoa.objects.bulk_create([
+        ResumoPessoa(
+            sexo=sexo, ano_nasc=ano_nasc, status_peso=status_peso, quantidade=somas[0],
+            soma_altura=somas[1], soma_altura_quadrados=somas[2], soma_peso=somas[3], soma_peso_quadrados=somas[4]
+        )
+        for (sexo, ano_nasc, status_peso), somas in resumo.items()
+    ], batch_size=500)
+    HistogramaPessoa.objects.bulk_create([
+        HistogramaPessoa(medida=medida, sexo=sexo, classe=classe, quantidade=quantidade)
+        for (medida, sexo, classe), quantidade in histograma.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0005_pessoa_nome_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistogramaPessoa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medida', models.CharField(choices=[('altura', 'Altura'), ('peso', 'Peso')], max_length=6)),
+                ('sexo', models.CharField(max_length=1)),
+                ('classe', models.IntegerField()),
+                ('quantidade', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'pessoa_histograma',
+                'constraints': [models.UniqueConstraint(fields=('medida', 'sexo', 'classe'), name='pessoa_histograma_chave')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoPessoa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sexo', models.CharField(max_length=1)),
+                ('ano_nasc', models.PositiveSmallIntegerField()),
+                ('status_peso', models.CharField(max_length=10)),
+                ('quantidade', models.BigIntegerField(default=0)),
+                ('soma_altura', models.FloatField(default=0)),
+                ('soma_altura_quadrados', models.FloatField(default=0)),
+                ('soma_peso', models.FloatField(default=0)),
+                ('soma_peso_quadrados', models.FloatField(default=0)),
+            ],
+            options={
+                'db_table': 'pessoa_resumo',
+                'constraints': [models.UniqueConstraint(fields=('sexo', 'ano_nasc', 'status_peso'), name='pessoa_resumo_chave')],
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
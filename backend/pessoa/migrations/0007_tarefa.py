@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 18:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0006_resumo_histograma'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('parametros', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=10)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=3)),
+                ('progresso', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(null=True)),
+                ('resultado', models.JSONField(null=True)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('trabalhador', models.CharField(blank=True, default='', max_length=100)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(null=True)),
+                ('concluido_em', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'pessoa_tarefa',
+                'indexes': [models.Index(fields=['estado', 'disponivel_em'], name='pessoa_tarefa_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 19:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_criado_em(apps, schema_editor):
+    # Sem registro da criação, a melhor estimativa é a última alteração
+    Pessoa = apps.get_model('pessoa', 'Pessoa')
+    Pessoa.objects.update(criado_em=F('atualizado_em'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoa', '0007_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pessoa',
+            name='criado_em',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Criado em'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(preencher_criado_em, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pessoa',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddIndex(
+            model_name='pessoa',
+            index=models.Index(fields=['atualizado_em', 'id'], name='pessoa_atualizado_id_idx'),
+        ),
+        migrations.CreateModel(
+            name='PessoaExcluida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pessoa_id', models.BigIntegerField()),
+                ('cpf', models.CharField(max_length=14)),
+                ('excluido_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'pessoa_exclusao',
+                'indexes': [models.Index(fields=['excluido_em', 'id'], name='pessoa_exclusao_feed_idx')],
+            },
+        ),
+    ]
@@ -1,19 +1,170 @@
-from django.db import models
+from django.db import connections, models
+from django.db.models import Case, F, IntegerField, Q, Value, When
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from .normalizacao import digitos_cpf, formatar_cpf, normalizar_busca
+from .peso_ideal import COEFICIENTES, MARGEM_ADEQUADO
+
+
+class PessoaQuerySet(models.QuerySet):
+    def com_peso_ideal(self):
+        # Mesma fórmula de peso_ideal.calcular, avaliada pelo banco
+        coef_m, const_m = COEFICIENTES['M']
+        coef_f, const_f = COEFICIENTES['F']
+        margem = MARGEM_ADEQUADO
+        return self.annotate(
+            peso_ideal=Case(
+                When(sexo='M', then=Value(coef_m) * F('altura') - Value(const_m)),
+                default=Value(coef_f) * F('altura') - Value(const_f),
+                output_field=models.FloatField()
+            )
+        ).annotate(
+            diferenca_peso=F('peso') - F('peso_ideal')
+        ).annotate(
+            status_peso=Case(
+                When(diferenca_peso__gte=-margem, diferenca_peso__lte=margem, then=Value('adequado')),
+                When(diferenca_peso__gt=margem, then=Value('acima')),
+                default=Value('abaixo'),
+                output_field=models.CharField()
+            )
+        )
+
+    def buscar(self, termo):
+        # Prefixo e semelhança por trigramas sobre nome_busca, já sem acentos;
+        # resultados que começam pelo termo vêm primeiro
+        termo = normalizar_busca(termo)
+        prefixo = Case(When(nome_busca__startswith=termo, then=Value(1)), default=Value(0), output_field=IntegerField())
+        if connections[self.db].vendor == 'postgresql':
+            from django.contrib.postgres.search import TrigramWordSimilarity
+            return self.filter(
+                Q(nome_busca__startswith=termo) | Q(nome_busca__trigram_word_similar=termo)
+            ).annotate(
+                prefixo=prefixo, similaridade=TrigramWordSimilarity(termo, 'nome_busca')
+            ).order_by('-prefixo', '-similaridade', 'nome', 'id')
+        # Sem pg_trgm (ex.: SQLite nos testes) a busca aproximada vira substring
+        return self.filter(nome_busca__contains=termo).annotate(prefixo=prefixo).order_by('-prefixo', 'nome', 'id')
+
 
 class Pessoa(models.Model):
     nome = models.CharField(max_length=100, verbose_name='Nome')
+    # Nome em minúsculas e sem acentos, indexado para a busca
+    nome_busca = models.CharField(max_length=100, editable=False, verbose_name='Nome para busca')
     data_nasc = models.DateField(verbose_name='Data de Nascimento')
-    cpf = models.CharField(max_length=14, unique=True, verbose_name='CPF')
+    cpf = models.CharField(max_length=14, verbose_name='CPF')
+    # Chave única das buscas: os 11 dígitos do CPF como inteiro
+    cpf_num = models.BigIntegerField(unique=True, editable=False, verbose_name='CPF (numérico)')
     sexo = models.CharField(max_length=1, choices=[('M', 'Masculino'), ('F', 'Feminino')], verbose_name='Sexo')
     altura = models.FloatField(validators=[MinValueValidator(0.1)], verbose_name='Altura (m)')
     peso = models.FloatField(validators=[MinValueValidator(0.1)], verbose_name='Peso (kg)')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    objects = PessoaQuerySet.as_manager()
 
     class Meta:
         db_table = 'pessoa_pessoa'
-        ordering = ['nome']
+        ordering = ['nome', 'id']
+        indexes = [
+            # Índice composto da paginação por cursor (keyset) em (nome, id)
+            models.Index(fields=['nome', 'id'], name='pessoa_nome_id_idx'),
+            # Feed de mudanças, paginado por (atualizado_em, id); também atende
+            # o MAX(atualizado_em) das respostas condicionais
+            models.Index(fields=['atualizado_em', 'id'], name='pessoa_atualizado_id_idx'),
+            # Busca por prefixo (LIKE 'termo%'); o índice GIN de trigramas é
+            # criado pela migração 0005 apenas no PostgreSQL
+            models.Index(fields=['nome_busca'], name='pessoa_nome_busca_idx', opclasses=['varchar_pattern_ops']),
+        ]
         verbose_name = 'Pessoa'
         verbose_name_plural = 'Pessoas'
 
+    def preencher_derivados(self):
+        # Também chamado antes de bulk_create, que não passa por save()
+        digitos = digitos_cpf(self.cpf)
+        self.cpf = formatar_cpf(digitos)
+        self.cpf_num = int(digitos)
+        self.nome_busca = normalizar_busca(self.nome)
+
+    def save(self, *args, **kwargs):
+        self.preencher_derivados()
+        super().save(*args, **kwargs)
+
     def __str__(self):
-        return f"{self.nome} (CPF: {self.cpf})" 
\ No newline at end of file
+        return f"{self.nome} (CPF: {self.cpf})" 
+
+class PessoaExcluida(models.Model):
+    # Marca de exclusão para o feed de mudanças: quem espelha a tabela remove o id
+    pessoa_id = models.BigIntegerField()
+    cpf = models.CharField(max_length=14)
+    excluido_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'pessoa_exclusao'
+        indexes = [
+            models.Index(fields=['excluido_em', 'id'], name='pessoa_exclusao_feed_idx'),
+        ]
+
+
+class ResumoPessoa(models.Model):
+    # Agregados por (sexo, ano de nascimento, situação do peso), mantidos por
+    # deltas nas escritas; ver estatisticas.py
+    sexo = models.CharField(max_length=1)
+    ano_nasc = models.PositiveSmallIntegerField()
+    status_peso = models.CharField(max_length=10)
+    quantidade = models.BigIntegerField(default=0)
+    soma_altura = models.FloatField(default=0)
+    soma_altura_quadrados = models.FloatField(default=0)
+    soma_peso = models.FloatField(default=0)
+    soma_peso_quadrados = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'pessoa_resumo'
+        constraints = [
+            models.UniqueConstraint(fields=['sexo', 'ano_nasc', 'status_peso'], name='pessoa_resumo_chave'),
+        ]
+
+
+class HistogramaPessoa(models.Model):
+    # Contagem por classe de 1 cm de altura ou 1 kg de peso, para percentis
+    medida = models.CharField(max_length=6, choices=[('altura', 'Altura'), ('peso', 'Peso')])
+    sexo = models.CharField(max_length=1)
+    classe = models.IntegerField()
+    quantidade = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'pessoa_histograma'
+        constraints = [
+            models.UniqueConstraint(fields=['medida', 'sexo', 'classe'], name='pessoa_histograma_chave'),
+        ]
+
+
+class Tarefa(models.Model):
+    # Fila de tarefas no próprio banco, consumida pelo run_pessoa_worker; ver fila.py
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    FALHOU = 'falhou'
+    ESTADOS = [(PENDENTE, 'Pendente'), (EXECUTANDO, 'Executando'), (CONCLUIDA, 'Concluída'), (FALHOU, 'Falhou')]
+
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+    # Itens processados de total; também é o ponto de retomada de uma nova tentativa
+    progresso = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    resultado = models.JSONField(null=True)
+    erro = models.TextField(blank=True, default='')
+    # Quando a tarefa pendente pode ser reservada (espera entre tentativas) ou,
+    # executando, até quando vale a reserva do trabalhador
+    disponivel_em = models.DateTimeField(default=timezone.now)
+    trabalhador = models.CharField(max_length=100, blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True)
+    concluido_em = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = 'pessoa_tarefa'
+        indexes = [
+            models.Index(fields=['estado', 'disponivel_em'], name='pessoa_tarefa_fila_idx'),
+        ]
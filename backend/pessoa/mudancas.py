@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import fragmentos
+from .models import PessoaExcluida
+from .paginacao import PaginacaoInvalida
+
+# Posição de um cliente no feed de mudanças: (atualizado_em, id) da última
+# pessoa alterada e (excluido_em, id) da última exclusão já entregues
+Posicao = Tuple[Optional[datetime], int, Optional[datetime], int]
+INICIO: Posicao = (None, 0, None, 0)
+
+
+def registrar_exclusoes(pessoas: Iterable[Any]) -> None:
+    # Deve rodar na mesma transação da exclusão, antes de delete() apagar o id
+    # das instâncias
+    agora = timezone.now()
+    PessoaExcluida.objects.bulk_create(
+        [PessoaExcluida(pessoa_id=pessoa.id, cpf=pessoa.cpf, excluido_em=agora) for pessoa in pessoas]
+    )
+
+
+def codificar_cursor(posicao: Posicao) -> str:
+    alteracao, id_alteracao, exclusao, id_exclusao = posicao
+    bruto = json.dumps(
+        [alteracao.isoformat() if alteracao else None, id_alteracao, exclusao.isoformat() if exclusao else None, id_exclusao],
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _instante(valor: Optional[str]) -> Optional[datetime]:
+    if valor is None:
+        return None
+    instante = parse_datetime(valor)
+    if instante is None or timezone.is_naive(instante):
+        raise ValueError(valor)
+    return instante
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Posicao:
+    if not cursor:
+        return INICIO
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        alteracao, id_alteracao, exclusao, id_exclusao = json.loads(bruto.decode('utf-8'))
+        alteracao, exclusao = _instante(alteracao), _instante(exclusao)
+    except (ValueError, TypeError):
+        raise PaginacaoInvalida("Cursor inválido")
+    if not isinstance(id_alteracao, int) or not isinstance(id_exclusao, int):
+        raise PaginacaoInvalida("Cursor inválido")
+    return alteracao, id_alteracao, exclusao, id_exclusao
+
+
+def limite_superior() -> datetime:
+    # O feed só entrega escritas com mais de PESSOA_MUDANCAS_ATRASO segundos:
+    # uma transação ainda aberta pode confirmar depois um atualizado_em anterior
+    # ao cursor do cliente, que já teria passado por ele. No PostgreSQL a
+    # fronteira também não passa do início da transação aberta mais antiga, em
+    # qualquer um dos fragmentos
+    limite = timezone.now()
+    for alias in fragmentos.fragmentos() or [DEFAULT_DB_ALIAS]:
+        conexao = connections[alias]
+        if conexao.vendor != 'postgresql':
+            continue
+        with conexao.cursor() as cursor:
+            cursor.execute(
+                "SELECT min(xact_start) FROM pg_stat_activity "
+                "WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+            )
+            inicio = cursor.fetchone()[0]
+        if inicio is not None:
+            limite = min(limite, inicio)
+    return limite - timedelta(seconds=getattr(settings, 'PESSOA_MUDANCAS_ATRASO', 5))
@@ -0,0 +1,86 @@
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import Any, Optional
+
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y')
+
+SEXOS = {
+    'M': 'M',
+    'MASCULINO': 'M',
+    'F': 'F',
+    'FEMININO': 'F',
+}
+
+
+def digitos_cpf(valor: Any) -> str:
+    digitos = re.sub(r'[.\-\s]', '', str(valor or ''))
+    if len(digitos) != 11 or not digitos.isdigit():
+        raise ValueError("CPF deve ter 11 dígitos")
+    return digitos
+
+
+def chave_cpf(valor: Any) -> Optional[int]:
+    # Forma compacta usada nas buscas; aceita o CPF com ou sem pontuação
+    try:
+        return int(digitos_cpf(valor))
+    except ValueError:
+        return None
+
+
+def formatar_cpf(valor: Any) -> str:
+    digitos = valor if isinstance(valor, str) else f"{valor:011d}"
+    return f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+
+
+def _digito_verificador(digitos: str) -> int:
+    peso = len(digitos) + 1
+    resto = sum(int(d) * (peso - i) for i, d in enumerate(digitos)) * 10 % 11
+    return 0 if resto == 10 else resto
+
+
+def normalizar_cpf(valor: Any) -> str:
+    digitos = digitos_cpf(valor)
+    if (
+        len(set(digitos)) == 1
+        or int(digitos[9]) != _digito_verificador(digitos[:9])
+        or int(digitos[10]) != _digito_verificador(digitos[:10])
+    ):
+        raise ValueError("CPF inválido")
+    return formatar_cpf(digitos)
+
+
+def normalizar_busca(valor: Any) -> str:
+    # Minúsculas e sem acentos, como o unaccent(lower(...)) do PostgreSQL
+    decomposto = unicodedata.normalize('NFKD', str(valor or ''))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def normalizar_data(valor: Any) -> date:
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor or '').strip()
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError("Data em formato inválido. Use YYYY-MM-DD ou DD/MM/YYYY.")
+
+
+def normalizar_sexo(valor: Any) -> str:
+    sexo = SEXOS.get(str(valor or '').strip().upper())
+    if not sexo:
+        raise ValueError("Sexo deve ser M ou F")
+    return sexo
+
+
+def normalizar_positivo(valor: Any, campo: str) -> float:
+    try:
+        numero = float(str(valor).strip().replace(',', '.'))
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} deve ser numérico")
+    if numero <= 0:
+        raise ValueError(f"{campo} deve ser maior que zero")
+    return numero
@@ -0,0 +1,46 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+# Direções do cursor: 'n' busca registros depois da chave, 'p' busca antes dela
+PROXIMA = 'n'
+ANTERIOR = 'p'
+
+
+class PaginacaoInvalida(ValueError):
+    pass
+
+
+def codificar_cursor(direcao: str, nome: str, id: int) -> str:
+    bruto = json.dumps([direcao, nome, id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> Tuple[str, str, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direcao, nome, id = json.loads(bruto.decode('utf-8'))
+    except (ValueError, TypeError):
+        raise PaginacaoInvalida("Cursor inválido")
+    if direcao not in (PROXIMA, ANTERIOR) or not isinstance(nome, str) or not isinstance(id, int):
+        raise PaginacaoInvalida("Cursor inválido")
+    return direcao, nome, id
+
+
+def normalizar_limite(valor: Optional[str]) -> int:
+    padrao = getattr(settings, 'PESSOA_LIMITE_PAGINA_PADRAO', LIMITE_PADRAO)
+    maximo = getattr(settings, 'PESSOA_LIMITE_PAGINA_MAXIMO', LIMITE_MAXIMO)
+    if valor in (None, ''):
+        return min(padrao, maximo)
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise PaginacaoInvalida("Limite deve ser um número inteiro")
+    if limite <= 0:
+        raise PaginacaoInvalida("Limite deve ser maior que zero")
+    return min(limite, maximo)
@@ -0,0 +1,61 @@
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Fórmulas de peso ideal por sexo: (coeficiente da altura, constante)
+COEFICIENTES = {
+    'M': (72.7, 58),
+    'F': (62.1, 44.7),
+}
+
+# Margem de 2kg para considerar peso adequado
+MARGEM_ADEQUADO = 2
+
+DESCRICOES = {
+    'adequado': "Peso adequado",
+    'acima': "Acima do peso ideal",
+    'abaixo': "Abaixo do peso ideal",
+}
+
+
+def calcular(sexo: str, altura: float) -> float:
+    coeficiente, constante = COEFICIENTES['M' if sexo == 'M' else 'F']
+    return (coeficiente * altura) - constante
+
+
+def classificar(diferenca: float) -> str:
+    if abs(diferenca) <= MARGEM_ADEQUADO:
+        return 'adequado'
+    return 'acima' if diferenca > 0 else 'abaixo'
+
+
+def arredondar(valores: 'np.ndarray') -> List[float]:
+    # np.round multiplica por 100 e arredonda, o que diverge do round() do
+    # Python em valores na metade; o arredondamento final usa round() para
+    # manter o resultado idêntico ao cálculo individual
+    return [round(v, 2) for v in valores.tolist()]
+
+
+def calcular_lote(
+    sexos: Sequence[str], alturas: Sequence[float], pesos: Sequence[float]
+) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    # Importado só no primeiro lote: o models importa este módulo, e o numpy
+    # pesaria no início de todo worker
+    import numpy as np
+
+    masculino = np.asarray(sexos) == 'M'
+    alturas = np.asarray(alturas, dtype=np.float64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+
+    coef_m, const_m = COEFICIENTES['M']
+    coef_f, const_f = COEFICIENTES['F']
+    peso_ideal = np.where(masculino, (coef_m * alturas) - const_m, (coef_f * alturas) - const_f)
+    diferenca = pesos - peso_ideal
+
+    status_peso = np.where(
+        np.abs(diferenca) <= MARGEM_ADEQUADO,
+        'adequado',
+        np.where(diferenca > 0, 'acima', 'abaixo')
+    )
+    return peso_ideal, diferenca, status_peso
@@ -0,0 +1,18 @@
+from typing import Iterable, Optional, Tuple
+
+
+class CamposInvalidos(ValueError):
+    pass
+
+
+def normalizar_campos(valor: Optional[str], permitidos: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    # ?fields=nome,cpf: None quando ausente, senão os campos pedidos na ordem
+    # em que vieram, sem repetições
+    if valor is None or not valor.strip():
+        return None
+    permitidos = tuple(permitidos)
+    campos = tuple(dict.fromkeys(c.strip() for c in valor.split(',') if c.strip()))
+    invalidos = [c for c in campos if c not in permitidos]
+    if invalidos:
+        raise CamposInvalidos(f"Campos inválidos: {', '.join(invalidos)}. Use um de: {', '.join(permitidos)}.")
+    return campos
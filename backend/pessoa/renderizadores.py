@@ -0,0 +1,41 @@
+import json
+from decimal import Decimal
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _padrao(valor: Any) -> Any:
+    # Tipos que o orjson não conhece; date, datetime, float e dataclasses ele
+    # serializa sozinho
+    if isinstance(valor, Promise):
+        return force_str(valor)
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Tipo {type(valor).__name__} não serializável em JSON")
+
+
+def para_json(dados: Any) -> bytes:
+    if orjson is None:
+        return json.dumps(dados, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+    return orjson.dumps(dados, default=_padrao, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class OrjsonRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Indentação pedida pelo cliente fica com o JSONRenderer padrão
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return para_json(data)
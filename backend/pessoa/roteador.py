@@ -0,0 +1,108 @@
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Leituras das tabelas do app vão para as réplicas de PESSOA_REPLICAS e as
+# escritas para o primário (default). Quem acabou de escrever fica preso ao
+# primário por PESSOA_PRIMARIO_JANELA segundos, pelo cookie abaixo, para ler o
+# que gravou apesar do atraso da replicação
+
+COOKIE_PRIMARIO = 'pessoa_primario'
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Visível também nas threads do sync_to_async, que copiam o contexto
+_primario: contextvars.ContextVar[bool] = contextvars.ContextVar('pessoa_primario', default=False)
+
+
+def replicas() -> List[str]:
+    return list(getattr(settings, 'PESSOA_REPLICAS', []))
+
+
+def lendo_do_primario() -> bool:
+    # Dentro de uma transação no primário as leituras precisam ver as escritas
+    # ainda não confirmadas dela
+    return _primario.get() or not replicas() or connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+@contextmanager
+def primario():
+    token = _primario.set(True)
+    try:
+        yield
+    finally:
+        _primario.reset(token)
+
+
+class RoteadorReplicas:
+    # Tabelas de outros apps (sessões, usuários, admin) ficam no primário
+    app_label = 'pessoa'
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if model._meta.app_label != self.app_label or lendo_do_primario():
+            return None
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+
+def _janela() -> float:
+    return getattr(settings, 'PESSOA_PRIMARIO_JANELA', 5)
+
+
+def _fixado(request) -> bool:
+    if request.method not in METODOS_SEGUROS:
+        return True
+    try:
+        return float(request.COOKIES.get(COOKIE_PRIMARIO, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _marcar(request, response):
+    # Qualquer método que escreve renova a janela; o valor é o instante em que
+    # ela termina, conferido aqui e não só pelo Max-Age do cliente
+    if request.method not in METODOS_SEGUROS and replicas():
+        janela = _janela()
+        response.set_cookie(
+            COOKIE_PRIMARIO, f"{time.time() + janela:.3f}", max_age=janela, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+class PrimarioMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _primario.set(_fixado(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _primario.reset(token)
+        return _marcar(request, response)
+
+    async def __acall__(self, request):
+        token = _primario.set(_fixado(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _primario.reset(token)
+        return _marcar(request, response)
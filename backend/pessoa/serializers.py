@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Pessoa
+from .normalizacao import normalizar_cpf
 
 class PessoaSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,9 +9,11 @@ class PessoaSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
     def validate_cpf(self, value):
-        if not value or len(value) != 14:
-            raise serializers.ValidationError("CPF deve ter 14 caracteres incluindo pontos e traço")
-        return value
+        # Aceita o CPF com ou sem pontuação e devolve a forma pontuada
+        try:
+            return normalizar_cpf(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
 
     def validate_altura(self, value):
         if value <= 0:
@@ -20,4 +23,16 @@ class PessoaSerializer(serializers.ModelSerializer):
     def validate_peso(self, value):
         if value <= 0:
             raise serializers.ValidationError("Peso deve ser maior que zero")
-        return value 
\ No newline at end of file
+        return value 
+
+
+class PessoaLoteSerializer(PessoaSerializer):
+    # A unicidade do CPF é verificada em lote pelo serviço, com uma única
+    # consulta por cpf_num, em vez de uma consulta por linha
+    pass
+
+
+class PessoaParcialSerializer(PessoaSerializer):
+    # O CPF identifica a pessoa na URL e não pode ser alterado
+    class Meta(PessoaSerializer.Meta):
+        fields = ['nome', 'data_nasc', 'sexo', 'altura', 'peso']
\ No newline at end of file
@@ -1,104 +1,714 @@
-from typing import List, Optional
-from .models import Pessoa
-from .dto import PessoaDTO, PessoaResponseDTO, PesoIdealDTO
+import sqlite3
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import Pessoa, PessoaExcluida, Tarefa
+from .dto import EstatisticasPopulacaoDTO, PessoaDTO, PessoaResponseDTO, PesoIdealDTO, PesoIdealLoteDTO, PaginaDTO, RelatorioLoteDTO, ResultadoLoteDTO, SincronizacaoDTO, TarefaDTO, ExclusaoDTO, MudancasDTO
+from .exportacao import CAMPOS as CAMPOS_EXPORTACAO
+from .serializers import PessoaLoteSerializer
+from . import estatisticas
+from . import fila
+from . import fragmentos
+from . import mudancas
+from . import roteador
+from . import peso_ideal as peso
+from .admissao import estatisticas_admissao
+from .cache import cache_pessoas
+from .conexoes import estatisticas_conexoes
+from .normalizacao import chave_cpf, normalizar_busca
+from .paginacao import ANTERIOR, PROXIMA, PaginacaoInvalida, codificar_cursor, decodificar_cursor, normalizar_limite
+
+# Colunas do modelo lidas nas consultas por CPF e na listagem completa
+COLUNAS_PESSOA = ('id', 'nome', 'cpf', 'data_nasc', 'sexo', 'altura', 'peso', 'atualizado_em', 'criado_em')
+# Campos comparados na sincronização; iguais aos recebidos, a pessoa não é regravada
+CAMPOS_SINCRONIZACAO = ('nome', *estatisticas.CAMPOS)
+# Campo do PessoaResponseDTO -> coluna da consulta paginada, que também calcula
+# o peso ideal; as chaves são os valores aceitos em ?fields=
+COLUNAS_RESPOSTA = {
+    'id': 'id',
+    'nome': 'nome',
+    'cpf': 'cpf',
+    'data_nasc': 'data_nasc',
+    'sexo': 'sexo',
+    'altura': 'altura',
+    'peso': 'peso',
+    'peso_ideal': 'peso_ideal',
+    'status': 'status_peso',
+    'status_peso': 'status_peso',
+    'atualizado_em': 'atualizado_em',
+    'criado_em': 'criado_em',
+}
 
 class PessoaService:
     @staticmethod
     def criar_pessoa(dto: PessoaDTO) -> PessoaResponseDTO:
-        pessoa = Pessoa.objects.create(
-            nome=dto.nome,
-            cpf=dto.cpf,
-            data_nasc=dto.data_nasc,
-            sexo=dto.sexo,
-            altura=dto.altura,
-            peso=dto.peso
+        with fragmentos.atomico(fragmentos.do_cpf(chave_cpf(dto.cpf))):
+            pessoa = Pessoa.objects.create(
+                nome=dto.nome,
+                cpf=dto.cpf,
+                data_nasc=dto.data_nasc,
+                sexo=dto.sexo,
+                altura=dto.altura,
+                peso=dto.peso
+            )
+            estatisticas.aplicar([pessoa])
+        cache_pessoas.invalidar(str(pessoa.cpf_num))
+        return PessoaService._resposta(pessoa)
+
+    @staticmethod
+    def _validar_lote(itens: List[Dict[str, Any]]) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, int], Dict[int, ResultadoLoteDTO]]:
+        # Dados validados e cpf_num de cada item válido, pelo índice no lote, e
+        # as falhas de validação
+        resultados: Dict[int, ResultadoLoteDTO] = {}
+        serializer = PessoaLoteSerializer()
+        vistos = set()
+        validos: Dict[int, int] = {}
+        dados: Dict[int, Dict[str, Any]] = {}
+        for indice, item in enumerate(itens):
+            cpf = item.get('cpf') if isinstance(item, dict) else None
+            try:
+                dados[indice] = serializer.run_validation(item)
+            except ValidationError as e:
+                resultados[indice] = ResultadoLoteDTO(indice=indice, sucesso=False, cpf=cpf, erros=e.detail)
+                continue
+            chave = chave_cpf(dados[indice]['cpf'])
+            if chave in vistos:
+                resultados[indice] = ResultadoLoteDTO(
+                    indice=indice, sucesso=False, cpf=dados[indice]['cpf'],
+                    erros={"cpf": ["CPF repetido no lote."]}
+                )
+                continue
+            vistos.add(chave)
+            validos[indice] = chave
+        return dados, validos, resultados
+
+    @staticmethod
+    def criar_lote(itens: List[Dict[str, Any]]) -> RelatorioLoteDTO:
+        tamanho_lote = getattr(settings, 'PESSOA_LOTE_BATCH_SIZE', 1000)
+        dados, validos, resultados = PessoaService._validar_lote(itens)
+
+        # No modo fragmentado cada fragmento grava, na sua transação, a sua
+        # parte do lote
+        criados = 0
+        for alias, grupo in fragmentos.agrupar(validos).items():
+            with fragmentos.usando(alias):
+                criados += PessoaService._criar_grupo(dados, grupo, resultados, tamanho_lote)
+
+        return RelatorioLoteDTO(
+            criados=criados,
+            falhas=len(itens) - criados,
+            resultados=[resultados[indice] for indice in range(len(itens))]
         )
-        return PessoaResponseDTO(
-            id=pessoa.id,
-            nome=pessoa.nome,
-            cpf=pessoa.cpf,
-            data_nasc=pessoa.data_nasc,
-            sexo=pessoa.sexo,
-            altura=pessoa.altura,
-            peso=pessoa.peso
+
+    @staticmethod
+    def _criar_grupo(
+        dados: Dict[int, Dict[str, Any]], validos: Dict[int, int], resultados: Dict[int, ResultadoLoteDTO],
+        tamanho_lote: int
+    ) -> int:
+        # Duas tentativas: se outra requisição inserir um dos CPFs entre a
+        # verificação e o INSERT, a violação de unicidade refaz a verificação
+        for tentativa in range(2):
+            chaves = list(validos.values())
+            existentes = set()
+            for inicio in range(0, len(chaves), tamanho_lote):
+                existentes.update(
+                    Pessoa.objects.filter(cpf_num__in=chaves[inicio:inicio + tamanho_lote])
+                    .values_list('cpf_num', flat=True)
+                )
+            for indice, chave in list(validos.items()):
+                if chave in existentes:
+                    resultados[indice] = ResultadoLoteDTO(
+                        indice=indice, sucesso=False, cpf=dados[indice]['cpf'],
+                        erros={"cpf": ["CPF já cadastrado."]}
+                    )
+                    del validos[indice]
+
+            pessoas = [Pessoa(**dados[indice]) for indice in validos]
+            for pessoa in pessoas:
+                pessoa.preencher_derivados()
+            try:
+                with fragmentos.atomico():
+                    Pessoa.objects.bulk_create(pessoas, batch_size=tamanho_lote)
+                    estatisticas.aplicar(pessoas)
+                break
+            except IntegrityError:
+                if tentativa:
+                    raise
+
+        for indice, pessoa in zip(validos, pessoas):
+            resultados[indice] = ResultadoLoteDTO(indice=indice, sucesso=True, cpf=pessoa.cpf, id=pessoa.id)
+        return len(validos)
+
+    @staticmethod
+    def sincronizar(itens: List[Dict[str, Any]]) -> SincronizacaoDTO:
+        # Upsert por CPF de um retrato completo vindo de outro sistema: por
+        # bloco, uma leitura das pessoas já cadastradas, um INSERT das novas e um
+        # INSERT ... ON CONFLICT DO UPDATE só das que mudaram
+        tamanho_lote = getattr(settings, 'PESSOA_LOTE_BATCH_SIZE', 1000)
+        dados, validos, falhas = PessoaService._validar_lote(itens)
+
+        novas, alteradas = [], []
+        for alias, grupo in fragmentos.agrupar(validos).items():
+            with fragmentos.usando(alias):
+                novas_grupo, alteradas_grupo = PessoaService._sincronizar_grupo(dados, grupo, tamanho_lote)
+            novas += novas_grupo
+            alteradas += alteradas_grupo
+
+        cache_pessoas.invalidar(*(str(pessoa.cpf_num) for pessoa in novas + alteradas))
+        return SincronizacaoDTO(
+            inseridas=len(novas),
+            atualizadas=len(alteradas),
+            inalteradas=len(validos) - len(novas) - len(alteradas),
+            falhas=len(falhas),
+            resultados=[falhas[indice] for indice in sorted(falhas)]
         )
 
+    @staticmethod
+    def _sincronizar_grupo(
+        dados: Dict[int, Dict[str, Any]], validos: Dict[int, int], tamanho_lote: int
+    ) -> Tuple[List[Pessoa], List[Pessoa]]:
+        # Como em criar_lote: um CPF inserido por outra requisição entre a
+        # leitura e o INSERT faz a sincronização ser refeita
+        for tentativa in range(2):
+            try:
+                with fragmentos.atomico():
+                    chaves = list(validos.values())
+                    atuais = {}
+                    for inicio in range(0, len(chaves), tamanho_lote):
+                        for chave, *valores in (
+                            Pessoa.objects.select_for_update().order_by()
+                            .filter(cpf_num__in=chaves[inicio:inicio + tamanho_lote])
+                            .values_list('cpf_num', *CAMPOS_SINCRONIZACAO)
+                        ):
+                            atuais[chave] = tuple(valores)
+
+                    novas, alteradas, antigos = [], [], []
+                    for indice, chave in validos.items():
+                        pessoa = Pessoa(**dados[indice])
+                        atual = atuais.get(chave)
+                        if atual is None:
+                            novas.append(pessoa)
+                        elif atual != tuple(getattr(pessoa, campo) for campo in CAMPOS_SINCRONIZACAO):
+                            alteradas.append(pessoa)
+                            antigos.append(estatisticas.Registro(*atual[1:]))
+                    for pessoa in novas + alteradas:
+                        pessoa.preencher_derivados()
+
+                    Pessoa.objects.bulk_create(novas, batch_size=tamanho_lote)
+                    Pessoa.objects.bulk_create(
+                        alteradas, batch_size=tamanho_lote, update_conflicts=True, unique_fields=['cpf_num'],
+                        update_fields=[*CAMPOS_SINCRONIZACAO, 'nome_busca', 'atualizado_em']
+                    )
+                    estatisticas.aplicar(novas + alteradas, antigos)
+                return novas, alteradas
+            except IntegrityError:
+                if tentativa:
+                    raise
+
     @staticmethod
     def atualizar_pessoa(dto: PessoaDTO) -> PessoaResponseDTO:
-        pessoa = Pessoa.objects.get(cpf=dto.cpf)
-        pessoa.nome = dto.nome
-        pessoa.data_nasc = dto.data_nasc
-        pessoa.sexo = dto.sexo
-        pessoa.altura = dto.altura
-        pessoa.peso = dto.peso
-        pessoa.save()
-        return PessoaResponseDTO(
-            id=pessoa.id,
-            nome=pessoa.nome,
-            cpf=pessoa.cpf,
-            data_nasc=pessoa.data_nasc,
-            sexo=pessoa.sexo,
-            altura=pessoa.altura,
-            peso=pessoa.peso
+        with fragmentos.atomico(fragmentos.do_cpf(chave_cpf(dto.cpf))):
+            pessoa = Pessoa.objects.select_for_update().get(cpf_num=chave_cpf(dto.cpf))
+            antigo = estatisticas.registro(pessoa)
+            pessoa.nome = dto.nome
+            pessoa.data_nasc = dto.data_nasc
+            pessoa.sexo = dto.sexo
+            pessoa.altura = dto.altura
+            pessoa.peso = dto.peso
+            pessoa.save()
+            estatisticas.aplicar([pessoa], [antigo])
+        cache_pessoas.invalidar(str(pessoa.cpf_num))
+        return PessoaService._resposta(pessoa)
+
+    @staticmethod
+    def atualizar_parcial(cpf: str, campos: Dict[str, Any]) -> Optional[PessoaResponseDTO]:
+        # Um único UPDATE ... RETURNING: não há leitura prévia e a ausência da
+        # pessoa é detectada pelas linhas afetadas
+        chave = chave_cpf(cpf)
+        if chave is None:
+            return None
+        with fragmentos.usando(fragmentos.do_cpf(chave)):
+            pessoa = PessoaService._atualizar_parcial(chave, dict(campos, atualizado_em=timezone.now()))
+        cache_pessoas.invalidar(str(chave))
+        if pessoa is None:
+            return None
+        return PessoaService._resposta(pessoa)
+
+    @staticmethod
+    def _atualizar_parcial(chave: int, campos: Dict[str, Any]) -> Optional[Pessoa]:
+        # raw() é roteado como leitura: o UPDATE vai explicitamente para o
+        # banco das escritas (default ou o fragmento do CPF)
+        conexao = connections[fragmentos.banco()]
+        pessoas = Pessoa.objects.db_manager(conexao.alias)
+        if 'nome' in campos:
+            campos['nome_busca'] = normalizar_busca(campos['nome'])
+        # Mudanças em sexo, data de nascimento, altura ou peso movem a pessoa
+        # entre grupos do resumo e precisam dos valores anteriores
+        afeta_resumo = not campos.keys().isdisjoint(estatisticas.CAMPOS)
+        q = conexao.ops.quote_name
+        tabela = q(Pessoa._meta.db_table)
+        atribuicoes = ', '.join(f"{q(Pessoa._meta.get_field(nome).column)} = %s" for nome in campos)
+        parametros = [
+            Pessoa._meta.get_field(nome).get_db_prep_save(valor, conexao)
+            for nome, valor in campos.items()
+        ]
+        retorno = ', '.join(
+            f"{tabela}.{q(c)}" for c in ('id', 'nome', 'cpf', 'cpf_num', 'data_nasc', 'sexo', 'altura', 'peso', 'atualizado_em', 'criado_em')
         )
+        if PessoaService._suporta_update_returning(conexao.alias) and not afeta_resumo:
+            # raw() aplica os conversores do backend às colunas retornadas
+            linhas = list(pessoas.raw(
+                f"UPDATE {tabela} SET {atribuicoes} WHERE cpf_num = %s RETURNING {retorno}",
+                parametros + [chave]
+            ))
+            return linhas[0] if linhas else None
+        if conexao.vendor == 'postgresql':
+            # Os valores anteriores voltam no próprio UPDATE, via UPDATE ... FROM
+            with transaction.atomic(using=conexao.alias):
+                linhas = list(pessoas.raw(
+                    f"WITH antigo AS (SELECT id, sexo, data_nasc, altura, peso FROM {tabela} "
+                    f"WHERE cpf_num = %s FOR UPDATE) "
+                    f"UPDATE {tabela} SET {atribuicoes} FROM antigo WHERE {tabela}.id = antigo.id "
+                    f"RETURNING {retorno}, antigo.sexo AS antigo_sexo, antigo.data_nasc AS antigo_data_nasc, "
+                    f"antigo.altura AS antigo_altura, antigo.peso AS antigo_peso",
+                    [chave] + parametros
+                ))
+                pessoa = linhas[0] if linhas else None
+                if pessoa is not None:
+                    estatisticas.aplicar([pessoa], [estatisticas.Registro(
+                        pessoa.antigo_sexo, pessoa.antigo_data_nasc, pessoa.antigo_altura, pessoa.antigo_peso
+                    )])
+            return pessoa
+        with transaction.atomic(using=conexao.alias):
+            antigo = None
+            if afeta_resumo:
+                antigo = Pessoa.objects.select_for_update().filter(cpf_num=chave).only(*estatisticas.CAMPOS).first()
+            if not Pessoa.objects.filter(cpf_num=chave).update(**campos):
+                return None
+            pessoa = Pessoa.objects.get(cpf_num=chave)
+            if antigo is not None:
+                estatisticas.aplicar([pessoa], [antigo])
+        return pessoa
+
+    @staticmethod
+    def _suporta_update_returning(alias: str) -> bool:
+        # Vale o banco que recebe o UPDATE (default ou o fragmento do CPF)
+        vendor = connections[alias].vendor
+        if vendor == 'postgresql':
+            return True
+        return vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35)
 
     @staticmethod
     def excluir_pessoa(cpf: str) -> None:
-        Pessoa.objects.filter(cpf=cpf).delete()
+        chave = chave_cpf(cpf)
+        if chave is None:
+            return
+        with fragmentos.atomico(fragmentos.do_cpf(chave)):
+            removidas = list(
+                Pessoa.objects.select_for_update().filter(cpf_num=chave).only('id', 'cpf', *estatisticas.CAMPOS)
+            )
+            if removidas:
+                Pessoa.objects.filter(id__in=[p.id for p in removidas]).delete()
+                estatisticas.aplicar(removidos=removidas)
+                mudancas.registrar_exclusoes(removidas)
+        cache_pessoas.invalidar(str(chave))
 
     @staticmethod
     def pesquisar_por_cpf(cpf: str) -> Optional[PessoaResponseDTO]:
-        try:
-            pessoa = Pessoa.objects.get(cpf=cpf)
-            return PessoaResponseDTO(
-                id=pessoa.id,
-                nome=pessoa.nome,
-                cpf=pessoa.cpf,
-                data_nasc=pessoa.data_nasc,
-                sexo=pessoa.sexo,
-                altura=pessoa.altura,
-                peso=pessoa.peso
-            )
-        except Pessoa.DoesNotExist:
+        # CPFs com e sem pontuação compartilham a mesma entrada do cache
+        chave = chave_cpf(cpf)
+        if chave is None:
+            return None
+        if roteador.replicas() and roteador.lendo_do_primario():
+            # Quem acabou de escrever lê do primário: o cache pode ter sido
+            # preenchido por uma réplica atrasada depois da invalidação
+            return PessoaService._carregar_por_cpf(chave)
+        pessoa = cache_pessoas.obter(str(chave), lambda: PessoaService._carregar_por_cpf(chave))
+        # Cópia para que quem chama não altere o objeto guardado no cache
+        return replace(pessoa) if pessoa else None
+
+    @staticmethod
+    async def apesquisar_por_cpf(cpf: str) -> Optional[PessoaResponseDTO]:
+        chave = chave_cpf(cpf)
+        if chave is None:
             return None
+        if roteador.replicas() and roteador.lendo_do_primario():
+            return await PessoaService._acarregar_por_cpf(chave)
+        pessoa = await cache_pessoas.aobter(str(chave), lambda: PessoaService._acarregar_por_cpf(chave))
+        return replace(pessoa) if pessoa else None
+
+    @staticmethod
+    def _carregar_por_cpf(chave: int) -> Optional[PessoaResponseDTO]:
+        linha = Pessoa.objects.using(fragmentos.do_cpf(chave)).filter(cpf_num=chave).values_list(*COLUNAS_PESSOA).first()
+        return PessoaService._para_dto(linha, COLUNAS_PESSOA) if linha else None
+
+    @staticmethod
+    async def _acarregar_por_cpf(chave: int) -> Optional[PessoaResponseDTO]:
+        linha = await Pessoa.objects.using(fragmentos.do_cpf(chave)).filter(cpf_num=chave).values_list(*COLUNAS_PESSOA).afirst()
+        return PessoaService._para_dto(linha, COLUNAS_PESSOA) if linha else None
+
+    @staticmethod
+    def _resposta(pessoa: Pessoa) -> PessoaResponseDTO:
+        return PessoaService._para_dto(tuple(getattr(pessoa, c) for c in COLUNAS_PESSOA), COLUNAS_PESSOA)
+
+    @staticmethod
+    def _para_dto(linha: tuple, colunas: Tuple[str, ...]) -> PessoaResponseDTO:
+        # Leituras vêm de values_list(): sem instanciar o modelo. Campos fora de
+        # colunas (?fields=) ficam None e não vão para a resposta
+        valores = dict(zip(colunas, linha))
+        peso_ideal, status_peso = valores.get('peso_ideal'), valores.get('status_peso')
+        if 'peso_ideal' not in valores and None not in (valores.get('sexo'), valores.get('altura'), valores.get('peso')):
+            # Consultas sem com_peso_ideal(): o mesmo cálculo, feito em Python
+            peso_ideal = peso.calcular(valores['sexo'], valores['altura'])
+            status_peso = peso.classificar(valores['peso'] - peso_ideal)
+        return PessoaResponseDTO(
+            id=valores['id'],
+            nome=valores['nome'],
+            cpf=valores.get('cpf'),
+            data_nasc=valores.get('data_nasc'),
+            sexo=valores.get('sexo'),
+            altura=valores.get('altura'),
+            peso=valores.get('peso'),
+            atualizado_em=valores.get('atualizado_em'),
+            criado_em=valores.get('criado_em'),
+            peso_ideal=round(peso_ideal, 2) if peso_ideal is not None else None,
+            status=peso.DESCRICOES[status_peso] if status_peso else None,
+            status_peso=status_peso
+        )
+
+    @staticmethod
+    def estatisticas_cache() -> Dict[str, Any]:
+        return cache_pessoas.estatisticas()
+
+    @staticmethod
+    def estatisticas_conexoes() -> Dict[str, Any]:
+        return estatisticas_conexoes()
+
+    @staticmethod
+    def estatisticas_admissao() -> Dict[str, Any]:
+        return estatisticas_admissao()
+
+    @staticmethod
+    def estatisticas_populacao() -> EstatisticasPopulacaoDTO:
+        return estatisticas.consultar()
+
+    @staticmethod
+    def enfileirar_lote(itens: List[Dict[str, Any]]) -> TarefaDTO:
+        # Validação e gravação ficam com o trabalhador, em blocos
+        return PessoaService._tarefa_dto(fila.enfileirar('criar_lote', {'itens': itens}, total=len(itens)))
+
+    @staticmethod
+    def enfileirar_sincronizacao(itens: List[Dict[str, Any]]) -> TarefaDTO:
+        return PessoaService._tarefa_dto(fila.enfileirar('sincronizar', {'itens': itens}, total=len(itens)))
+
+    @staticmethod
+    def enfileirar_reconstrucao_estatisticas() -> TarefaDTO:
+        return PessoaService._tarefa_dto(fila.enfileirar('reconstruir_estatisticas', {}))
+
+    @staticmethod
+    def consultar_tarefa(id: int) -> Optional[TarefaDTO]:
+        tarefa = Tarefa.objects.filter(pk=id).first()
+        return PessoaService._tarefa_dto(tarefa) if tarefa else None
+
+    @staticmethod
+    def _tarefa_dto(tarefa: Tarefa) -> TarefaDTO:
+        return TarefaDTO(
+            id=tarefa.id,
+            tipo=tarefa.tipo,
+            estado=tarefa.estado,
+            tentativas=tarefa.tentativas,
+            max_tentativas=tarefa.max_tentativas,
+            progresso=tarefa.progresso,
+            total=tarefa.total,
+            resultado=tarefa.resultado,
+            erro=tarefa.erro,
+            criado_em=tarefa.criado_em,
+            iniciado_em=tarefa.iniciado_em,
+            concluido_em=tarefa.concluido_em
+        )
 
     @staticmethod
     def listar_todos() -> List[PessoaResponseDTO]:
-        pessoas = Pessoa.objects.all()
+        pessoas, _ = PessoaService._ordenadas_por_nome(Pessoa.objects.all())
         return [
-            PessoaResponseDTO(
-                id=p.id,
-                nome=p.nome,
-                cpf=p.cpf,
-                data_nasc=p.data_nasc,
-                sexo=p.sexo,
-                altura=p.altura,
-                peso=p.peso
-            )
-            for p in pessoas
+            PessoaService._para_dto(linha, COLUNAS_PESSOA)
+            for linha in fragmentos.reunir(pessoas.values_list(*COLUNAS_PESSOA))
         ]
 
+    @staticmethod
+    def listar_pagina(
+        cursor: Optional[str] = None, limite: Optional[str] = None, status_peso: Optional[str] = None,
+        busca: Optional[str] = None, campos: Optional[Tuple[str, ...]] = None
+    ) -> PaginaDTO:
+        pessoas, tamanho, direcao = PessoaService._consulta_pagina(cursor, limite, status_peso, busca)
+        colunas = PessoaService._colunas_pagina(campos)
+        return PessoaService._montar_pagina(
+            fragmentos.reunir(pessoas.values_list(*colunas), tamanho + 1), colunas, tamanho, direcao, paginar=not busca
+        )
+
+    @staticmethod
+    async def alistar_pagina(
+        cursor: Optional[str] = None, limite: Optional[str] = None, status_peso: Optional[str] = None,
+        busca: Optional[str] = None, campos: Optional[Tuple[str, ...]] = None
+    ) -> PaginaDTO:
+        if fragmentos.ativo():
+            # O merge dos fragmentos usa as threads do executor
+            return await sync_to_async(PessoaService.listar_pagina)(cursor, limite, status_peso, busca, campos)
+        pessoas, tamanho, direcao = PessoaService._consulta_pagina(cursor, limite, status_peso, busca)
+        colunas = PessoaService._colunas_pagina(campos)
+        return PessoaService._montar_pagina(
+            [linha async for linha in pessoas.values_list(*colunas)[:tamanho + 1]], colunas, tamanho, direcao,
+            paginar=not busca
+        )
+
+    @staticmethod
+    def _colunas_pagina(campos: Optional[Tuple[str, ...]]) -> Tuple[str, ...]:
+        # id e nome sempre são lidos: formam os cursores da página
+        return tuple(dict.fromkeys(('id', 'nome', *(COLUNAS_RESPOSTA[c] for c in campos or COLUNAS_RESPOSTA))))
+
+    @staticmethod
+    def _consulta_pagina(cursor: Optional[str], limite: Optional[str], status_peso: Optional[str], busca: Optional[str]):
+        # Paginação por chave (nome, id): o custo de cada página independe da
+        # profundidade, ao contrário de OFFSET
+        tamanho = normalizar_limite(limite)
+        pessoas = Pessoa.objects.com_peso_ideal()
+        if status_peso:
+            pessoas = pessoas.filter(status_peso=status_peso)
+        direcao = None
+        if busca:
+            # A busca é ordenada por relevância e devolve só os melhores resultados
+            if cursor:
+                raise PaginacaoInvalida("A busca não aceita cursor; refine o termo ou aumente o limite")
+            return pessoas.buscar(busca), tamanho, direcao
+        pessoas, campo = PessoaService._ordenadas_por_nome(pessoas)
+        if cursor:
+            direcao, nome, id = decodificar_cursor(cursor)
+            if direcao == ANTERIOR:
+                pessoas = pessoas.filter(
+                    Q(**{f'{campo}__lte': nome}) & (Q(**{f'{campo}__lt': nome}) | Q(id__lt=id))
+                ).order_by(f'-{campo}', '-id')
+            else:
+                pessoas = pessoas.filter(
+                    Q(**{f'{campo}__gte': nome}) & (Q(**{f'{campo}__gt': nome}) | Q(id__gt=id))
+                ).order_by(campo, 'id')
+        return pessoas, tamanho, direcao
+
+    @staticmethod
+    def _ordenadas_por_nome(pessoas):
+        pessoas, campo = fragmentos.por_nome(pessoas)
+        return pessoas.order_by(campo, 'id'), campo
+
+    @staticmethod
+    def _montar_pagina(
+        linhas: List[tuple], colunas: Tuple[str, ...], tamanho: int, direcao: Optional[str], paginar: bool = True
+    ) -> PaginaDTO:
+        ha_mais = len(linhas) > tamanho
+        linhas = linhas[:tamanho]
+        if direcao == ANTERIOR:
+            linhas.reverse()
+
+        resultados = [PessoaService._para_dto(linha, colunas) for linha in linhas]
+        if not resultados or not paginar:
+            return PaginaDTO(resultados=resultados)
+
+        primeiro, ultimo = resultados[0], resultados[-1]
+        tem_proxima = ha_mais if direcao != ANTERIOR else True
+        tem_anterior = ha_mais if direcao == ANTERIOR else direcao is not None
+        return PaginaDTO(
+            resultados=resultados,
+            proximo=codificar_cursor(PROXIMA, ultimo.nome, ultimo.id) if tem_proxima else None,
+            anterior=codificar_cursor(ANTERIOR, primeiro.nome, primeiro.id) if tem_anterior else None
+        )
+
+    @staticmethod
+    def listar_mudancas(cursor: Optional[str] = None, limite: Optional[str] = None) -> MudancasDTO:
+        # Feed incremental: pessoas alteradas e exclusões depois do cursor, em
+        # ordem de tempo. Cada página lê só o trecho novo dos índices
+        # (atualizado_em, id) e (excluido_em, id), independentemente do tamanho
+        # da tabela. Com fragmentos, cada sequência é intercalada entre eles pela
+        # mesma chave
+        tamanho = normalizar_limite(limite)
+        alteracao, id_alteracao, exclusao, id_exclusao = mudancas.decodificar_cursor(cursor)
+        # No primário: numa réplica atrasada, alterações anteriores à fronteira
+        # ainda podem não ter chegado e o cursor passaria por elas
+        with roteador.primario():
+            fronteira = mudancas.limite_superior()
+
+            alteradas = Pessoa.objects.filter(atualizado_em__lt=fronteira)
+            if alteracao:
+                alteradas = alteradas.filter(
+                    Q(atualizado_em__gte=alteracao) & (Q(atualizado_em__gt=alteracao) | Q(id__gt=id_alteracao))
+                )
+            excluidas = PessoaExcluida.objects.filter(excluido_em__lt=fronteira)
+            if exclusao:
+                excluidas = excluidas.filter(
+                    Q(excluido_em__gte=exclusao) & (Q(excluido_em__gt=exclusao) | Q(id__gt=id_exclusao))
+                )
+            linhas = fragmentos.reunir(alteradas.order_by('atualizado_em', 'id').values_list(*COLUNAS_PESSOA), tamanho + 1)
+            marcas = fragmentos.reunir(
+                excluidas.order_by('excluido_em', 'id').values_list('id', 'pessoa_id', 'cpf', 'excluido_em'), tamanho + 1
+            )
+
+        # Intercala as duas sequências por tempo até completar a página
+        instante = COLUNAS_PESSOA.index('atualizado_em')
+        i = j = 0
+        while i + j < tamanho and (i < len(linhas) or j < len(marcas)):
+            if j == len(marcas) or (i < len(linhas) and linhas[i][instante] <= marcas[j][3]):
+                i += 1
+            else:
+                j += 1
+        if i:
+            alteracao, id_alteracao = linhas[i - 1][instante], linhas[i - 1][0]
+        if j:
+            exclusao, id_exclusao = marcas[j - 1][3], marcas[j - 1][0]
+        return MudancasDTO(
+            alteradas=[PessoaService._para_dto(linha, COLUNAS_PESSOA) for linha in linhas[:i]],
+            excluidas=[ExclusaoDTO(id=id, cpf=cpf, excluido_em=excluido_em) for _, id, cpf, excluido_em in marcas[:j]],
+            proximo=mudancas.codificar_cursor((alteracao, id_alteracao, exclusao, id_exclusao)),
+            ha_mais=i < len(linhas) or j < len(marcas)
+        )
+
+    @staticmethod
+    def marca_dagua() -> Tuple[Optional[datetime], int]:
+        # Validador barato da tabela inteira para as respostas condicionais da
+        # listagem: a maior data de alteração muda a cada escrita e a última
+        # marca de exclusão, a cada exclusão. Ambas saem do topo de um índice,
+        # sem percorrer a tabela
+        partes = fragmentos.espalhar(lambda alias: list(PessoaService._consulta_marca_dagua().using(alias)))
+        linhas = [linha for parte in partes for linha in parte]
+        # Os ids das marcas só crescem em cada fragmento: a soma também
+        return max((ultima for ultima, _ in linhas), default=None), sum(exclusao or 0 for _, exclusao in linhas)
+
+    @staticmethod
+    async def amarca_dagua() -> Tuple[Optional[datetime], int]:
+        if fragmentos.ativo():
+            return await sync_to_async(PessoaService.marca_dagua)()
+        linha = await PessoaService._consulta_marca_dagua().afirst()
+        return (linha[0], linha[1] or 0) if linha else (None, 0)
+
+    @staticmethod
+    def _consulta_marca_dagua():
+        # Uma linha: a pessoa alterada por último e, na mesma consulta, o id da
+        # última marca de exclusão. Tabela vazia não traz linha: a listagem
+        # vazia é a mesma, qualquer que seja o histórico
+        ultima_exclusao = PessoaExcluida.objects.order_by('-id').values('id')[:1]
+        return Pessoa.objects.order_by('-atualizado_em').values_list('atualizado_em', Subquery(ultima_exclusao))[:1]
+
+    @staticmethod
+    def exportar_todos() -> Iterator[tuple]:
+        # Cursor do lado do servidor: no PostgreSQL o iterator() usa um cursor
+        # nomeado e busca as linhas em blocos, sem materializar a tabela
+        return fragmentos.encadear(PessoaService._consulta_exportacao(), PessoaService._bloco_exportacao())
+
+    @staticmethod
+    async def aexportar_todos() -> AsyncIterator[tuple]:
+        # values() em vez de values_list(): o iterable de values_list executa a
+        # consulta já na chamada de __iter__, o que o aiterator() do Django não
+        # tolera dentro do laço de eventos
+        linhas = Pessoa.objects.order_by('id').values(*CAMPOS_EXPORTACAO)
+        # Um fragmento depois do outro, como em exportar_todos
+        for alias in fragmentos.fragmentos() if fragmentos.ativo() else [None]:
+            async for linha in linhas.using(alias).aiterator(chunk_size=PessoaService._bloco_exportacao()):
+                yield tuple(linha[campo] for campo in CAMPOS_EXPORTACAO)
+
+    @staticmethod
+    def _consulta_exportacao():
+        return Pessoa.objects.order_by('id').values_list(*CAMPOS_EXPORTACAO)
+
+    @staticmethod
+    def _bloco_exportacao() -> int:
+        return getattr(settings, 'PESSOA_EXPORTACAO_CHUNK', 2000)
+
     @staticmethod
     def calcular_peso_ideal(cpf: str) -> PesoIdealDTO:
-        pessoa = Pessoa.objects.get(cpf=cpf)
-        if pessoa.sexo == 'M':
-            peso_ideal = (72.7 * pessoa.altura) - 58
-        else:
-            peso_ideal = (62.1 * pessoa.altura) - 44.7
-        
-        diferenca = pessoa.peso - peso_ideal
-        if abs(diferenca) <= 2:  # Margem de 2kg para considerar peso adequado
-            status = "Peso adequado"
-            status_peso = "adequado"
-        elif diferenca > 0:
-            status = "Acima do peso ideal"
-            status_peso = "acima"
-        else:
-            status = "Abaixo do peso ideal"
-            status_peso = "abaixo"
-        
+        return PessoaService._peso_ideal(cpf, PessoaService.pesquisar_por_cpf(cpf))
+
+    @staticmethod
+    async def acalcular_peso_ideal(cpf: str) -> PesoIdealDTO:
+        return PessoaService._peso_ideal(cpf, await PessoaService.apesquisar_por_cpf(cpf))
+
+    @staticmethod
+    def _peso_ideal(cpf: str, pessoa: Optional[PessoaResponseDTO]) -> PesoIdealDTO:
+        if pessoa is None:
+            raise Pessoa.DoesNotExist(f"Pessoa com CPF {cpf} não encontrada")
+        peso_ideal = peso.calcular(pessoa.sexo, pessoa.altura)
+        status_peso = peso.classificar(pessoa.peso - peso_ideal)
+
         return PesoIdealDTO(
             peso_ideal=round(peso_ideal, 2),
-            status=status,
+            status=peso.DESCRICOES[status_peso],
             status_peso=status_peso
-        ) 
\ No newline at end of file
+        )
+
+    @staticmethod
+    def calcular_peso_ideal_lote(
+        cpfs: Optional[List[str]] = None, sexo: Optional[str] = None, limite: Optional[str] = None
+    ) -> List[PesoIdealLoteDTO]:
+        # Uma consulta (por bloco de CPFs) e o cálculo vetorizado com NumPy
+        linhas = []
+        for consulta, maximo in PessoaService._consultas_peso_ideal_lote(cpfs, sexo, limite):
+            linhas.extend(fragmentos.reunir(consulta, maximo))
+        return PessoaService._montar_peso_ideal_lote(linhas, cpfs)
+
+    @staticmethod
+    async def acalcular_peso_ideal_lote(
+        cpfs: Optional[List[str]] = None, sexo: Optional[str] = None, limite: Optional[str] = None
+    ) -> List[PesoIdealLoteDTO]:
+        if fragmentos.ativo():
+            return await sync_to_async(PessoaService.calcular_peso_ideal_lote)(cpfs, sexo, limite)
+        linhas = []
+        for consulta, maximo in PessoaService._consultas_peso_ideal_lote(cpfs, sexo, limite):
+            linhas.extend([linha async for linha in consulta[:maximo]])
+        return PessoaService._montar_peso_ideal_lote(linhas, cpfs)
+
+    @staticmethod
+    def _consultas_peso_ideal_lote(cpfs: Optional[List[str]], sexo: Optional[str], limite: Optional[str]):
+        # Pares (consulta, máximo de linhas)
+        campos = ('cpf_num', 'cpf', 'sexo', 'altura', 'peso')
+        if cpfs is not None:
+            tamanho_lote = getattr(settings, 'PESSOA_LOTE_BATCH_SIZE', 1000)
+            unicos = list(dict.fromkeys(c for c in map(chave_cpf, cpfs) if c is not None))
+            return [
+                (Pessoa.objects.filter(cpf_num__in=unicos[inicio:inicio + tamanho_lote]).order_by().values_list(*campos), None)
+                for inicio in range(0, len(unicos), tamanho_lote)
+            ]
+        pessoas = Pessoa.objects.all()
+        if sexo:
+            pessoas = pessoas.filter(sexo=sexo)
+        return [(pessoas.values_list(*campos), normalizar_limite(limite))]
+
+    @staticmethod
+    def _montar_peso_ideal_lote(linhas: List[tuple], cpfs: Optional[List[str]]) -> List[PesoIdealLoteDTO]:
+        if cpfs is None:
+            cpfs = [linha[1] for linha in linhas]
+        if not linhas:
+            return [PesoIdealLoteDTO(cpf=cpf, encontrado=False) for cpf in cpfs]
+
+        chaves, _, sexos, alturas, pesos = zip(*linhas)
+        peso_ideal, diferenca, status_peso = peso.calcular_lote(sexos, alturas, pesos)
+        calculados = dict(zip(
+            chaves, zip(peso.arredondar(peso_ideal), peso.arredondar(diferenca), status_peso.tolist())
+        ))
+        resultados = []
+        # Cada CPF é devolvido como foi pedido, com ou sem pontuação
+        for cpf in cpfs:
+            calculado = calculados.get(chave_cpf(cpf))
+            if calculado is None:
+                resultados.append(PesoIdealLoteDTO(cpf=cpf, encontrado=False))
+                continue
+            ideal, dif, situacao = calculado
+            resultados.append(PesoIdealLoteDTO(
+                cpf=cpf,
+                encontrado=True,
+                peso_ideal=ideal,
+                status=peso.DESCRICOES[situacao],
+                status_peso=situacao,
+                diferenca=dif
+            ))
+        return resultados
@@ -0,0 +1,55 @@
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator
+
+from .normalizacao import _digito_verificador, formatar_cpf
+
+# Permutação afim dos 9 primeiros dígitos: índices consecutivos geram CPFs
+# espalhados pelo índice, como numa base real. Os primeiros índices que cairiam
+# em CPFs de dígitos repetidos estão acima de LIMITE_INDICE
+_MULTIPLICADOR = 387420489
+_DESLOCAMENTO = 314159265
+LIMITE_INDICE = 50_000_000
+
+NOMES = {
+    'M': ('João', 'José', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas', 'Luiz', 'Marcos',
+          'Luís', 'Gabriel', 'Rafael', 'Daniel', 'Marcelo', 'Bruno', 'Eduardo', 'Felipe', 'Raimundo', 'Rodrigo'),
+    'F': ('Maria', 'Ana', 'Francisca', 'Antônia', 'Adriana', 'Juliana', 'Márcia', 'Fernanda', 'Patrícia', 'Aline',
+          'Sandra', 'Camila', 'Amanda', 'Bruna', 'Jéssica', 'Letícia', 'Júlia', 'Luciana', 'Vanessa', 'Mariana'),
+}
+SOBRENOMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa')
+
+# Média e desvio padrão da altura (m) por sexo; o peso vem de um IMC sorteado
+ALTURAS = {'M': (1.73, 0.07), 'F': (1.61, 0.065)}
+IMC = (26.5, 4.5)
+NASCIMENTO_MINIMO = date(1940, 1, 1)
+NASCIMENTO_MAXIMO = date(2008, 12, 31)
+
+
+def cpf_sintetico(indice: int) -> str:
+    if not 0 <= indice < LIMITE_INDICE:
+        raise ValueError(f"Índice sintético deve estar entre 0 e {LIMITE_INDICE - 1}")
+    base = f"{(indice * _MULTIPLICADOR + _DESLOCAMENTO) % 10 ** 9:09d}"
+    primeiro = _digito_verificador(base)
+    return formatar_cpf(f"{base}{primeiro}{_digito_verificador(base + str(primeiro))}")
+
+
+def gerar_pessoas(quantidade: int, inicio: int = 0, semente: int = 0) -> Iterator[Dict]:
+    # Mesmos argumentos, mesmas pessoas: os resultados podem ser comparados
+    # entre execuções
+    aleatorio = random.Random(f"{semente}:{inicio}")
+    dias = (NASCIMENTO_MAXIMO - NASCIMENTO_MINIMO).days
+    for indice in range(inicio, inicio + quantidade):
+        sexo = aleatorio.choice('MF')
+        media, desvio = ALTURAS[sexo]
+        altura = round(min(max(aleatorio.gauss(media, desvio), 1.40), 2.10), 2)
+        imc = min(max(aleatorio.gauss(*IMC), 16.0), 45.0)
+        yield {
+            'nome': f"{aleatorio.choice(NOMES[sexo])} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}",
+            'cpf': cpf_sintetico(indice),
+            'data_nasc': NASCIMENTO_MINIMO + timedelta(days=aleatorio.randrange(dias + 1)),
+            'sexo': sexo,
+            'altura': altura,
+            'peso': round(imc * altura ** 2, 1),
+        }
@@ -1,19 +1,31 @@
 from rest_framework.exceptions import ValidationError
 from .models import Pessoa
+from . import estatisticas
+from . import fragmentos
+from . import mudancas
+from . import peso_ideal as peso
+from .cache import cache_pessoas
+from .normalizacao import chave_cpf
 
 def incluir_pessoa(data):
     try:
-        pessoa = Pessoa.objects.create(**data)
+        with fragmentos.atomico(fragmentos.do_cpf(chave_cpf(data.get('cpf')))):
+            pessoa = Pessoa.objects.create(**data)
+            estatisticas.aplicar([pessoa])
         return pessoa
     except Exception as e:
         raise ValidationError(f"Erro ao incluir pessoa: {str(e)}")
 
 def alterar_pessoa(cpf, data):
     try:
-        pessoa = Pessoa.objects.get(cpf=cpf)
-        for key, value in data.items():
-            setattr(pessoa, key, value)
-        pessoa.save()
+        with fragmentos.atomico(fragmentos.do_cpf(chave_cpf(cpf))):
+            pessoa = Pessoa.objects.select_for_update().get(cpf_num=chave_cpf(cpf))
+            anterior, antigo = pessoa.cpf_num, estatisticas.registro(pessoa)
+            for key, value in data.items():
+                setattr(pessoa, key, value)
+            pessoa.save()
+            estatisticas.aplicar([pessoa], [antigo])
+        cache_pessoas.invalidar(str(anterior), str(pessoa.cpf_num))
         return pessoa
     except Pessoa.DoesNotExist:
         raise ValidationError(f"Pessoa com CPF {cpf} não encontrada")
@@ -22,8 +34,12 @@ def alterar_pessoa(cpf, data):
 
 def excluir_pessoa(cpf):
     try:
-        pessoa = Pessoa.objects.get(cpf=cpf)
-        pessoa.delete()
+        with fragmentos.atomico(fragmentos.do_cpf(chave_cpf(cpf))):
+            pessoa = Pessoa.objects.select_for_update().get(cpf_num=chave_cpf(cpf))
+            mudancas.registrar_exclusoes([pessoa])
+            pessoa.delete()
+            estatisticas.aplicar(removidos=[pessoa])
+        cache_pessoas.invalidar(str(pessoa.cpf_num))
     except Pessoa.DoesNotExist:
         raise ValidationError(f"Pessoa com CPF {cpf} não encontrada")
     except Exception as e:
@@ -31,8 +47,8 @@ def excluir_pessoa(cpf):
 
 def pesquisar_pessoa(cpf):
     try:
-        pessoa = Pessoa.objects.get(cpf=cpf)
-        return pessoa
+        chave = chave_cpf(cpf)
+        return Pessoa.objects.using(fragmentos.do_cpf(chave)).get(cpf_num=chave)
     except Pessoa.DoesNotExist:
         raise ValidationError(f"Pessoa com CPF {cpf} não encontrada")
     except Exception as e:
@@ -40,12 +56,9 @@ def pesquisar_pessoa(cpf):
 
 def calcular_peso_ideal(cpf):
     try:
-        pessoa = Pessoa.objects.get(cpf=cpf)
-        if pessoa.sexo == 'M':
-            peso_ideal = (72.7 * pessoa.altura) - 58
-        else:
-            peso_ideal = (62.1 * pessoa.altura) - 44.7
-        return round(peso_ideal, 2)
+        chave = chave_cpf(cpf)
+        pessoa = Pessoa.objects.using(fragmentos.do_cpf(chave)).get(cpf_num=chave)
+        return round(peso.calcular(pessoa.sexo, pessoa.altura), 2)
     except Pessoa.DoesNotExist:
         raise ValidationError(f"Pessoa com CPF {cpf} não encontrada")
     except Exception as e:
@@ -0,0 +1,116 @@
+import functools
+import inspect
+import re
+from collections import Counter
+from typing import Callable, Iterable, List
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+# Savepoints só existem porque o TestCase envolve cada teste numa transação;
+# em produção o atomic() mais externo vira BEGIN/COMMIT, que não são registrados
+_CONTROLE_TRANSACAO = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+_LITERAIS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...), ...'),
+)
+
+
+class OrcamentoExcedido(AssertionError):
+    pass
+
+
+def modelo_sql(sql: str) -> str:
+    # Troca literais e listas por marcadores para agrupar as consultas que só
+    # diferem nos valores (o sintoma de N+1)
+    for padrao, substituto in _LITERAIS:
+        sql = padrao.sub(substituto, sql)
+    return ' '.join(sql.split())
+
+
+def consultas_relevantes(capturadas: Iterable[dict]) -> List[str]:
+    return [q['sql'] for q in capturadas if not _CONTROLE_TRANSACAO.match(q['sql'])]
+
+
+def relatorio(consultas: List[str]) -> str:
+    linhas = []
+    for modelo, quantidade in Counter(modelo_sql(sql) for sql in consultas).most_common():
+        linhas.append(f"  {quantidade}x {modelo}")
+    return '\n'.join(linhas)
+
+
+# Falha quando o bloco executa mais consultas que `maximo`. Serve como
+# gerenciador de contexto (`async with` em código assíncrono) ou como decorator
+# de funções síncronas e assíncronas; as consultas ficam em `self.consultas`
+class orcamento_consultas:
+
+    def __init__(self, maximo: int, descricao: str = '', using: str = 'default'):
+        self.maximo = maximo
+        self.descricao = descricao
+        self.using = using
+        self.consultas: List[str] = []
+
+    def __enter__(self):
+        self._captura = CaptureQueriesContext(connections[self.using])
+        self._captura.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._captura.__exit__(exc_type, exc, tb)
+        if exc_type is not None:
+            return False
+        self.consultas = consultas_relevantes(self._captura.captured_queries)
+        if len(self.consultas) > self.maximo:
+            titulo = f"{self.descricao}: " if self.descricao else ''
+            raise OrcamentoExcedido(
+                f"{titulo}{len(self.consultas)} consultas para um orçamento de {self.maximo}, "
+                f"agrupadas por modelo:\n{relatorio(self.consultas)}"
+            )
+        return False
+
+    # A captura roda na mesma thread em que o sync_to_async executa o ORM
+    async def __aenter__(self):
+        return await sync_to_async(self.__enter__)()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await sync_to_async(self.__exit__)(exc_type, exc, tb)
+
+    def __call__(self, funcao: Callable):
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def envolvida_async(*args, **kwargs):
+                async with orcamento_consultas(self.maximo, self.descricao or funcao.__name__, self.using):
+                    return await funcao(*args, **kwargs)
+            return envolvida_async
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with orcamento_consultas(self.maximo, self.descricao or funcao.__name__, self.using):
+                return funcao(*args, **kwargs)
+        return envolvida
+
+
+def contar_consultas(chamada: Callable, using: str = 'default') -> List[str]:
+    with CaptureQueriesContext(connections[using]) as captura:
+        chamada()
+    return consultas_relevantes(captura.captured_queries)
+
+
+def verificar_consultas_constantes(chamada: Callable, semear: Callable[[int], None],
+                                   tamanhos: Iterable[int] = (3, 30), using: str = 'default') -> int:
+    # semear(n) deve deixar n linhas na base antes de cada medição
+    medicoes = {}
+    for tamanho in tamanhos:
+        semear(tamanho)
+        medicoes[tamanho] = contar_consultas(chamada, using)
+    quantidades = {tamanho: len(consultas) for tamanho, consultas in medicoes.items()}
+    if len(set(quantidades.values())) > 1:
+        maior = max(quantidades, key=quantidades.get)
+        raise OrcamentoExcedido(
+            f"Consultas crescem com o número de linhas {quantidades}; com {maior} linhas:\n"
+            f"{relatorio(medicoes[maior])}"
+        )
+    return next(iter(quantidades.values()))
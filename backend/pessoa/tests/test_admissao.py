@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .. import admissao
+from ..models import Pessoa
+from ..cache import cache_pessoas
+from ..metricas import registro_metricas
+from ..sintetico import gerar_pessoas
+
+LIMITES = {
+    'pontual': {'concorrencia': 2, 'fila': 0, 'espera': 0.1},
+    'pesada': {'concorrencia': 1, 'fila': 0, 'espera': 0.1},
+}
+
+
+class LimitadorTest(SimpleTestCase):
+    def test_fila_limitada(self):
+        limitador = admissao.Limitador('teste', concorrencia=1, fila=1, espera=5)
+        self.assertTrue(limitador.entrar())
+
+        resultado = []
+        esperando = threading.Thread(target=lambda: resultado.append(limitador.entrar()))
+        esperando.start()
+        while not limitador.estatisticas()['aguardando']:
+            pass
+        # Fila cheia: recusa na hora, sem esperar
+        self.assertFalse(limitador.entrar())
+
+        # A vaga passa direto para quem esperava
+        limitador.sair()
+        esperando.join()
+        self.assertEqual(resultado, [True])
+        dados = limitador.estatisticas()
+        self.assertEqual((dados['em_uso'], dados['aguardando'], dados['admitidas']), (1, 0, 2))
+        self.assertEqual(dados['rejeitadas'], {'fila_cheia': 1, 'espera_esgotada': 0})
+
+        limitador.sair()
+        self.assertEqual(limitador.estatisticas()['em_uso'], 0)
+
+    def test_espera_esgotada(self):
+        limitador = admissao.Limitador('teste', concorrencia=1, fila=1, espera=0.01)
+        limitador.entrar()
+
+        self.assertFalse(limitador.entrar())
+        self.assertFalse(asyncio.run(limitador.aentrar()))
+        self.assertEqual(limitador.estatisticas()['rejeitadas']['espera_esgotada'], 2)
+        self.assertEqual(limitador.estatisticas()['aguardando'], 0)
+
+    def test_espera_assincrona(self):
+        limitador = admissao.Limitador('teste', concorrencia=1, fila=1, espera=5)
+        limitador.entrar()
+
+        async def esperar():
+            tarefa = asyncio.ensure_future(limitador.aentrar())
+            while not limitador.estatisticas()['aguardando']:
+                await asyncio.sleep(0)
+            # Liberada de outra thread, como um worker síncrono
+            await asyncio.to_thread(limitador.sair)
+            return await tarefa
+
+        self.assertTrue(asyncio.run(esperar()))
+        self.assertEqual(limitador.estatisticas()['em_uso'], 1)
+
+    def test_balde_de_fichas(self):
+        balde = admissao.BaldeFichas(taxa=1, rajada=2)
+
+        self.assertEqual([balde.retirar('a'), balde.retirar('a')], [0, 0])
+        self.assertGreater(balde.retirar('a'), 0)
+        self.assertEqual(balde.retirar('b'), 0)
+        self.assertEqual(balde.rejeitadas, 1)
+
+
+@override_settings(PESSOA_ADMISSAO=LIMITES)
+class AdmissaoMiddlewareTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        registro_metricas.limpar()
+        admissao.limpar()
+        self.client = APIClient()
+        self.pessoa = Pessoa.objects.create(**next(gerar_pessoas(1)))
+        self.listar = reverse('backend.pessoa:pessoa-listar')
+        self.pesquisar = reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf])
+
+    def _ocupar(self, classe):
+        limitador = admissao._limitador(classe)
+        while limitador.entrar():
+            pass
+        self.addCleanup(lambda: [limitador.sair() for _ in range(limitador.em_uso)])
+        return limitador
+
+    def test_sobrecarga_responde_503(self):
+        self._ocupar('pesada')
+
+        response = self.client.get(self.listar)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertIn('error', response.json())
+
+        # Leituras pontuais e o monitoramento têm limites próprios
+        self.assertEqual(self.client.get(self.pesquisar).status_code, status.HTTP_200_OK)
+        dados = self.client.get(reverse('backend.pessoa:pessoa-admissao')).data
+        self.assertEqual(dados['classes']['pesada']['em_uso'], 1)
+        self.assertEqual(dados['classes']['pesada']['rejeitadas']['fila_cheia'], 2)
+        self.assertEqual(dados['classes']['pontual']['em_uso'], 0)
+
+        texto = registro_metricas.exportar()
+        self.assertIn('pessoa_admissao_em_uso{classe="pesada"} 1', texto)
+        self.assertIn('pessoa_admissao_rejeitadas_total{classe="pesada",motivo="fila_cheia"} 2', texto)
+        self.assertIn('view="backend.pessoa:pessoa-listar",metodo="GET",status="503"} 1', texto)
+
+    def test_exportacao_segura_a_vaga_ate_o_fim(self):
+        response = self.client.get(reverse('backend.pessoa:pessoa-exportar'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(admissao._limitador('pesada').em_uso, 1)
+        self.assertEqual(self.client.get(self.listar).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(admissao._limitador('pesada').em_uso, 0)
+        self.assertEqual(self.client.get(self.listar).status_code, status.HTTP_200_OK)
+
+    def test_exportacao_fechada_antes_do_corpo(self):
+        # Cliente que desconecta antes do primeiro bloco também devolve a vaga
+        response = self.client.get(reverse('backend.pessoa:pessoa-exportar'))
+        self.assertEqual(admissao._limitador('pesada').em_uso, 1)
+        response.close()
+        self.assertEqual(admissao._limitador('pesada').em_uso, 0)
+
+    async def test_exportacao_assincrona_segura_a_vaga(self):
+        response = await AsyncClient().get(reverse('backend.pessoa.async:pessoa-exportar'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(admissao._limitador('pesada').em_uso, 1)
+
+        partes = [parte async for parte in response.streaming_content]
+        self.assertIn(self.pessoa.cpf.encode(), b''.join(partes))
+        self.assertEqual(admissao._limitador('pesada').em_uso, 0)
+
+    @override_settings(PESSOA_ADMISSAO_TAXA=(0.5, 2))
+    def test_taxa_por_cliente(self):
+        self.assertEqual(self.client.get(self.pesquisar).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.pesquisar).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.pesquisar)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '2')
+        # Outro cliente tem o próprio balde
+        self.assertEqual(self.client.get(self.pesquisar, REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    async def test_views_assincronas(self):
+        self._ocupar('pesada')
+
+        response = await AsyncClient().get(reverse('backend.pessoa.async:pessoa-listar'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(PESSOA_ADMISSAO={})
+    def test_desligado(self):
+        self.assertEqual(self.client.get(self.listar).status_code, status.HTTP_200_OK)
+        self.assertEqual(admissao.estatisticas_admissao()['limitadas_por_taxa'], 0)
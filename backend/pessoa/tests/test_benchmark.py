@@ -0,0 +1,70 @@
+import io
+import json
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from ..models import Pessoa, ResumoPessoa
+from ..normalizacao import normalizar_cpf
+from ..sintetico import cpf_sintetico, gerar_pessoas
+
+
+class SinteticoTest(TestCase):
+    def test_gerar_pessoas(self):
+        pessoas = list(gerar_pessoas(500, semente=7))
+
+        self.assertEqual(pessoas, list(gerar_pessoas(500, semente=7)))
+        self.assertEqual(len({p['cpf'] for p in pessoas}), 500)
+        for pessoa in pessoas:
+            self.assertEqual(normalizar_cpf(pessoa['cpf']), pessoa['cpf'])
+            self.assertTrue(1.40 <= pessoa['altura'] <= 2.10)
+            self.assertGreater(pessoa['peso'], 0)
+        self.assertEqual(pessoas[10]['cpf'], cpf_sintetico(10))
+
+    def test_cpf_fora_do_limite(self):
+        with self.assertRaises(ValueError):
+            cpf_sintetico(-1)
+
+    def test_comando_seed_pessoas(self):
+        saida = io.StringIO()
+        call_command('seed_pessoas', '50', '--bloco', '20', stdout=saida)
+        call_command('seed_pessoas', '60', stdout=io.StringIO())
+
+        self.assertIn('50 inseridas', saida.getvalue())
+        self.assertEqual(Pessoa.objects.count(), 60)
+        self.assertEqual(sum(ResumoPessoa.objects.values_list('quantidade', flat=True)), 60)
+
+
+class BenchmarkPessoasTest(TestCase):
+    def test_comando_benchmark_pessoas(self):
+        saida = io.StringIO()
+        call_command(
+            'benchmark_pessoas', '--banco-atual', '--tamanhos', '20', '40', '--requisicoes', '3',
+            stdout=saida, stderr=io.StringIO()
+        )
+
+        resultado = json.loads(saida.getvalue())
+        self.assertEqual(resultado['ambiente']['requisicoes'], 3)
+        self.assertEqual(set(resultado['resultados']), {'20', '40'})
+        operacoes = resultado['resultados']['40']['operacoes']
+        self.assertEqual(set(operacoes), {'criar', 'pesquisar', 'peso_ideal', 'listar', 'atualizar', 'excluir'})
+        for medida in operacoes.values():
+            self.assertEqual(medida['erros'], 0)
+            self.assertEqual(medida['requisicoes'], 3)
+            self.assertIn('p99_ms', medida)
+        self.assertEqual(resultado['resultados']['40']['pessoas'], 40)
+
+
+class BenchmarkPerfisTest(SimpleTestCase):
+    def test_comando_benchmark_perfis(self):
+        saida = io.StringIO()
+        call_command('benchmark_perfis', '--repeticoes', '1', '--requisicoes', '5', '--json', stdout=saida)
+
+        resultado = json.loads(saida.getvalue())
+        completo, api = resultado['backend.settings'], resultado['backend.settings_api']
+        for medida in (completo, api):
+            self.assertGreater(medida['inicio_worker_ms'], medida['importacao_ms'])
+            self.assertGreater(medida['requisicao_us'], 0)
+            # numpy só é importado no primeiro cálculo em lote
+            self.assertFalse(medida['numpy'])
+        self.assertLess(api['middlewares'], completo['middlewares'])
+        self.assertLess(api['apps'], completo['apps'])
+        self.assertLess(api['modulos'], completo['modulos'])
@@ -0,0 +1,114 @@
+import threading
+import time
+from datetime import date
+from django.test import TestCase, override_settings
+from ..models import Pessoa
+from ..cache import CacheLRU, cache_pessoas
+from ..dto import PessoaDTO
+from ..services import PessoaService
+
+
+class CacheLRUTest(TestCase):
+    def test_remove_menos_usado(self):
+        cache = CacheLRU(tamanho_maximo=2, ttl=60)
+        cache.gravar('a', 1)
+        cache.gravar('b', 2)
+        cache.obter('a')
+        cache.gravar('c', 3)
+
+        self.assertEqual(cache.obter('a'), 1)
+        self.assertEqual(cache.obter('c'), 3)
+        self.assertNotEqual(cache.obter('b'), 2)
+
+    def test_expira_pelo_ttl(self):
+        cache = CacheLRU(tamanho_maximo=10, ttl=0.01)
+        cache.gravar('a', 1)
+        time.sleep(0.02)
+
+        self.assertNotEqual(cache.obter('a'), 1)
+        self.assertEqual(len(cache), 0)
+
+
+class CachePessoasTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.dto = PessoaDTO(
+            nome="João Silva", cpf="12345678900", data_nasc=date(1990, 1, 1),
+            sexo="M", altura=1.75, peso=70.0
+        )
+
+    def test_leituras_usam_cache(self):
+        PessoaService.criar_pessoa(self.dto)
+
+        with self.assertNumQueries(1):
+            PessoaService.pesquisar_por_cpf(self.dto.cpf)
+            PessoaService.pesquisar_por_cpf(self.dto.cpf)
+            PessoaService.calcular_peso_ideal(self.dto.cpf)
+
+        estatisticas = PessoaService.estatisticas_cache()
+        self.assertEqual(estatisticas['faltas'], 1)
+        self.assertEqual(estatisticas['acertos_local'], 2)
+
+    def test_escritas_invalidam(self):
+        PessoaService.criar_pessoa(self.dto)
+        PessoaService.pesquisar_por_cpf(self.dto.cpf)
+
+        self.dto.peso = 95.0
+        PessoaService.atualizar_pessoa(self.dto)
+        self.assertEqual(PessoaService.pesquisar_por_cpf(self.dto.cpf).peso, 95.0)
+
+        PessoaService.excluir_pessoa(self.dto.cpf)
+        self.assertIsNone(PessoaService.pesquisar_por_cpf(self.dto.cpf))
+
+    def test_ausencia_nao_fica_em_cache(self):
+        self.assertIsNone(PessoaService.pesquisar_por_cpf(self.dto.cpf))
+        Pessoa.objects.create(
+            nome=self.dto.nome, cpf=self.dto.cpf, data_nasc=self.dto.data_nasc,
+            sexo=self.dto.sexo, altura=self.dto.altura, peso=self.dto.peso
+        )
+
+        self.assertIsNotNone(PessoaService.pesquisar_por_cpf(self.dto.cpf))
+
+    @override_settings(
+        PESSOA_CACHE_ALIAS='pessoas',
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'pessoas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pessoas'},
+        }
+    )
+    def test_segunda_camada(self):
+        PessoaService.criar_pessoa(self.dto)
+        PessoaService.pesquisar_por_cpf(self.dto.cpf)
+        # Simula outro processo: a camada local começa vazia
+        cache_pessoas.local.limpar()
+
+        with self.assertNumQueries(0):
+            pessoa = PessoaService.pesquisar_por_cpf(self.dto.cpf)
+        self.assertEqual(pessoa.nome, self.dto.nome)
+        self.assertEqual(PessoaService.estatisticas_cache()['acertos_compartilhado'], 1)
+
+    def test_cargas_simultaneas_agrupadas(self):
+        liberar = threading.Event()
+        chamadas = []
+
+        def carregador():
+            chamadas.append(1)
+            liberar.wait(1)
+            return 'valor'
+
+        resultados = []
+        threads = [
+            threading.Thread(target=lambda: resultados.append(cache_pessoas.obter('chave', carregador)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        limite = time.monotonic() + 2
+        while cache_pessoas.estatisticas()['coalescidas'] < 4 and time.monotonic() < limite:
+            time.sleep(0.001)
+        liberar.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(resultados, ['valor'] * 5)
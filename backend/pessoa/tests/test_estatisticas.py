@@ -0,0 +1,89 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from datetime import date
+from .. import estatisticas
+from ..models import HistogramaPessoa, Pessoa, ResumoPessoa
+from ..cache import cache_pessoas
+from ..services import PessoaService
+from ..dto import PessoaDTO
+
+class EstatisticasPopulacaoTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.pessoas = [
+            PessoaDTO(nome="João Silva", cpf="123.456.789-09", data_nasc=date(1990, 1, 1), sexo="M", altura=1.75, peso=70.0),
+            PessoaDTO(nome="Maria Santos", cpf="987.654.321-00", data_nasc=date(1992, 5, 15), sexo="F", altura=1.65, peso=55.0),
+            PessoaDTO(nome="Ana Souza", cpf="111.444.777-35", data_nasc=date(1960, 3, 2), sexo="F", altura=1.60, peso=80.0),
+        ]
+        for dto in self.pessoas:
+            PessoaService.criar_pessoa(dto)
+
+    def _agregados(self):
+        resumo = sorted(
+            (sexo, ano, status_peso, quantidade, round(altura, 6), round(peso, 6))
+            for sexo, ano, status_peso, quantidade, altura, peso in ResumoPessoa.objects.filter(quantidade__gt=0).values_list(
+                'sexo', 'ano_nasc', 'status_peso', 'quantidade', 'soma_altura', 'soma_peso'
+            )
+        )
+        histograma = sorted(HistogramaPessoa.objects.filter(quantidade__gt=0).values_list('medida', 'sexo', 'classe', 'quantidade'))
+        return resumo, histograma
+
+    def assertAgregadosConsistentes(self):
+        incrementais = self._agregados()
+        estatisticas.reconstruir()
+        self.assertEqual(incrementais, self._agregados())
+
+    def test_consultar(self):
+        resultado = estatisticas.consultar(hoje=date(2026, 6, 1))
+
+        self.assertEqual(resultado.total, 3)
+        self.assertEqual(resultado.por_sexo, {'F': 2, 'M': 1})
+        self.assertEqual(resultado.por_faixa_etaria['30-39'], 2)
+        self.assertEqual(resultado.por_faixa_etaria['60+'], 1)
+        self.assertEqual(sum(resultado.por_status_peso.values()), 3)
+        self.assertEqual(resultado.altura['geral']['media'], 1.67)
+        self.assertEqual(resultado.altura['F']['p50'], 1.6)
+        self.assertEqual(resultado.peso['geral']['p50'], 70.0)
+        self.assertEqual(resultado.peso['M']['desvio_padrao'], 0.0)
+
+    def test_escritas_mantem_agregados(self):
+        PessoaService.atualizar_parcial("123.456.789-09", {"peso": 95.0, "data_nasc": date(1980, 1, 1)})
+        PessoaService.atualizar_parcial("987.654.321-00", {"nome": "Maria S."})
+        PessoaService.atualizar_pessoa(PessoaDTO(
+            nome="Ana Souza", cpf="111.444.777-35", data_nasc=date(1960, 3, 2), sexo="F", altura=1.62, peso=60.0
+        ))
+        PessoaService.excluir_pessoa("987.654.321-00")
+        PessoaService.criar_lote([{
+            'nome': 'Pedro Lima', 'cpf': '529.982.247-25', 'data_nasc': '2010-07-07',
+            'sexo': 'M', 'altura': 1.50, 'peso': 45.0
+        }])
+
+        self.assertAgregadosConsistentes()
+        self.assertEqual(estatisticas.consultar().total, Pessoa.objects.count())
+
+    def test_reconstruir(self):
+        ResumoPessoa.objects.all().delete()
+        HistogramaPessoa.objects.all().delete()
+
+        self.assertEqual(estatisticas.reconstruir(), 3)
+        self.assertEqual(estatisticas.consultar().total, 3)
+
+    def test_endpoint(self):
+        response = APIClient().get(reverse('backend.pessoa:pessoa-estatisticas'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['por_sexo'], {'F': 2, 'M': 1})
+        self.assertIn('p95', response.data['altura']['geral'])
+
+    def test_endpoint_sem_pessoas(self):
+        for dto in self.pessoas:
+            PessoaService.excluir_pessoa(dto.cpf)
+
+        response = APIClient().get(reverse('backend.pessoa:pessoa-estatisticas'))
+
+        self.assertEqual(response.data['total'], 0)
+        self.assertEqual(response.data['grupos'], [])
+        self.assertIsNone(response.data['peso']['geral']['p50'])
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .. import fila
+from ..models import Pessoa, ResumoPessoa, Tarefa
+from ..cache import cache_pessoas
+from ..sintetico import cpf_sintetico
+
+def _pessoa(i):
+    return {
+        'nome': f'Pessoa {i}', 'cpf': cpf_sintetico(i), 'data_nasc': '1990-01-01',
+        'sexo': 'F', 'altura': 1.60, 'peso': 55.0
+    }
+
+class FilaTarefasTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.client = APIClient()
+
+    def _trabalhar(self):
+        call_command('run_pessoa_worker', '--ate-esvaziar', stdout=StringIO())
+
+    def test_criar_lote_assincrono(self):
+        itens = [_pessoa(i) for i in range(1, 4)] + [{'nome': 'Sem CPF'}]
+        response = self.client.post(
+            reverse('backend.pessoa:pessoa-criar-lote'), itens, format='json', HTTP_PREFER='respond-async'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['estado'], Tarefa.PENDENTE)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(Pessoa.objects.count(), 0)
+
+        self._trabalhar()
+
+        tarefa = self.client.get(response['Location'])
+        self.assertEqual(tarefa.status_code, status.HTTP_200_OK)
+        self.assertEqual(tarefa.data['estado'], Tarefa.CONCLUIDA)
+        self.assertEqual(tarefa.data['progresso'], 4)
+        self.assertEqual(tarefa.data['resultado']['criados'], 3)
+        self.assertEqual([r['indice'] for r in tarefa.data['resultado']['resultados']], [3])
+        self.assertEqual(Pessoa.objects.count(), 3)
+
+    @override_settings(PESSOA_LOTE_ASSINCRONO=2, PESSOA_LOTE_BATCH_SIZE=2)
+    def test_lote_grande_vai_para_fila(self):
+        response = self.client.post(reverse('backend.pessoa:pessoa-criar-lote'), [_pessoa(1)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(
+            reverse('backend.pessoa:pessoa-criar-lote'), [_pessoa(i) for i in range(2, 7)], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    @override_settings(PESSOA_LOTE_BATCH_SIZE=2)
+    def test_nova_tentativa_retoma_do_progresso(self):
+        tarefa = fila.enfileirar('criar_lote', {'itens': [_pessoa(i) for i in range(1, 6)]}, total=5)
+        Pessoa.objects.create(**_pessoa(1))
+        Tarefa.objects.filter(pk=tarefa.pk).update(
+            progresso=2, resultado={'criados': 2, 'falhas': 0, 'resultados': []}
+        )
+
+        self._trabalhar()
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.estado, Tarefa.CONCLUIDA)
+        self.assertEqual(tarefa.resultado['criados'], 5)
+        # Os dois primeiros itens não são reprocessados
+        self.assertEqual(Pessoa.objects.count(), 4)
+
+    @override_settings(PESSOA_TAREFA_TENTATIVAS=2, PESSOA_TAREFA_ESPERA=60)
+    def test_falha_e_nova_tentativa(self):
+        falhar = mock.Mock(side_effect=RuntimeError('banco fora do ar'))
+        with mock.patch.dict(fila.TIPOS, {'reconstruir_estatisticas': falhar}):
+            tarefa = fila.enfileirar('reconstruir_estatisticas', {})
+            self.assertFalse(fila.executar(fila.reservar('teste')))
+
+            tarefa.refresh_from_db()
+            self.assertEqual(tarefa.estado, Tarefa.PENDENTE)
+            self.assertEqual(tarefa.erro, 'banco fora do ar')
+            self.assertGreater(tarefa.disponivel_em, timezone.now() + timedelta(seconds=50))
+            # Ainda esperando: nada disponível
+            self.assertIsNone(fila.reservar('teste'))
+
+            Tarefa.objects.filter(pk=tarefa.pk).update(disponivel_em=timezone.now())
+            fila.executar(fila.reservar('teste'))
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.estado, Tarefa.FALHOU)
+        self.assertEqual(tarefa.tentativas, 2)
+
+    def test_reserva_expirada_volta_para_fila(self):
+        tarefa = fila.enfileirar('reconstruir_estatisticas', {})
+        self.assertEqual(fila.reservar('morto').id, tarefa.id)
+        self.assertIsNone(fila.reservar('outro'))
+
+        Tarefa.objects.filter(pk=tarefa.pk).update(disponivel_em=timezone.now() - timedelta(seconds=1))
+        reservada = fila.reservar('outro')
+
+        self.assertEqual(reservada.id, tarefa.id)
+        self.assertEqual(reservada.trabalhador, 'outro')
+        self.assertEqual(reservada.tentativas, 2)
+
+    def test_reconstruir_estatisticas(self):
+        Pessoa.objects.create(**_pessoa(1))
+        response = self.client.post(reverse('backend.pessoa:pessoa-estatisticas-reconstruir'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self._trabalhar()
+
+        tarefa = self.client.get(response['Location'])
+        self.assertEqual(tarefa.data['resultado'], {'pessoas': 1})
+        self.assertEqual(ResumoPessoa.objects.get().quantidade, 1)
+
+    def test_tarefa_nao_encontrada(self):
+        response = self.client.get(reverse('backend.pessoa:pessoa-tarefa', args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,249 @@
+from collections import Counter
+from io import StringIO
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib import admin
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .. import estatisticas, fragmentos, tasks
+from ..dto import PessoaDTO
+from ..importacao import ATUALIZAR, importar_registros
+from ..models import Pessoa, PessoaExcluida
+from ..normalizacao import chave_cpf
+from ..cache import cache_pessoas
+from ..services import PessoaService
+from ..sintetico import gerar_pessoas
+
+TRES = ['default', 'fragmento_1', 'fragmento_2']
+COM_FRAGMENTOS = set(TRES) <= set(settings.DATABASES)
+
+class JumpHashTest(SimpleTestCase):
+    def test_estavel_e_distribuido(self):
+        chaves = range(10 ** 10, 10 ** 10 + 6000)
+        indices = [fragmentos.indice_do_cpf(chave, 3) for chave in chaves]
+
+        self.assertEqual(indices, [fragmentos.indice_do_cpf(chave, 3) for chave in chaves])
+        for quantidade in Counter(indices).values():
+            self.assertAlmostEqual(quantidade / len(indices), 1 / 3, delta=0.03)
+
+    def test_novo_fragmento_so_recebe_pessoas(self):
+        chaves = range(10 ** 10, 10 ** 10 + 6000)
+        movidas = [
+            (fragmentos.indice_do_cpf(chave, 3), fragmentos.indice_do_cpf(chave, 4))
+            for chave in chaves if fragmentos.indice_do_cpf(chave, 3) != fragmentos.indice_do_cpf(chave, 4)
+        ]
+        # Só as que vão para o fragmento novo mudam: cerca de 1/4
+        self.assertEqual({destino for _, destino in movidas}, {3})
+        self.assertAlmostEqual(len(movidas) / len(chaves), 1 / 4, delta=0.03)
+
+    @override_settings(PESSOA_FRAGMENTOS=[])
+    def test_desligado(self):
+        self.assertFalse(fragmentos.ativo())
+        self.assertIsNone(fragmentos.do_cpf(12345678909))
+        # Sem fragmentos, a ordem do nome é a da collation da coluna
+        self.assertEqual(fragmentos.por_nome(Pessoa.objects.all())[1], 'nome')
+
+    @override_settings(PESSOA_FRAGMENTOS=TRES)
+    def test_nome_por_code_point_no_postgresql(self):
+        with mock.patch.object(connections['default'], 'vendor', 'postgresql'):
+            consulta, campo = fragmentos.por_nome(Pessoa.objects.all())
+        self.assertIn('COLLATE "C"', str(consulta.order_by(campo, 'id').query))
+
+# Precisa de fragmento_1 e fragmento_2 em DATABASES (ex.: dois SQLite locais)
+@skipUnless(COM_FRAGMENTOS, 'Sem bancos de fragmentos configurados')
+@override_settings(PESSOA_FRAGMENTOS=TRES)
+class FragmentosTest(TransactionTestCase):
+    # Só declara os aliases se existirem: o runner prepara os bancos antes do skip
+    databases = set(TRES) if COM_FRAGMENTOS else {'default'}
+
+    def setUp(self):
+        cache_pessoas.limpar()
+        fragmentos.preparar_ids()
+        self.client = APIClient()
+
+    def _criar(self, quantidade, inicio=0):
+        return [PessoaService.criar_pessoa(PessoaDTO(**p)) for p in gerar_pessoas(quantidade, inicio=inicio)]
+
+    def _cpfs_por_fragmento(self):
+        return {alias: set(Pessoa.objects.using(alias).values_list('cpf_num', flat=True)) for alias in TRES}
+
+    def _conferir_distribuicao(self):
+        for alias, chaves in self._cpfs_por_fragmento().items():
+            for chave in chaves:
+                self.assertEqual(fragmentos.do_cpf(chave), alias)
+
+    def test_operacoes_por_cpf(self):
+        pessoas = self._criar(30)
+        self._conferir_distribuicao()
+        self.assertTrue(all(self._cpfs_por_fragmento().values()))
+        # Ids únicos entre os fragmentos
+        self.assertEqual(len({p.id for p in pessoas}), 30)
+
+        alvo = pessoas[7]
+        self.assertEqual(PessoaService.pesquisar_por_cpf(alvo.cpf).id, alvo.id)
+        self.assertEqual(PessoaService.atualizar_parcial(alvo.cpf, {'peso': 99.0}).peso, 99.0)
+        self.assertEqual(PessoaService.calcular_peso_ideal(alvo.cpf).status_peso, 'acima')
+
+        PessoaService.excluir_pessoa(alvo.cpf)
+        self.assertIsNone(PessoaService.pesquisar_por_cpf(alvo.cpf))
+        alias = fragmentos.do_cpf(chave_cpf(alvo.cpf))
+        self.assertTrue(PessoaExcluida.objects.using(alias).filter(pessoa_id=alvo.id).exists())
+
+        response = self.client.get(reverse('backend.pessoa:pessoa-pesquisar', args=[pessoas[3].cpf]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_listagem_intercala_os_fragmentos(self):
+        self._criar(25)
+        esperado = sorted(linha for alias in TRES for linha in Pessoa.objects.using(alias).values_list('nome', 'id'))
+
+        vistos, cursor = [], None
+        while True:
+            pagina = PessoaService.listar_pagina(cursor=cursor, limite='7')
+            vistos += [(p.nome, p.id) for p in pagina.resultados]
+            if not pagina.proximo:
+                break
+            cursor = pagina.proximo
+        self.assertEqual(vistos, esperado)
+
+        # 25 pessoas: a última página tem 4 e a anterior a ela, 7
+        anterior = PessoaService.listar_pagina(cursor=pagina.anterior, limite='7')
+        self.assertEqual([(p.nome, p.id) for p in anterior.resultados], esperado[-11:-4])
+        self.assertEqual([(p.nome, p.id) for p in PessoaService.listar_todos()], esperado)
+
+    def test_listagem_com_maiusculas_e_acentos(self):
+        nomes = ['álvaro', 'Zé', 'ana', 'Bruno', 'Ângela', 'zuleica', 'Éder', 'bia', 'André', 'carla']
+        for pessoa, nome in zip(gerar_pessoas(len(nomes), inicio=500), nomes):
+            PessoaService.criar_pessoa(PessoaDTO(**dict(pessoa, nome=nome)))
+        self.assertGreater(sum(1 for chaves in self._cpfs_por_fragmento().values() if chaves), 1)
+
+        vistos, cursor = [], None
+        while True:
+            pagina = PessoaService.listar_pagina(cursor=cursor, limite='3')
+            vistos += [p.nome for p in pagina.resultados]
+            if not pagina.proximo:
+                break
+            cursor = pagina.proximo
+        # Sem repetir nem pular: a mesma ordem que cada banco usa no ORDER BY
+        self.assertEqual(vistos, sorted(nomes))
+
+    def test_lote_e_estatisticas(self):
+        relatorio = PessoaService.criar_lote([dict(p, data_nasc=p['data_nasc'].isoformat()) for p in gerar_pessoas(40)])
+        self.assertEqual(relatorio.criados, 40)
+        self._conferir_distribuicao()
+
+        resultado = PessoaService.sincronizar(
+            [dict(p, data_nasc=p['data_nasc'].isoformat(), peso=80.0) for p in gerar_pessoas(45)]
+        )
+        self.assertEqual((resultado.inseridas, resultado.atualizadas), (5, 40))
+
+        incrementais = PessoaService.estatisticas_populacao()
+        self.assertEqual(incrementais.total, 45)
+        self.assertEqual(estatisticas.reconstruir(), 45)
+        self.assertEqual(PessoaService.estatisticas_populacao().grupos, incrementais.grupos)
+        ultima = max(Pessoa.objects.using(alias).latest('atualizado_em').atualizado_em for alias in TRES)
+        self.assertEqual(PessoaService.marca_dagua(), (ultima, 0))
+        self.assertEqual(sum(1 for _ in PessoaService.exportar_todos()), 45)
+
+    def test_importacao_grava_em_cada_fragmento(self):
+        resumo = importar_registros(gerar_pessoas(40), tamanho_bloco=15)
+        self.assertEqual(resumo.inseridas, 40)
+        self._conferir_distribuicao()
+        self.assertTrue(all(self._cpfs_por_fragmento().values()))
+
+        resumo = importar_registros((dict(p, peso=80.0) for p in gerar_pessoas(45)), conflito=ATUALIZAR)
+        self.assertEqual((resumo.inseridas, resumo.atualizadas), (5, 40))
+        self._conferir_distribuicao()
+        self.assertEqual(PessoaService.estatisticas_populacao().total, 45)
+
+    def test_tarefas_gravam_no_fragmento_do_cpf(self):
+        dados = list(gerar_pessoas(12))
+        for p in dados:
+            tasks.incluir_pessoa(p)
+        self._conferir_distribuicao()
+
+        alvo = dados[5]['cpf']
+        self.assertEqual(tasks.alterar_pessoa(alvo, {'peso': 99.0}).peso, 99.0)
+        self.assertEqual(tasks.pesquisar_pessoa(alvo).peso, 99.0)
+        tasks.excluir_pessoa(alvo)
+        self.assertIsNone(PessoaService.pesquisar_por_cpf(alvo))
+        self.assertEqual(PessoaExcluida.objects.using(fragmentos.do_cpf(chave_cpf(alvo))).count(), 1)
+        self.assertEqual(PessoaService.estatisticas_populacao().total, 11)
+
+    def test_admin_grava_no_fragmento_do_cpf(self):
+        modelo_admin = admin.site._registry[Pessoa]
+        pessoa, outra = self._criar(2)
+        # Um CPF que cai em outro fragmento
+        destino = next(
+            p for p in gerar_pessoas(200, inicio=100)
+            if fragmentos.do_cpf(chave_cpf(p['cpf'])) != fragmentos.do_cpf(chave_cpf(pessoa.cpf))
+        )
+
+        obj = modelo_admin.get_object(None, str(pessoa.id))
+        self.assertEqual(obj._state.db, fragmentos.do_cpf(chave_cpf(pessoa.cpf)))
+        formulario = type('Formulario', (), {'initial': {'cpf': obj.cpf}})()
+        obj.cpf = destino['cpf']
+        modelo_admin.save_model(None, obj, formulario, change=True)
+
+        self._conferir_distribuicao()
+        movida = PessoaService.pesquisar_por_cpf(destino['cpf'])
+        self.assertEqual(movida.id, pessoa.id)
+        self.assertIsNone(PessoaService.pesquisar_por_cpf(pessoa.cpf))
+        self.assertEqual(PessoaService.estatisticas_populacao().total, 2)
+
+        obj = modelo_admin.get_object(None, str(outra.id))
+        modelo_admin.delete_model(None, obj)
+        self.assertIsNone(PessoaService.pesquisar_por_cpf(outra.cpf))
+        self.assertTrue(PessoaExcluida.objects.using(fragmentos.do_cpf(chave_cpf(outra.cpf))).exists())
+        self.assertEqual(PessoaService.estatisticas_populacao().total, 1)
+
+    @override_settings(PESSOA_MUDANCAS_ATRASO=-60)
+    def test_feed_intercala_os_fragmentos(self):
+        pessoas = self._criar(20)
+        for pessoa in pessoas[3:9]:
+            PessoaService.excluir_pessoa(pessoa.cpf)
+
+        alteradas, excluidas, since = [], [], None
+        while True:
+            parametros = {'limite': 4, 'since': since} if since else {'limite': 4}
+            response = self.client.get(reverse('backend.pessoa:pessoa-mudancas'), parametros)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            alteradas += [p['cpf'] for p in response.data['results']]
+            excluidas += [e['cpf'] for e in response.data['deleted']]
+            since = response.data['next']
+            if not response.data['has_more']:
+                break
+
+        # Todos os fragmentos, na ordem global de alteração e sem repetições
+        vivas = pessoas[:3] + pessoas[9:]
+        self.assertEqual(alteradas, [p.cpf for p in sorted(vivas, key=lambda p: (p.atualizado_em, p.id))])
+        self.assertEqual(excluidas, [p.cpf for p in pessoas[3:9]])
+        self.assertEqual(len({fragmentos.do_cpf(chave_cpf(cpf)) for cpf in alteradas}), 3)
+
+    def test_rebalancear_ao_adicionar_fragmento(self):
+        with override_settings(PESSOA_FRAGMENTOS=TRES[:2]):
+            fragmentos.preparar_ids()
+            pessoas = self._criar(60)
+            antes = PessoaService.estatisticas_populacao()
+        self.assertFalse(Pessoa.objects.using('fragmento_2').exists())
+
+        saida = StringIO()
+        call_command('rebalance_pessoa_shards', '--bloco', '7', stdout=saida)
+
+        self._conferir_distribuicao()
+        self.assertTrue(Pessoa.objects.using('fragmento_2').exists())
+        self.assertNotIn('-> default', saida.getvalue())
+        self.assertNotIn('-> fragmento_1', saida.getvalue())
+        # Ids e datas preservados
+        for pessoa in pessoas:
+            movida = PessoaService.pesquisar_por_cpf(pessoa.cpf)
+            self.assertEqual((movida.id, movida.criado_em), (pessoa.id, pessoa.criado_em))
+        self.assertEqual(PessoaService.estatisticas_populacao(), antes)
+
+        # Rodar de novo não move nada
+        saida = StringIO()
+        call_command('rebalance_pessoa_shards', stdout=saida)
+        self.assertIn('0 pessoas movidas', saida.getvalue())
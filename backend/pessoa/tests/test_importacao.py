@@ -0,0 +1,73 @@
+import io
+import os
+import tempfile
+from datetime import date
+from unittest import skipUnless
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from ..models import Pessoa
+from ..importacao import ATUALIZAR, importar_csv
+
+CSV = """nome,cpf,data_nasc,sexo,altura,peso
+João Silva,12345678909,1990-01-01,M,"1,75",70
+Maria Santos,987.654.321-00,15/05/1992,feminino,1.65,55
+Sem Data,11122233344,,M,1.80,80
+Maria Repetida,98765432100,1992-05-15,F,1.66,56
+"""
+
+
+class ImportacaoTest(TestCase):
+    def test_importar_csv(self):
+        rejeitados = io.StringIO()
+        resumo = importar_csv(io.StringIO(CSV), rejeitados=rejeitados)
+
+        self.assertEqual(resumo.lidas, 4)
+        self.assertEqual(resumo.inseridas, 2)
+        self.assertEqual(resumo.rejeitadas, 1)
+        self.assertEqual(resumo.ignoradas, 1)
+        joao = Pessoa.objects.get(cpf='123.456.789-09')
+        self.assertEqual(joao.altura, 1.75)
+        # A última ocorrência do CPF no bloco prevalece
+        maria = Pessoa.objects.get(cpf='987.654.321-00')
+        self.assertEqual(maria.nome, 'Maria Repetida')
+        self.assertEqual(maria.data_nasc, date(1992, 5, 15))
+        self.assertIn('Sem Data', rejeitados.getvalue())
+
+    def test_importar_csv_conflito(self):
+        Pessoa.objects.create(
+            nome='Antigo', cpf='123.456.789-09', data_nasc=date(1990, 1, 1),
+            sexo='M', altura=1.70, peso=90.0
+        )
+
+        resumo = importar_csv(io.StringIO(CSV), conflito=ATUALIZAR)
+
+        self.assertEqual(resumo.atualizadas, 1)
+        self.assertEqual(Pessoa.objects.get(cpf='123.456.789-09').nome, 'João Silva')
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY só no PostgreSQL')
+    def test_copy_preenche_criado_em(self):
+        importar_csv(io.StringIO(CSV))
+        joao = Pessoa.objects.get(cpf='123.456.789-09')
+        self.assertIsNotNone(joao.criado_em)
+
+        # Na atualização a data de criação é mantida
+        importar_csv(io.StringIO(CSV.replace('"1,75",70', '"1,75",72')), conflito=ATUALIZAR)
+        atualizado = Pessoa.objects.get(cpf='123.456.789-09')
+        self.assertEqual((atualizado.peso, atualizado.criado_em), (72.0, joao.criado_em))
+
+    def test_importar_csv_colunas_ausentes(self):
+        with self.assertRaises(ValueError):
+            importar_csv(io.StringIO("nome,cpf\nJoão,12345678900\n"))
+
+    def test_comando_import_pessoas(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'pessoas.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(CSV)
+            saida = io.StringIO()
+            call_command('import_pessoas', caminho, '--bloco', '2', stdout=saida)
+
+            self.assertIn('2 inseridas', saida.getvalue())
+            self.assertTrue(os.path.exists(caminho + '.rejeitados.csv'))
+        self.assertEqual(Pessoa.objects.count(), 2)
@@ -0,0 +1,123 @@
+import contextvars
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .. import metricas
+from ..models import Pessoa
+from ..cache import cache_pessoas
+from ..metricas import registro_metricas
+
+VIEW_PESQUISAR = 'view="backend.pessoa:pessoa-pesquisar"'
+
+
+class MetricasTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        registro_metricas.limpar()
+        self.client = APIClient()
+        self.pessoa = Pessoa.objects.create(
+            nome='Maria Santos',
+            cpf='98765432100',
+            data_nasc=date(1992, 5, 15),
+            sexo='F',
+            altura=1.65,
+            peso=55.0
+        )
+
+    def _metricas(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def _valor(self, texto, prefixo):
+        linhas = [linha for linha in texto.splitlines() if linha.startswith(prefixo)]
+        self.assertEqual(len(linhas), 1, prefixo)
+        return float(linhas[0].rsplit(' ', 1)[1])
+
+    def test_requisicoes_por_view(self):
+        url = reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf])
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(reverse('backend.pessoa:pessoa-pesquisar', args=['00000000000']))
+
+        texto = self._metricas()
+
+        self.assertEqual(self._valor(texto, f'pessoa_requisicoes_total{{{VIEW_PESQUISAR},metodo="GET",status="200"}}'), 2)
+        self.assertEqual(self._valor(texto, f'pessoa_requisicoes_total{{{VIEW_PESQUISAR},metodo="GET",status="404"}}'), 1)
+        self.assertEqual(self._valor(texto, f'pessoa_requisicao_duracao_segundos_count{{{VIEW_PESQUISAR}}}'), 3)
+        self.assertEqual(self._valor(texto, f'pessoa_requisicao_duracao_segundos_bucket{{{VIEW_PESQUISAR},le="+Inf"}}'), 3)
+        # A segunda leitura do mesmo CPF vem do cache, sem consulta ao banco
+        self.assertEqual(self._valor(texto, f'pessoa_requisicao_consultas_bucket{{{VIEW_PESQUISAR},le="0"}}'), 1)
+        self.assertGreaterEqual(self._valor(texto, f'pessoa_requisicao_consultas_sum{{{VIEW_PESQUISAR}}}'), 2)
+        self.assertGreater(self._valor(texto, f'pessoa_resposta_tamanho_bytes_sum{{{VIEW_PESQUISAR}}}'), 0)
+        cache = cache_pessoas.estatisticas()
+        self.assertGreater(cache['acertos_local'], 0)
+        self.assertEqual(self._valor(texto, 'pessoa_cache_leituras_total{resultado="acertos_local"}'), cache['acertos_local'])
+        self.assertEqual(self._valor(texto, 'pessoa_cache_taxa_acerto'), cache['taxa_acerto'])
+        # O próprio /metrics não é medido
+        self.assertNotIn('view="metricas"', texto)
+
+    async def test_views_assincronas(self):
+        await AsyncClient().get(reverse('backend.pessoa.async:pessoa-pesquisar', args=[self.pessoa.cpf]))
+
+        texto = registro_metricas.exportar()
+
+        self.assertIn('view="backend.pessoa.async:pessoa-pesquisar",metodo="GET",status="200"} 1', texto)
+        self.assertIn('pessoa_requisicao_consultas_sum{view="backend.pessoa.async:pessoa-pesquisar"} 1', texto)
+
+    def test_soma_os_processos(self):
+        self.client.get(reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf]))
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(PESSOA_METRICAS_DIR=diretorio):
+            registro_metricas.gravar(diretorio)
+            # Simula o arquivo de outro worker
+            os.rename(
+                os.path.join(diretorio, f'metricas-{os.getpid()}.json'),
+                os.path.join(diretorio, 'metricas-999999.json')
+            )
+
+            texto = self._metricas()
+
+        self.assertEqual(self._valor(texto, f'pessoa_requisicoes_total{{{VIEW_PESQUISAR},metodo="GET",status="200"}}'), 2)
+        self.assertEqual(self._valor(texto, f'pessoa_requisicao_duracao_segundos_count{{{VIEW_PESQUISAR}}}'), 2)
+
+    def test_processo_encerrado_sai_dos_medidores(self):
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(PESSOA_METRICAS_DIR=diretorio):
+            caminho = os.path.join(diretorio, 'metricas-999999.json')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    'contadores': [
+                        ['pessoa_admissao_em_uso', [['classe', 'teste']], 3],
+                        ['pessoa_requisicoes_total', [['view', 'teste'], ['metodo', 'GET'], ['status', '200']], 5],
+                    ],
+                    'histogramas': [],
+                }, arquivo)
+
+            texto = self._metricas()
+            with open(caminho, encoding='utf-8') as arquivo:
+                restantes = json.load(arquivo)['contadores']
+
+        # O worker 999999 não existe: o medidor some e o contador continua
+        self.assertNotIn('pessoa_admissao_em_uso{classe="teste"}', texto)
+        self.assertEqual(self._valor(texto, 'pessoa_requisicoes_total{view="teste",metodo="GET",status="200"}'), 5)
+        self.assertEqual([linha[0] for linha in restantes], ['pessoa_requisicoes_total'])
+
+    def test_consultas_em_varias_threads(self):
+        consultas = metricas._Consultas()
+        token = metricas._consultas_requisicao.set(consultas)
+        try:
+            # Como no fragmentos.espalhar: cada tarefa leva uma cópia do contexto
+            contextos = [contextvars.copy_context() for _ in range(2000)]
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(
+                    lambda contexto: contexto.run(metricas._medir_consulta, lambda *args: None, 'SELECT 1', (), False, {}),
+                    contextos
+                ))
+        finally:
+            metricas._consultas_requisicao.reset(token)
+        self.assertEqual(consultas.quantidade, 2000)
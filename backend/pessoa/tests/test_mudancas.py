@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import Pessoa, PessoaExcluida
+from ..cache import cache_pessoas
+from ..services import PessoaService
+from ..sintetico import gerar_pessoas
+
+# Atraso negativo: escritas recém-feitas já entram no feed
+@override_settings(PESSOA_MUDANCAS_ATRASO=-60)
+class FeedMudancasTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.client = APIClient()
+        self.url = reverse('backend.pessoa:pessoa-mudancas')
+
+    def _criar(self, quantidade, inicio=0):
+        return [Pessoa.objects.create(**p) for p in gerar_pessoas(quantidade, inicio=inicio)]
+
+    def _sincronizar_tudo(self, since=None, limite=None):
+        alteradas, excluidas = [], []
+        while True:
+            pagina = PessoaService.listar_mudancas(since, limite)
+            alteradas += [p.cpf for p in pagina.alteradas]
+            excluidas += [e.cpf for e in pagina.excluidas]
+            since = pagina.proximo
+            if not pagina.ha_mais:
+                return alteradas, excluidas, since
+
+    def test_percorre_em_paginas(self):
+        pessoas = self._criar(7)
+
+        alteradas, excluidas, _ = self._sincronizar_tudo(limite=3)
+
+        self.assertEqual(alteradas, [p.cpf for p in pessoas])
+        self.assertEqual(excluidas, [])
+
+    def test_cursor_entrega_so_o_que_mudou_depois(self):
+        pessoas = self._criar(3)
+        _, _, since = self._sincronizar_tudo()
+
+        self.assertEqual(self._sincronizar_tudo(since)[:2], ([], []))
+
+        PessoaService.atualizar_parcial(pessoas[1].cpf, {'peso': 99.0})
+        alteradas, _, since = self._sincronizar_tudo(since)
+
+        self.assertEqual(alteradas, [pessoas[1].cpf])
+        self.assertEqual(self._sincronizar_tudo(since)[:2], ([], []))
+
+    def test_exclusoes_geram_marcas(self):
+        pessoas = self._criar(3)
+        _, _, since = self._sincronizar_tudo()
+
+        PessoaService.excluir_pessoa(pessoas[0].cpf)
+        self.client.delete(reverse('backend.pessoa:pessoa-excluir', args=[pessoas[2].cpf]))
+        alteradas, excluidas, _ = self._sincronizar_tudo(since, limite=1)
+
+        self.assertEqual(alteradas, [])
+        self.assertEqual(excluidas, [pessoas[0].cpf, pessoas[2].cpf])
+        self.assertEqual(
+            list(PessoaExcluida.objects.order_by('id').values_list('pessoa_id', flat=True)),
+            [pessoas[0].id, pessoas[2].id]
+        )
+
+    @override_settings(PESSOA_MUDANCAS_ATRASO=5)
+    def test_escritas_recentes_esperam_o_atraso(self):
+        self._criar(2)
+        self.assertEqual(PessoaService.listar_mudancas().alteradas, [])
+
+        Pessoa.objects.update(atualizado_em=timezone.now() - timedelta(seconds=10))
+        self.assertEqual(len(PessoaService.listar_mudancas().alteradas), 2)
+
+    def test_endpoint(self):
+        pessoa = self._criar(2)[0]
+        pessoa.delete()
+
+        response = self.client.get(self.url, {'limite': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('criado_em', response.data['results'][0])
+        self.assertFalse(response.data['has_more'])
+        self.assertTrue(response.data['next'])
+
+        response = self.client.get(self.url, {'since': response.data['next']})
+        self.assertEqual(response.data['results'], [])
+
+    def test_cursor_invalido(self):
+        for since in ('nao-e-cursor', 'WzEsMiwzXQ'):
+            response = self.client.get(self.url, {'since': since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,285 @@
+import inspect
+from asgiref.sync import async_to_sync
+from datetime import date
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .. import fila, urls
+from ..cache import cache_pessoas
+from ..dto import PessoaDTO
+from ..importacao import importar_registros
+from ..models import Pessoa
+from ..services import PessoaService
+from ..sintetico import gerar_pessoas
+from .orcamento import OrcamentoExcedido, orcamento_consultas, verificar_consultas_constantes
+
+CPF = '123.456.789-09'
+NOVA = {'nome': 'Ana Souza', 'cpf': '111.444.777-35', 'data_nasc': '1960-03-02', 'sexo': 'F', 'altura': 1.60, 'peso': 80.0}
+
+# Máximo de consultas por rota de backend/pessoa/urls.py, com o cache frio.
+# As escritas incluem os dois upserts das estatísticas da população
+ORCAMENTO_ROTAS = {
+    'pessoa-criar': 3,
+    'pessoa-criar-lote': 4,
+    'pessoa-sincronizar': 5,
+    'pessoa-atualizar': 5,
+    'pessoa-excluir': 5,
+    'pessoa-pesquisar': 1,
+    'pessoa-listar': 2,
+    'pessoa-mudancas': 2,
+    'pessoa-cache': 0,
+    'pessoa-conexoes': 0,
+    'pessoa-admissao': 0,
+    'pessoa-estatisticas': 2,
+    'pessoa-estatisticas-reconstruir': 1,
+    'pessoa-tarefa': 1,
+    'pessoa-exportar': 1,
+    'pessoa-peso-ideal-lote': 1,
+    'pessoa-peso-ideal': 1,
+}
+
+ORCAMENTO_SERVICO = {
+    'criar_pessoa': 3,
+    'criar_lote': 4,
+    'sincronizar': 5,
+    'atualizar_pessoa': 4,
+    'atualizar_parcial': 5,
+    'excluir_pessoa': 5,
+    'pesquisar_por_cpf': 1,
+    'apesquisar_por_cpf': 1,
+    'estatisticas_cache': 0,
+    'estatisticas_conexoes': 0,
+    'estatisticas_admissao': 0,
+    'estatisticas_populacao': 2,
+    'enfileirar_lote': 1,
+    'enfileirar_sincronizacao': 1,
+    'enfileirar_reconstrucao_estatisticas': 1,
+    'consultar_tarefa': 1,
+    'listar_todos': 1,
+    'listar_pagina': 1,
+    'alistar_pagina': 1,
+    'listar_mudancas': 2,
+    'marca_dagua': 1,
+    'amarca_dagua': 1,
+    'exportar_todos': 1,
+    'aexportar_todos': 1,
+    'calcular_peso_ideal': 1,
+    'acalcular_peso_ideal': 1,
+    'calcular_peso_ideal_lote': 1,
+    'acalcular_peso_ideal_lote': 1,
+}
+
+
+class OrcamentoConsultasTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.client = APIClient()
+        PessoaService.criar_pessoa(PessoaDTO(
+            nome="João Silva", cpf=CPF, data_nasc=date(1990, 1, 1), sexo="M", altura=1.75, peso=70.0
+        ))
+        self.tarefa = fila.enfileirar('reconstruir_estatisticas', {})
+        self.semeadas = 0
+
+    def _semear(self, quantidade):
+        importar_registros(gerar_pessoas(quantidade - self.semeadas, inicio=self.semeadas))
+        self.semeadas = quantidade
+
+    def _rotas(self):
+        def url(nome, *args):
+            return reverse(f'backend.pessoa:{nome}', args=args)
+
+        return {
+            'pessoa-criar': lambda: self.client.post(url('pessoa-criar'), NOVA, format='json'),
+            'pessoa-criar-lote': lambda: self.client.post(
+                url('pessoa-criar-lote'), [dict(NOVA, cpf='529.982.247-25')], format='json'
+            ),
+            # Uma pessoa nova e uma alterada
+            'pessoa-sincronizar': lambda: self.client.post(url('pessoa-sincronizar'), [
+                dict(NOVA, cpf='390.533.447-05'), dict(NOVA, nome='João Silva', cpf=CPF, data_nasc='1990-01-01', sexo='M')
+            ], format='json'),
+            'pessoa-atualizar': lambda: self.client.patch(url('pessoa-atualizar', CPF), {'peso': 82.5}, format='json'),
+            'pessoa-pesquisar': lambda: self.client.get(url('pessoa-pesquisar', CPF)),
+            'pessoa-listar': lambda: self.client.get(url('pessoa-listar')),
+            'pessoa-mudancas': lambda: self.client.get(url('pessoa-mudancas')),
+            'pessoa-cache': lambda: self.client.get(url('pessoa-cache')),
+            'pessoa-conexoes': lambda: self.client.get(url('pessoa-conexoes')),
+            'pessoa-admissao': lambda: self.client.get(url('pessoa-admissao')),
+            'pessoa-estatisticas': lambda: self.client.get(url('pessoa-estatisticas')),
+            'pessoa-estatisticas-reconstruir': lambda: self.client.post(url('pessoa-estatisticas-reconstruir')),
+            'pessoa-tarefa': lambda: self.client.get(url('pessoa-tarefa', self.tarefa.id)),
+            'pessoa-exportar': lambda: b''.join(self.client.get(url('pessoa-exportar')).streaming_content),
+            'pessoa-peso-ideal-lote': lambda: self.client.post(url('pessoa-peso-ideal-lote'), {'cpfs': [CPF]}, format='json'),
+            'pessoa-peso-ideal': lambda: self.client.get(url('pessoa-peso-ideal', CPF)),
+            'pessoa-excluir': lambda: self.client.delete(url('pessoa-excluir', CPF)),
+        }
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        self.assertEqual({p.name for p in urls.urlpatterns}, set(ORCAMENTO_ROTAS))
+        self.assertEqual(set(self._rotas()), set(ORCAMENTO_ROTAS))
+
+    def test_todos_os_metodos_do_servico_tem_orcamento(self):
+        publicos = {nome for nome, _ in inspect.getmembers(PessoaService, inspect.isfunction) if not nome.startswith('_')}
+        self.assertEqual(publicos, set(ORCAMENTO_SERVICO))
+
+    def test_rotas(self):
+        for nome, chamada in self._rotas().items():
+            with self.subTest(rota=nome):
+                cache_pessoas.limpar()
+                with orcamento_consultas(ORCAMENTO_ROTAS[nome], nome):
+                    resposta = chamada()
+                if hasattr(resposta, 'status_code'):
+                    self.assertLess(resposta.status_code, 400)
+
+    def test_servico(self):
+        o = ORCAMENTO_SERVICO
+        with orcamento_consultas(o['criar_pessoa']):
+            PessoaService.criar_pessoa(PessoaDTO(**dict(NOVA, data_nasc=date(1960, 3, 2))))
+        with orcamento_consultas(o['criar_lote']):
+            PessoaService.criar_lote([dict(NOVA, cpf='529.982.247-25')])
+        with orcamento_consultas(o['sincronizar']):
+            PessoaService.sincronizar([dict(NOVA, cpf='390.533.447-05'), dict(NOVA, cpf='529.982.247-25', peso=60.0)])
+        with orcamento_consultas(o['atualizar_pessoa']):
+            PessoaService.atualizar_pessoa(PessoaDTO(
+                nome="João", cpf=CPF, data_nasc=date(1990, 1, 1), sexo="M", altura=1.80, peso=75.0
+            ))
+        with orcamento_consultas(o['atualizar_parcial']):
+            PessoaService.atualizar_parcial(CPF, {'peso': 90.0})
+        # Sem campos das estatísticas a atualização parcial é um único UPDATE
+        with orcamento_consultas(1):
+            PessoaService.atualizar_parcial(CPF, {'nome': 'João Pedro'})
+        with orcamento_consultas(o['excluir_pessoa']):
+            PessoaService.excluir_pessoa('529.982.247-25')
+
+        cache_pessoas.limpar()
+        with orcamento_consultas(o['pesquisar_por_cpf']):
+            PessoaService.pesquisar_por_cpf(CPF)
+        with orcamento_consultas(0):
+            PessoaService.pesquisar_por_cpf(CPF)
+        with orcamento_consultas(o['estatisticas_cache']):
+            PessoaService.estatisticas_cache()
+        with orcamento_consultas(o['estatisticas_conexoes']):
+            PessoaService.estatisticas_conexoes()
+        with orcamento_consultas(o['estatisticas_admissao']):
+            PessoaService.estatisticas_admissao()
+        with orcamento_consultas(o['estatisticas_populacao']):
+            PessoaService.estatisticas_populacao()
+        with orcamento_consultas(o['enfileirar_lote']):
+            tarefa = PessoaService.enfileirar_lote([dict(NOVA, cpf='529.982.247-25')])
+        with orcamento_consultas(o['enfileirar_sincronizacao']):
+            PessoaService.enfileirar_sincronizacao([NOVA])
+        with orcamento_consultas(o['enfileirar_reconstrucao_estatisticas']):
+            PessoaService.enfileirar_reconstrucao_estatisticas()
+        with orcamento_consultas(o['consultar_tarefa']):
+            PessoaService.consultar_tarefa(tarefa.id)
+        with orcamento_consultas(o['listar_todos']):
+            PessoaService.listar_todos()
+        with orcamento_consultas(o['listar_pagina']):
+            PessoaService.listar_pagina(None, None, None, busca='joao')
+        with orcamento_consultas(o['listar_mudancas']):
+            PessoaService.listar_mudancas()
+        with orcamento_consultas(o['marca_dagua']):
+            PessoaService.marca_dagua()
+        with orcamento_consultas(o['exportar_todos']):
+            list(PessoaService.exportar_todos())
+        cache_pessoas.limpar()
+        with orcamento_consultas(o['calcular_peso_ideal']):
+            PessoaService.calcular_peso_ideal(CPF)
+        with orcamento_consultas(o['calcular_peso_ideal_lote']):
+            PessoaService.calcular_peso_ideal_lote(cpfs=None, sexo='F', limite=None)
+
+    async def test_servico_assincrono(self):
+        o = ORCAMENTO_SERVICO
+        cache_pessoas.limpar()
+        async with orcamento_consultas(o['apesquisar_por_cpf']):
+            await PessoaService.apesquisar_por_cpf(CPF)
+        async with orcamento_consultas(o['alistar_pagina']):
+            await PessoaService.alistar_pagina(None, None, 'abaixo', busca=None)
+        async with orcamento_consultas(o['amarca_dagua']):
+            await PessoaService.amarca_dagua()
+        async with orcamento_consultas(o['aexportar_todos']):
+            [linha async for linha in PessoaService.aexportar_todos()]
+        cache_pessoas.limpar()
+        async with orcamento_consultas(o['acalcular_peso_ideal']):
+            await PessoaService.acalcular_peso_ideal(CPF)
+        async with orcamento_consultas(o['acalcular_peso_ideal_lote']):
+            await PessoaService.acalcular_peso_ideal_lote(cpfs=[CPF], sexo=None, limite=None)
+
+    def test_listagens_tem_consultas_constantes(self):
+        listagens = {
+            'listar': lambda: self.client.get(reverse('backend.pessoa:pessoa-listar'), {'limite': 500}),
+            'buscar': lambda: self.client.get(reverse('backend.pessoa:pessoa-listar'), {'q': 'silva'}),
+            'exportar': lambda: b''.join(self.client.get(reverse('backend.pessoa:pessoa-exportar')).streaming_content),
+            'peso_ideal_lote': lambda: self.client.post(
+                reverse('backend.pessoa:pessoa-peso-ideal-lote'), {'sexo': 'F', 'limite': 500}, format='json'
+            ),
+            'estatisticas': lambda: self.client.get(reverse('backend.pessoa:pessoa-estatisticas')),
+            'mudancas': lambda: self.client.get(reverse('backend.pessoa:pessoa-mudancas'), {'limite': 500}),
+            'listar_todos': PessoaService.listar_todos,
+        }
+        for nome, chamada in listagens.items():
+            with self.subTest(listagem=nome):
+                Pessoa.objects.exclude(cpf=CPF).delete()
+                self.semeadas = 0
+                verificar_consultas_constantes(chamada, self._semear, tamanhos=(3, 40))
+
+    def test_criar_lote_tem_consultas_constantes(self):
+        def criar(quantidade):
+            PessoaService.criar_lote(list(gerar_pessoas(quantidade, inicio=1000 + quantidade)))
+
+        self.assertEqual(
+            verificar_consultas_constantes(lambda: criar(self.tamanho), lambda n: setattr(self, 'tamanho', n)),
+            ORCAMENTO_SERVICO['criar_lote']
+        )
+
+    def test_sincronizar_tem_consultas_constantes(self):
+        # Retrato com o dobro das pessoas semeadas: metade alterada, metade nova
+        def semear(quantidade):
+            self.retrato = [dict(p, peso=p['peso'] + 1) for p in gerar_pessoas(quantidade * 2)]
+            self._semear(quantidade)
+
+        self.assertEqual(
+            verificar_consultas_constantes(lambda: PessoaService.sincronizar(self.retrato), semear),
+            ORCAMENTO_SERVICO['sincronizar']
+        )
+
+    def test_relatorio_agrupa_por_modelo(self):
+        self._semear(3)
+        ids = list(Pessoa.objects.values_list('id', flat=True))
+
+        with self.assertRaises(OrcamentoExcedido) as contexto:
+            with orcamento_consultas(1, 'N+1'):
+                for id_pessoa in ids:
+                    Pessoa.objects.get(id=id_pessoa)
+
+        mensagem = str(contexto.exception)
+        self.assertIn('N+1: 4 consultas para um orçamento de 1', mensagem)
+        self.assertIn('4x SELECT', mensagem)
+        self.assertIn('WHERE "pessoa_pessoa"."id" = ?', mensagem)
+
+    def test_consultas_que_crescem_falham(self):
+        def por_linha():
+            for pessoa in Pessoa.objects.all():
+                Pessoa.objects.filter(id=pessoa.id).exists()
+
+        with self.assertRaises(OrcamentoExcedido) as contexto:
+            verificar_consultas_constantes(por_linha, self._semear, tamanhos=(2, 5))
+        self.assertIn('{2: 4, 5: 7}', str(contexto.exception))
+
+    def test_decorator(self):
+        @orcamento_consultas(0)
+        def sem_consultas():
+            return PessoaService.estatisticas_cache()
+
+        @orcamento_consultas(0)
+        def com_consulta():
+            return Pessoa.objects.count()
+
+        @orcamento_consultas(0)
+        async def com_consulta_async():
+            return await Pessoa.objects.acount()
+
+        sem_consultas()
+        with self.assertRaises(OrcamentoExcedido):
+            com_consulta()
+        with self.assertRaises(OrcamentoExcedido):
+            async_to_sync(com_consulta_async)()
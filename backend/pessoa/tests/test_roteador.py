@@ -0,0 +1,101 @@
+import time
+from unittest import skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .. import roteador
+from ..models import Pessoa
+from ..cache import cache_pessoas
+from ..sintetico import gerar_pessoas
+
+@override_settings(PESSOA_REPLICAS=['replica_1', 'replica_2'], PESSOA_PRIMARIO_JANELA=5)
+class RoteadorTest(SimpleTestCase):
+    def setUp(self):
+        self.roteador = roteador.RoteadorReplicas()
+        self.fabrica = RequestFactory()
+
+    def test_leituras_vao_para_as_replicas(self):
+        self.assertIn(self.roteador.db_for_read(Pessoa), ['replica_1', 'replica_2'])
+        self.assertEqual(self.roteador.db_for_write(Pessoa), 'default')
+        # Outros apps ficam no primário
+        self.assertIsNone(self.roteador.db_for_read(User))
+
+    def test_fixado_no_primario(self):
+        with roteador.primario():
+            self.assertIsNone(self.roteador.db_for_read(Pessoa))
+        with override_settings(PESSOA_REPLICAS=[]):
+            self.assertIsNone(self.roteador.db_for_read(Pessoa))
+
+    def _atender(self, request):
+        visto = {}
+
+        def view(request):
+            visto['primario'] = roteador.lendo_do_primario()
+            return HttpResponse()
+
+        response = roteador.PrimarioMiddleware(view)(request)
+        return visto['primario'], response
+
+    def test_escrita_fixa_o_cliente_no_primario(self):
+        primario, response = self._atender(self.fabrica.post('/api/pessoa/criar/'))
+
+        self.assertTrue(primario)
+        cookie = response.cookies[roteador.COOKIE_PRIMARIO]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertGreater(float(cookie.value), time.time())
+
+        self.fabrica.cookies[roteador.COOKIE_PRIMARIO] = cookie.value
+        primario, response = self._atender(self.fabrica.get('/api/pessoa/pesquisar/'))
+        self.assertTrue(primario)
+        self.assertNotIn(roteador.COOKIE_PRIMARIO, response.cookies)
+
+    def test_janela_vencida(self):
+        for valor in (str(time.time() - 1), 'invalido'):
+            self.fabrica.cookies[roteador.COOKIE_PRIMARIO] = valor
+            self.assertFalse(self._atender(self.fabrica.get('/api/pessoa/pesquisar/'))[0])
+
+    @override_settings(PESSOA_REPLICAS=[])
+    def test_sem_replicas_nao_grava_cookie(self):
+        _, response = self._atender(self.fabrica.post('/api/pessoa/criar/'))
+        self.assertNotIn(roteador.COOKIE_PRIMARIO, response.cookies)
+
+# Usa a primeira réplica de DB_REPLICAS, que precisa ser um banco independente do
+# default (o runner cria nele o banco de teste): as duas bases mostram de onde
+# cada leitura veio. Com réplicas configuradas, rode só esta classe
+REPLICA = settings.PESSOA_REPLICAS[0] if settings.PESSOA_REPLICAS else None
+
+@skipUnless(REPLICA, 'Sem réplica em DB_REPLICAS')
+@override_settings(PESSOA_REPLICAS=[REPLICA])
+class DuasBasesTest(TransactionTestCase):
+    # Só declara o alias se ele existir: o runner prepara os bancos antes do skip
+    databases = {'default', REPLICA} if REPLICA else {'default'}
+
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.client = APIClient()
+        self.na_replica, self.nova = gerar_pessoas(2)
+
+    def _pesquisar(self, client, cpf):
+        return client.get(reverse('backend.pessoa:pessoa-pesquisar', args=[cpf])).status_code
+
+    def test_leitura_na_replica(self):
+        Pessoa.objects.using(REPLICA).create(**self.na_replica)
+
+        self.assertEqual(self._pesquisar(self.client, self.na_replica['cpf']), status.HTTP_200_OK)
+
+    def test_le_o_que_escreveu(self):
+        dados = dict(self.nova, data_nasc=self.nova['data_nasc'].isoformat())
+        response = self.client.post(reverse('backend.pessoa:pessoa-criar'), dados, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(roteador.COOKIE_PRIMARIO, response.cookies)
+
+        # Quem escreveu lê do primário; outro cliente, da réplica sem a pessoa
+        self.assertEqual(self._pesquisar(self.client, self.nova['cpf']), status.HTTP_200_OK)
+        self.assertEqual(self._pesquisar(APIClient(), self.nova['cpf']), status.HTTP_404_NOT_FOUND)
+
+        self.client.cookies[roteador.COOKIE_PRIMARIO] = str(time.time() - 1)
+        self.assertEqual(self._pesquisar(self.client, self.nova['cpf']), status.HTTP_404_NOT_FOUND)
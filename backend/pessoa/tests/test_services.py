@@ -1,15 +1,19 @@
 from django.test import TestCase
+from django.db import connections
 from datetime import date
+from unittest import mock
 from ..models import Pessoa
+from ..cache import cache_pessoas
 from ..services import PessoaService
 from ..dto import PessoaDTO, PesoIdealDTO
 
 class PessoaServiceTest(TestCase):
     def setUp(self):
+        cache_pessoas.limpar()
         # Criar dados de teste
         self.pessoa_dto = PessoaDTO(
             nome="João Silva",
-            cpf="12345678900",
+            cpf="123.456.789-09",
             data_nasc=date(1990, 1, 1),
             sexo="M",
             altura=1.75,
@@ -18,7 +22,7 @@ class PessoaServiceTest(TestCase):
         
         self.pessoa_dto_feminino = PessoaDTO(
             nome="Maria Santos",
-            cpf="98765432100",
+            cpf="987.654.321-00",
             data_nasc=date(1992, 5, 15),
             sexo="F",
             altura=1.65,
@@ -49,6 +53,48 @@ class PessoaServiceTest(TestCase):
         self.assertEqual(pessoa_atualizada.nome, "João Silva Atualizado")
         self.assertEqual(pessoa_atualizada.peso, 75.0)
 
+    def test_atualizar_parcial(self):
+        pessoa = PessoaService.criar_pessoa(self.pessoa_dto)
+
+        # Campos fora das estatísticas continuam em um único UPDATE ... RETURNING
+        with self.assertNumQueries(1):
+            atualizada = PessoaService.atualizar_parcial(pessoa.cpf, {"nome": "João Pedro Silva"})
+
+        self.assertEqual(atualizada.nome, "João Pedro Silva")
+        self.assertEqual(atualizada.peso, pessoa.peso)
+        self.assertEqual(atualizada.data_nasc, pessoa.data_nasc)
+        self.assertGreaterEqual(atualizada.atualizado_em, pessoa.atualizado_em)
+        self.assertEqual(Pessoa.objects.get(cpf=pessoa.cpf).nome_busca, "joao pedro silva")
+
+    def test_atualizar_parcial_peso(self):
+        pessoa = PessoaService.criar_pessoa(self.pessoa_dto)
+
+        atualizada = PessoaService.atualizar_parcial(pessoa.cpf, {"peso": 82.5})
+
+        self.assertEqual(atualizada.peso, 82.5)
+        self.assertEqual(atualizada.nome, pessoa.nome)
+        self.assertEqual(Pessoa.objects.get(cpf=pessoa.cpf).peso, 82.5)
+
+    def test_atualizar_parcial_sem_returning(self):
+        pessoa = PessoaService.criar_pessoa(self.pessoa_dto)
+
+        with mock.patch.object(PessoaService, '_suporta_update_returning', return_value=False):
+            atualizada = PessoaService.atualizar_parcial(pessoa.cpf, {"nome": "Outro Nome"})
+            inexistente = PessoaService.atualizar_parcial("00000000000", {"nome": "Outro Nome"})
+
+        self.assertEqual(atualizada.nome, "Outro Nome")
+        self.assertIsNone(inexistente)
+
+    def test_update_returning_pelo_banco_da_escrita(self):
+        # Decide pela conexão do alias recebido, não pela conexão global
+        with mock.patch.object(connections['default'], 'vendor', 'oracle'):
+            self.assertFalse(PessoaService._suporta_update_returning('default'))
+        with mock.patch.object(connections['default'], 'vendor', 'postgresql'):
+            self.assertTrue(PessoaService._suporta_update_returning('default'))
+
+    def test_atualizar_parcial_inexistente(self):
+        self.assertIsNone(PessoaService.atualizar_parcial("00000000000", {"peso": 80.0}))
+
     def test_excluir_pessoa(self):
         # Criar pessoa primeiro
         pessoa = PessoaService.criar_pessoa(self.pessoa_dto)
@@ -79,6 +125,80 @@ class PessoaServiceTest(TestCase):
         
         self.assertEqual(len(pessoas), 2)
 
+    def test_listar_pagina_cursor(self):
+        # Nomes repetidos garantem que o desempate por id seja respeitado
+        for i in range(5):
+            self.pessoa_dto.cpf = f"1234567890{i}"
+            self.pessoa_dto.nome = "Mesmo Nome" if i < 3 else f"Outro {i}"
+            PessoaService.criar_pessoa(self.pessoa_dto)
+        esperado = list(Pessoa.objects.values_list('id', flat=True))
+
+        pagina = PessoaService.listar_pagina(limite='2')
+        vistos = [p.id for p in pagina.resultados]
+        while pagina.proximo:
+            pagina = PessoaService.listar_pagina(cursor=pagina.proximo, limite='2')
+            vistos += [p.id for p in pagina.resultados]
+        self.assertEqual(vistos, esperado)
+
+        # Voltando da última página
+        anterior = PessoaService.listar_pagina(cursor=pagina.anterior, limite='2')
+        self.assertEqual([p.id for p in anterior.resultados], esperado[2:4])
+        self.assertIsNotNone(anterior.proximo)
+
+    def test_listar_pagina_limite_maximo(self):
+        with self.settings(PESSOA_LIMITE_PAGINA_MAXIMO=1):
+            PessoaService.criar_pessoa(self.pessoa_dto)
+            PessoaService.criar_pessoa(self.pessoa_dto_feminino)
+            pagina = PessoaService.listar_pagina(limite='100')
+
+        self.assertEqual(len(pagina.resultados), 1)
+        self.assertIsNotNone(pagina.proximo)
+
+    def test_listar_pagina_busca_por_nome(self):
+        for cpf, nome in [("11144477735", "Ana Conceição"), ("52998224725", "Conceição Alves"), ("22233344405", "Bruno Lima")]:
+            self.pessoa_dto.cpf, self.pessoa_dto.nome = cpf, nome
+            PessoaService.criar_pessoa(self.pessoa_dto)
+
+        pagina = PessoaService.listar_pagina(busca="CONCEICAO")
+
+        # Sem acentos e sem diferenciar maiúsculas; quem começa pelo termo vem antes
+        self.assertEqual([p.nome for p in pagina.resultados], ["Conceição Alves", "Ana Conceição"])
+        self.assertIsNone(pagina.proximo)
+        self.assertEqual(Pessoa.objects.get(cpf_num=22233344405).nome_busca, "bruno lima")
+
+    def test_criar_lote(self):
+        Pessoa.objects.create(
+            nome="Existente", cpf="111.444.777-35", data_nasc=date(1980, 1, 1),
+            sexo="F", altura=1.60, peso=60.0
+        )
+        itens = [
+            {"nome": "Ana", "cpf": "529.982.247-25", "data_nasc": "1990-01-01", "sexo": "F", "altura": 1.62, "peso": 58.0},
+            {"nome": "Bruno", "cpf": "52998224725", "data_nasc": "1991-01-01", "sexo": "M", "altura": 1.80, "peso": 80.0},
+            {"nome": "Carla", "cpf": "111.444.777-35", "data_nasc": "1992-01-01", "sexo": "F", "altura": 1.70, "peso": 65.0},
+            {"nome": "Davi", "cpf": "123", "data_nasc": "1993-01-01", "sexo": "M", "altura": 0, "peso": 70.0},
+            {"nome": "Eva", "cpf": "222.333.444-05", "data_nasc": "1994-01-01", "sexo": "F", "altura": 1.55, "peso": 50.0},
+        ]
+
+        relatorio = PessoaService.criar_lote(itens)
+
+        self.assertEqual(relatorio.criados, 2)
+        self.assertEqual(relatorio.falhas, 3)
+        self.assertEqual([r.sucesso for r in relatorio.resultados], [True, False, False, False, True])
+        self.assertIn("cpf", relatorio.resultados[1].erros)
+        self.assertIn("cpf", relatorio.resultados[2].erros)
+        self.assertEqual(set(relatorio.resultados[3].erros), {"cpf", "altura"})
+        self.assertEqual(Pessoa.objects.get(cpf="222.333.444-05").id, relatorio.resultados[4].id)
+
+    def test_pesquisar_por_cpf_com_e_sem_pontuacao(self):
+        PessoaService.criar_pessoa(self.pessoa_dto)
+
+        self.assertEqual(Pessoa.objects.get().cpf_num, 12345678909)
+        with self.assertNumQueries(1):
+            com_pontuacao = PessoaService.pesquisar_por_cpf("123.456.789-09")
+            sem_pontuacao = PessoaService.pesquisar_por_cpf("12345678909")
+        self.assertEqual(com_pontuacao, sem_pontuacao)
+        self.assertIsNone(PessoaService.pesquisar_por_cpf("123"))
+
     def test_calcular_peso_ideal_masculino(self):
         # Criar pessoa masculina
         pessoa = PessoaService.criar_pessoa(self.pessoa_dto)
@@ -101,6 +221,60 @@ class PessoaServiceTest(TestCase):
         peso_ideal_esperado = round((62.1 * pessoa.altura) - 44.7, 2)
         self.assertEqual(resultado.peso_ideal, peso_ideal_esperado)
 
+    def test_calcular_peso_ideal_lote_igual_ao_individual(self):
+        cpfs = []
+        for i in range(40):
+            self.pessoa_dto.cpf = f"{i:011d}"
+            self.pessoa_dto.sexo = "M" if i % 2 else "F"
+            self.pessoa_dto.altura = 1.40 + i * 0.0125
+            self.pessoa_dto.peso = 45.0 + i * 0.85
+            cpfs.append(PessoaService.criar_pessoa(self.pessoa_dto).cpf)
+        cpfs.reverse()
+        cpfs.insert(3, "inexistente")
+
+        resultados = PessoaService.calcular_peso_ideal_lote(cpfs=cpfs)
+
+        self.assertEqual([r.cpf for r in resultados], cpfs)
+        self.assertFalse(resultados[3].encontrado)
+        for resultado in resultados:
+            if not resultado.encontrado:
+                continue
+            individual = PessoaService.calcular_peso_ideal(resultado.cpf)
+            self.assertEqual(resultado.peso_ideal, individual.peso_ideal)
+            self.assertEqual(resultado.status, individual.status)
+            self.assertEqual(resultado.status_peso, individual.status_peso)
+
+    def test_calcular_peso_ideal_lote_por_sexo(self):
+        PessoaService.criar_pessoa(self.pessoa_dto)
+        PessoaService.criar_pessoa(self.pessoa_dto_feminino)
+
+        resultados = PessoaService.calcular_peso_ideal_lote(sexo="F")
+
+        self.assertEqual([r.cpf for r in resultados], [self.pessoa_dto_feminino.cpf])
+
+    def test_anotacao_peso_ideal_igual_ao_individual(self):
+        for i in range(40):
+            self.pessoa_dto.cpf = f"{i:011d}"
+            self.pessoa_dto.sexo = "M" if i % 2 else "F"
+            self.pessoa_dto.altura = 1.40 + i * 0.0125
+            self.pessoa_dto.peso = 45.0 + i * 0.85
+            PessoaService.criar_pessoa(self.pessoa_dto)
+
+        for pessoa in Pessoa.objects.com_peso_ideal():
+            individual = PessoaService.calcular_peso_ideal(pessoa.cpf)
+            self.assertEqual(round(pessoa.peso_ideal, 2), individual.peso_ideal)
+            self.assertEqual(pessoa.status_peso, individual.status_peso)
+
+    def test_listar_pagina_por_status_peso(self):
+        PessoaService.criar_pessoa(self.pessoa_dto)
+        self.pessoa_dto_feminino.peso = 90.0
+        PessoaService.criar_pessoa(self.pessoa_dto_feminino)
+
+        pagina = PessoaService.listar_pagina(status_peso="acima")
+
+        self.assertEqual([p.cpf for p in pagina.resultados], [self.pessoa_dto_feminino.cpf])
+        self.assertEqual(pagina.resultados[0].status, "Acima do peso ideal")
+
     def test_status_peso_adequado(self):
         # Criar pessoa com peso adequado (dentro de 2kg do ideal)
         pessoa = PessoaService.criar_pessoa(self.pessoa_dto)
@@ -0,0 +1,89 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .. import estatisticas
+from ..models import Pessoa
+from ..cache import cache_pessoas
+from ..services import PessoaService
+from ..sintetico import gerar_pessoas
+from .orcamento import consultas_relevantes
+
+def _retrato(quantidade, inicio=0):
+    return [dict(p, data_nasc=p['data_nasc'].isoformat()) for p in gerar_pessoas(quantidade, inicio=inicio)]
+
+class SincronizacaoTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.client = APIClient()
+
+    def test_sincronizar(self):
+        retrato = _retrato(5)
+        resultado = PessoaService.sincronizar(retrato)
+        self.assertEqual((resultado.inseridas, resultado.atualizadas, resultado.inalteradas), (5, 0, 0))
+
+        retrato[1]['peso'] += 1
+        retrato[3]['nome'] = 'Outro Nome'
+        retrato.append(_retrato(1, inicio=10)[0])
+        resultado = PessoaService.sincronizar(retrato)
+
+        self.assertEqual((resultado.inseridas, resultado.atualizadas, resultado.inalteradas), (1, 2, 3))
+        self.assertEqual(Pessoa.objects.count(), 6)
+        self.assertEqual(Pessoa.objects.get(cpf=retrato[3]['cpf']).nome_busca, 'outro nome')
+        self.assertEqual(Pessoa.objects.get(cpf=retrato[1]['cpf']).peso, retrato[1]['peso'])
+
+        incrementais = list(estatisticas.consultar().grupos)
+        estatisticas.reconstruir()
+        self.assertEqual(incrementais, estatisticas.consultar().grupos)
+
+    def test_inalteradas_nao_sao_gravadas(self):
+        retrato = _retrato(50)
+        PessoaService.sincronizar(retrato)
+        atualizado_em = dict(Pessoa.objects.values_list('cpf', 'atualizado_em'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = PessoaService.sincronizar(retrato)
+
+        self.assertEqual(resultado.inalteradas, 50)
+        # Só a leitura das pessoas atuais
+        self.assertEqual(len(consultas_relevantes(consultas.captured_queries)), 1)
+        self.assertEqual(dict(Pessoa.objects.values_list('cpf', 'atualizado_em')), atualizado_em)
+
+    def test_invalida_cache(self):
+        retrato = _retrato(1)
+        PessoaService.sincronizar(retrato)
+        self.assertEqual(PessoaService.pesquisar_por_cpf(retrato[0]['cpf']).altura, retrato[0]['altura'])
+
+        retrato[0]['altura'] = 2.05
+        PessoaService.sincronizar(retrato)
+
+        self.assertEqual(PessoaService.pesquisar_por_cpf(retrato[0]['cpf']).altura, 2.05)
+
+    def test_endpoint(self):
+        retrato = _retrato(2) + [{'nome': 'Sem CPF'}, _retrato(1)[0]]
+        response = self.client.post(reverse('backend.pessoa:pessoa-sincronizar'), retrato, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['inseridas'], 2)
+        self.assertEqual(response.data['falhas'], 2)
+        self.assertEqual([r['indice'] for r in response.data['resultados']], [2, 3])
+        self.assertEqual(response.data['resultados'][1]['erros'], {'cpf': ['CPF repetido no lote.']})
+
+    def test_endpoint_assincrono(self):
+        response = self.client.post(
+            reverse('backend.pessoa:pessoa-sincronizar'), _retrato(3), format='json', HTTP_PREFER='respond-async'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        call_command('run_pessoa_worker', '--ate-esvaziar', stdout=StringIO())
+
+        tarefa = self.client.get(response['Location'])
+        self.assertEqual(tarefa.data['resultado']['inseridas'], 3)
+
+    def test_corpo_invalido(self):
+        response = self.client.post(reverse('backend.pessoa:pessoa-sincronizar'), {'cpf': '1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
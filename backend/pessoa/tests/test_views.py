@@ -1,16 +1,22 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from datetime import date
+import gzip
+import json
 from ..models import Pessoa
+from ..cache import cache_pessoas
 
 class PessoaViewTest(TestCase):
     def setUp(self):
+        cache_pessoas.limpar()
         self.client = APIClient()
         self.pessoa_data = {
             'nome': 'João Silva',
-            'cpf': '12345678900',
+            'cpf': '12345678909',
             'data_nasc': '1990-01-01',
             'sexo': 'M',
             'altura': 1.75,
@@ -33,7 +39,15 @@ class PessoaViewTest(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Pessoa.objects.count(), 2)
-        self.assertEqual(Pessoa.objects.get(cpf='12345678900').nome, 'João Silva')
+        self.assertEqual(Pessoa.objects.get(cpf='123.456.789-09').nome, 'João Silva')
+
+    def test_criar_pessoa_cpf_invalido(self):
+        url = reverse('backend.pessoa:pessoa-criar')
+        self.pessoa_data['cpf'] = '12345678900'
+        response = self.client.post(url, self.pessoa_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cpf', response.data)
 
     def test_criar_pessoa_cpf_duplicado(self):
         # Criar pessoa com CPF duplicado
@@ -43,6 +57,31 @@ class PessoaViewTest(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_criar_lote(self):
+        url = reverse('backend.pessoa:pessoa-criar-lote')
+        response = self.client.post(url, [self.pessoa_data], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['criados'], 1)
+        self.assertTrue(response.data['resultados'][0]['sucesso'])
+        self.assertEqual(Pessoa.objects.count(), 2)
+
+    def test_criar_lote_com_falhas(self):
+        url = reverse('backend.pessoa:pessoa-criar-lote')
+        # Dígito verificador inválido
+        self.pessoa_data['cpf'] = '12345678900'
+        response = self.client.post(url, [self.pessoa_data], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['falhas'], 1)
+        self.assertIn('cpf', response.data['resultados'][0]['erros'])
+
+    def test_criar_lote_corpo_invalido(self):
+        url = reverse('backend.pessoa:pessoa-criar-lote')
+        response = self.client.post(url, self.pessoa_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_atualizar_pessoa(self):
         url = reverse('backend.pessoa:pessoa-atualizar', args=[self.pessoa.cpf])
         dados_atualizados = {
@@ -58,6 +97,30 @@ class PessoaViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(Pessoa.objects.get(cpf=self.pessoa.cpf).nome, 'Maria Santos Atualizada')
 
+    def test_atualizar_parcial(self):
+        url = reverse('backend.pessoa:pessoa-atualizar', args=[self.pessoa.cpf])
+        response = self.client.patch(url, {'peso': 60.5}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['peso'], 60.5)
+        self.assertEqual(response.data['nome'], 'Maria Santos')
+        self.assertEqual(Pessoa.objects.get(cpf=self.pessoa.cpf).peso, 60.5)
+
+    def test_atualizar_parcial_invalido(self):
+        url = reverse('backend.pessoa:pessoa-atualizar', args=[self.pessoa.cpf])
+        response = self.client.patch(url, {'altura': -1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('altura', response.data)
+
+        response = self.client.patch(url, {'cpf': '111.111.111-11'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_atualizar_parcial_nao_encontrado(self):
+        url = reverse('backend.pessoa:pessoa-atualizar', args=['00000000000'])
+        response = self.client.patch(url, {'peso': 60.5}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_excluir_pessoa(self):
         url = reverse('backend.pessoa:pessoa-excluir', args=[self.pessoa.cpf])
         response = self.client.delete(url)
@@ -72,18 +135,214 @@ class PessoaViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['cpf'], self.pessoa.cpf)
 
+    def test_pesquisar_por_cpf_sem_pontuacao(self):
+        url = reverse('backend.pessoa:pessoa-pesquisar', args=['98765432100'])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cpf'], '987.654.321-00')
+
     def test_pesquisar_por_cpf_nao_encontrado(self):
         url = reverse('backend.pessoa:pessoa-pesquisar', args=['00000000000'])
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_pesquisar_por_cpf_condicional(self):
+        url = reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        url_atualizar = reverse('backend.pessoa:pessoa-atualizar', args=[self.pessoa.cpf])
+        self.client.put(url_atualizar, {
+            'nome': 'Maria Santos Atualizada', 'data_nasc': '1992-05-15',
+            'sexo': 'F', 'altura': 1.65, 'peso': 56.0
+        }, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_calcular_peso_ideal_condicional(self):
+        url = reverse('backend.pessoa:pessoa-peso-ideal', args=[self.pessoa.cpf])
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        url_pessoa = reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf])
+        self.assertNotEqual(self.client.get(url_pessoa)['ETag'], etag)
+
+    def test_listar_condicional(self):
+        url = reverse('backend.pessoa:pessoa-listar')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Outros parâmetros geram outro validador
+        response = self.client.get(url, {'limite': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.delete(reverse('backend.pessoa:pessoa-excluir', args=[self.pessoa.cpf]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_listar_condicional_sem_contagem(self):
+        url = reverse('backend.pessoa:pessoa-listar')
+        self.client.post(reverse('backend.pessoa:pessoa-criar'), self.pessoa_data, format='json')
+        with CaptureQueriesContext(connection) as consultas:
+            etag = self.client.get(url, HTTP_IF_NONE_MATCH='"outra"')['ETag']
+        self.assertFalse(any('COUNT(' in c['sql'].upper() for c in consultas.captured_queries))
+
+        # Excluir quem não é o último alterado também muda o validador
+        self.client.delete(reverse('backend.pessoa:pessoa-excluir', args=[self.pessoa.cpf]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_listar_todos(self):
         url = reverse('backend.pessoa:pessoa-listar')
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNone(response.data['prev'])
+
+    def test_listar_paginado(self):
+        for i in range(4):
+            Pessoa.objects.create(
+                nome=f'Ana {i}', cpf=f'111.111.111-0{i}', data_nasc=date(1990, 1, 1),
+                sexo='F', altura=1.60, peso=55.0
+            )
+        url = reverse('backend.pessoa:pessoa-listar')
+        response = self.client.get(url, {'limite': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['nome'] for p in response.data['results']], ['Ana 0', 'Ana 1'])
+        self.assertIsNone(response.data['prev'])
+
+        response = self.client.get(url, {'limite': 2, 'cursor': response.data['next']})
+        self.assertEqual([p['nome'] for p in response.data['results']], ['Ana 2', 'Ana 3'])
+
+    def test_listar_por_status_peso(self):
+        url = reverse('backend.pessoa:pessoa-listar')
+        response = self.client.get(url, {'status_peso': 'abaixo'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['peso_ideal'], 57.77)
+
+        response = self.client.get(url, {'status_peso': 'acima'})
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get(url, {'status_peso': 'obeso'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_peso_ideal_nas_respostas_individuais(self):
+        listagem = self.client.get(reverse('backend.pessoa:pessoa-listar')).data['results'][0]
+        campos = ('peso_ideal', 'status', 'status_peso')
+
+        response = self.client.get(reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf]))
+        self.assertEqual({c: response.data[c] for c in campos}, {c: listagem[c] for c in campos})
+
+        response = self.client.post(reverse('backend.pessoa:pessoa-criar'), self.pessoa_data, format='json')
+        self.assertEqual(response.data['status_peso'], 'adequado')
+        self.assertEqual(response.data['peso_ideal'], 69.23)
+
+        url = reverse('backend.pessoa:pessoa-atualizar', args=[self.pessoa.cpf])
+        response = self.client.patch(url, {'peso': 60.5}, format='json')
+        self.assertEqual(response.data['status_peso'], 'acima')
+
+    def test_listar_busca(self):
+        url = reverse('backend.pessoa:pessoa-listar')
+        response = self.client.get(url, {'q': 'sant'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['cpf'] for p in response.data['results']], [self.pessoa.cpf])
+        self.assertEqual(self.client.get(url, {'q': 'pedro'}).data['results'], [])
+
+    def test_listar_campos(self):
+        url = reverse('backend.pessoa:pessoa-listar')
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, {'fields': 'nome,cpf'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [{'nome': 'Maria Santos', 'cpf': self.pessoa.cpf}])
+        # Só as colunas pedidas (e o id do cursor) são lidas
+        sql = consultas.captured_queries[-1]['sql']
+        self.assertNotIn('"data_nasc"', sql)
+        self.assertNotIn('"altura"', sql)
+
+        response = self.client.get(url, {'fields': 'nome,senha'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('senha', response.data['fields'][0])
+
+    def test_pesquisar_por_cpf_campos(self):
+        url = reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf])
+        completa = self.client.get(url)
+        response = self.client.get(url, {'fields': 'id,data_nasc'}, HTTP_IF_NONE_MATCH=completa['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'id': self.pessoa.id, 'data_nasc': '1992-05-15'})
+        self.assertNotEqual(response['ETag'], completa['ETag'])
+
+    def test_resposta_json(self):
+        response = self.client.get(reverse('backend.pessoa:pessoa-pesquisar', args=[self.pessoa.cpf]))
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        corpo = response.json()
+        self.assertEqual(corpo['data_nasc'], '1992-05-15')
+        self.assertEqual(corpo['altura'], 1.65)
+        self.assertTrue(corpo['atualizado_em'].endswith('Z'))
+        self.assertEqual(corpo['atualizado_em'][:19], self.pessoa.atualizado_em.isoformat()[:19])
+
+    def test_listar_cursor_invalido(self):
+        url = reverse('backend.pessoa:pessoa-listar')
+        response = self.client.get(url, {'cursor': 'invalido'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_exportar_ndjson(self):
+        url = reverse('backend.pessoa:pessoa-exportar')
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        linhas = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(linhas), 1)
+        registro = json.loads(linhas[0])
+        self.assertEqual(registro['cpf'], self.pessoa.cpf)
+        self.assertEqual(registro['data_nasc'], '1992-05-15')
+
+    def test_exportar_csv_gzip(self):
+        url = reverse('backend.pessoa:pessoa-exportar')
+        response = self.client.get(url, {'formato': 'csv', 'gzip': '1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('pessoas.csv.gz', response['Content-Disposition'])
+        conteudo = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        cabecalho, linha = conteudo.splitlines()
+        self.assertEqual(cabecalho, 'id,nome,cpf,data_nasc,sexo,altura,peso')
+        self.assertIn(self.pessoa.cpf, linha)
+
+    def test_exportar_formato_invalido(self):
+        url = reverse('backend.pessoa:pessoa-exportar')
+        response = self.client.get(url, {'formato': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_estatisticas_conexoes(self):
+        response = self.client.get(reverse('backend.pessoa:pessoa-conexoes'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(response.data['modo'], ('sem_reuso', 'persistente', 'pool'))
+        self.assertGreaterEqual(response.data['conexoes_abertas'], 1)
 
     def test_calcular_peso_ideal(self):
         url = reverse('backend.pessoa:pessoa-peso-ideal', args=[self.pessoa.cpf])
@@ -94,6 +353,21 @@ class PessoaViewTest(TestCase):
         self.assertIn('status', response.data)
         self.assertIn('status_peso', response.data)
 
+    def test_calcular_peso_ideal_lote(self):
+        url = reverse('backend.pessoa:pessoa-peso-ideal-lote')
+        response = self.client.post(url, {'cpfs': ['00000000000', self.pessoa.cpf]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['encontrado'] for r in response.data], [False, True])
+        self.assertEqual(response.data[1]['status_peso'], 'abaixo')
+        self.assertIn('diferenca', response.data[1])
+
+    def test_calcular_peso_ideal_lote_sem_filtro(self):
+        url = reverse('backend.pessoa:pessoa-peso-ideal-lote')
+        response = self.client.post(url, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_calcular_peso_ideal_pessoa_nao_encontrada(self):
         url = reverse('backend.pessoa:pessoa-peso-ideal', args=['00000000000'])
         response = self.client.get(url)
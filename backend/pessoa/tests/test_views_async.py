@@ -0,0 +1,100 @@
+import gzip
+import json
+from datetime import date
+from unittest import mock
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+from ..models import Pessoa
+from ..cache import cache_pessoas
+from ..services import PessoaService
+
+
+class PessoaViewAsyncTest(TestCase):
+    def setUp(self):
+        cache_pessoas.limpar()
+        self.client = AsyncClient()
+        self.pessoa = Pessoa.objects.create(
+            nome='Maria Santos',
+            cpf='98765432100',
+            data_nasc=date(1992, 5, 15),
+            sexo='F',
+            altura=1.65,
+            peso=55.0
+        )
+
+    async def test_pesquisar_por_cpf(self):
+        url = reverse('backend.pessoa.async:pessoa-pesquisar', args=[self.pessoa.cpf])
+        response = await self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['nome'], 'Maria Santos')
+
+        response = await self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_pesquisar_por_cpf_nao_encontrado(self):
+        url = reverse('backend.pessoa.async:pessoa-pesquisar', args=['00000000000'])
+        response = await self.client.get(url)
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_listar_campos(self):
+        url = reverse('backend.pessoa.async:pessoa-listar')
+        response = await self.client.get(url, {'fields': 'cpf,status'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'cpf': self.pessoa.cpf, 'status': 'Abaixo do peso ideal'}])
+
+        response = await self.client.get(url, {'fields': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_listar_todos(self):
+        url = reverse('backend.pessoa.async:pessoa-listar')
+        response = await self.client.get(url, {'status_peso': 'abaixo'})
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual([p['cpf'] for p in dados['results']], [self.pessoa.cpf])
+        self.assertIsNone(dados['next'])
+
+        response = await self.client.get(
+            url, {'status_peso': 'abaixo'}, headers={'if-none-match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_calcular_peso_ideal(self):
+        url = reverse('backend.pessoa.async:pessoa-peso-ideal', args=[self.pessoa.cpf])
+        response = await self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['peso_ideal'], 57.77)
+
+        url = reverse('backend.pessoa.async:pessoa-peso-ideal', args=['00000000000'])
+        self.assertEqual((await self.client.get(url)).status_code, 404)
+
+    async def test_calcular_peso_ideal_excluida_durante_a_requisicao(self):
+        pessoa = await PessoaService.apesquisar_por_cpf(self.pessoa.cpf)
+        url = reverse('backend.pessoa.async:pessoa-peso-ideal', args=[self.pessoa.cpf])
+        # A segunda leitura já não encontra a pessoa
+        with mock.patch.object(PessoaService, 'apesquisar_por_cpf', mock.AsyncMock(side_effect=[pessoa, None])):
+            response = await self.client.get(url)
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_calcular_peso_ideal_lote(self):
+        url = reverse('backend.pessoa.async:pessoa-peso-ideal-lote')
+        response = await self.client.post(
+            url, {'cpfs': [self.pessoa.cpf, '00000000000']}, content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['encontrado'] for r in response.json()], [True, False])
+
+    async def test_exportar_gzip(self):
+        url = reverse('backend.pessoa.async:pessoa-exportar')
+        response = await self.client.get(url, {'gzip': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        conteudo = b''.join([parte async for parte in response.streaming_content])
+        registro = json.loads(gzip.decompress(conteudo))
+        self.assertEqual(registro['cpf'], self.pessoa.cpf)
@@ -5,9 +5,20 @@ app_name = 'backend.pessoa'
 
 urlpatterns = [
     path('criar/', views.criar_pessoa, name='pessoa-criar'),
+    path('criar-lote/', views.criar_lote, name='pessoa-criar-lote'),
+    path('sincronizar/', views.sincronizar, name='pessoa-sincronizar'),
     path('atualizar/<str:cpf>/', views.atualizar_pessoa, name='pessoa-atualizar'),
     path('excluir/<str:cpf>/', views.excluir_pessoa, name='pessoa-excluir'),
     path('pesquisar/<str:cpf>/', views.pesquisar_por_cpf, name='pessoa-pesquisar'),
     path('pesquisar/', views.pesquisar_todos, name='pessoa-listar'),
+    path('changes/', views.listar_mudancas, name='pessoa-mudancas'),
+    path('cache/', views.estatisticas_cache, name='pessoa-cache'),
+    path('conexoes/', views.estatisticas_conexoes, name='pessoa-conexoes'),
+    path('admissao/', views.estatisticas_admissao, name='pessoa-admissao'),
+    path('estatisticas/', views.estatisticas_populacao, name='pessoa-estatisticas'),
+    path('estatisticas/reconstruir/', views.reconstruir_estatisticas, name='pessoa-estatisticas-reconstruir'),
+    path('jobs/<int:id>/', views.consultar_tarefa, name='pessoa-tarefa'),
+    path('exportar/', views.exportar_pessoas, name='pessoa-exportar'),
+    path('peso-ideal/lote/', views.calcular_peso_ideal_lote, name='pessoa-peso-ideal-lote'),
     path('peso-ideal/<str:cpf>/', views.calcular_peso_ideal, name='pessoa-peso-ideal'),
 ] 
\ No newline at end of file
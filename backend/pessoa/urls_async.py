@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views_async
+
+app_name = 'backend.pessoa.async'
+
+urlpatterns = [
+    path('pesquisar/<str:cpf>/', views_async.pesquisar_por_cpf, name='pessoa-pesquisar'),
+    path('pesquisar/', views_async.pesquisar_todos, name='pessoa-listar'),
+    path('exportar/', views_async.exportar_pessoas, name='pessoa-exportar'),
+    path('peso-ideal/lote/', views_async.calcular_peso_ideal_lote, name='pessoa-peso-ideal-lote'),
+    path('peso-ideal/<str:cpf>/', views_async.calcular_peso_ideal, name='pessoa-peso-ideal'),
+]
@@ -1,12 +1,22 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from .models import Pessoa
-from .serializers import PessoaSerializer
+from .serializers import PessoaSerializer, PessoaParcialSerializer
 from .tasks import incluir_pessoa, alterar_pessoa, excluir_pessoa, pesquisar_pessoa, calcular_peso_ideal
-from .services import PessoaService
-from .dto import PessoaDTO, PesoIdealDTO
+from .services import COLUNAS_RESPOSTA, PessoaService
+from .condicional import condicional_listagem, condicional_pessoa, condicional_peso_ideal
+from .dto import PessoaDTO, PesoIdealDTO, como_dict
+from .normalizacao import normalizar_cpf
+from .paginacao import PaginacaoInvalida
+from .projecao import CamposInvalidos, normalizar_campos
+from .peso_ideal import DESCRICOES as STATUS_PESO
+from .exportacao import FORMATOS, gerar, comprimir_gzip
+from .metricas import CONTENT_TYPE as CONTENT_TYPE_METRICAS, registro_metricas
 import logging
 from datetime import datetime
 
@@ -25,9 +35,18 @@ def criar_pessoa(request):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        dto = PessoaDTO(**request.data)
+        # Dígitos verificadores conferidos aqui, uma única vez; o serviço e o
+        # modelo só normalizam o formato
+        dados = request.data.copy()
+        if 'cpf' in dados:
+            try:
+                dados['cpf'] = normalizar_cpf(dados['cpf'])
+            except ValueError as e:
+                return Response({"cpf": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        dto = PessoaDTO(**dados)
         pessoa = PessoaService.criar_pessoa(dto)
-        return Response(pessoa.__dict__, status=status.HTTP_201_CREATED)
+        return Response(como_dict(pessoa), status=status.HTTP_201_CREATED)
     except TypeError as e:
         error_msg = str(e)
         if "missing 1 required positional argument: 'nome'" in error_msg:
@@ -45,8 +64,73 @@ def criar_pessoa(request):
         logger.error(f"Erro ao criar pessoa: {error_msg}")
         return Response({"error": error_msg}, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['PUT'])
+@api_view(['POST'])
+def criar_lote(request):
+    itens = request.data
+    if not isinstance(itens, list):
+        return Response({"error": "O corpo deve ser uma lista de pessoas"}, status=status.HTTP_400_BAD_REQUEST)
+    maximo = getattr(settings, 'PESSOA_LOTE_MAXIMO', 10000)
+    if len(itens) > maximo:
+        return Response({"error": f"O lote deve ter no máximo {maximo} pessoas"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Lotes grandes, ou quando o cliente pede com Prefer: respond-async, vão
+        # para a fila: a resposta 202 aponta para o andamento da tarefa
+        if len(itens) >= getattr(settings, 'PESSOA_LOTE_ASSINCRONO', 1000) or _prefere_assincrono(request):
+            tarefa = PessoaService.enfileirar_lote(itens)
+            logger.info(f"Lote de {len(itens)} pessoas enfileirado na tarefa {tarefa.id}")
+            return _aceita(tarefa)
+        logger.info(f"Iniciando criação em lote de {len(itens)} pessoas")
+        relatorio = PessoaService.criar_lote(itens)
+        logger.info(f"Lote processado: {relatorio.criados} criadas, {relatorio.falhas} falhas")
+        return Response(
+            {
+                "criados": relatorio.criados,
+                "falhas": relatorio.falhas,
+                "resultados": [como_dict(r) for r in relatorio.resultados]
+            },
+            status=status.HTTP_201_CREATED if not relatorio.falhas else status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Erro ao criar lote de pessoas: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def sincronizar(request):
+    itens = request.data
+    if not isinstance(itens, list):
+        return Response({"error": "O corpo deve ser uma lista de pessoas"}, status=status.HTTP_400_BAD_REQUEST)
+    maximo = getattr(settings, 'PESSOA_LOTE_MAXIMO', 10000)
+    if len(itens) > maximo:
+        return Response({"error": f"O lote deve ter no máximo {maximo} pessoas"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        if len(itens) >= getattr(settings, 'PESSOA_LOTE_ASSINCRONO', 1000) or _prefere_assincrono(request):
+            tarefa = PessoaService.enfileirar_sincronizacao(itens)
+            logger.info(f"Sincronização de {len(itens)} pessoas enfileirada na tarefa {tarefa.id}")
+            return _aceita(tarefa)
+        resultado = PessoaService.sincronizar(itens)
+        logger.info(
+            f"Sincronização: {resultado.inseridas} inseridas, {resultado.atualizadas} atualizadas, "
+            f"{resultado.inalteradas} inalteradas, {resultado.falhas} falhas"
+        )
+        resposta = como_dict(resultado)
+        resposta['resultados'] = [como_dict(r) for r in resultado.resultados]
+        return Response(resposta, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Erro ao sincronizar pessoas: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+def _prefere_assincrono(request) -> bool:
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def _aceita(tarefa) -> Response:
+    response = Response(como_dict(tarefa), status=status.HTTP_202_ACCEPTED)
+    response['Location'] = reverse('backend.pessoa:pessoa-tarefa', args=[tarefa.id])
+    return response
+
+@api_view(['PUT', 'PATCH'])
 def atualizar_pessoa(request, cpf):
+    if request.method == 'PATCH':
+        return atualizar_parcial(request, cpf)
     try:
         # Verifica se a pessoa existe
         pessoa_existente = PessoaService.pesquisar_por_cpf(cpf)
@@ -70,7 +154,7 @@ def atualizar_pessoa(request, cpf):
             
             dto = PessoaDTO(**dados)
             pessoa = PessoaService.atualizar_pessoa(dto)
-            return Response(pessoa.__dict__, status=status.HTTP_200_OK)
+            return Response(como_dict(pessoa), status=status.HTTP_200_OK)
         except ValueError as e:
             error_msg = str(e)
             if "invalid date format" in error_msg.lower():
@@ -80,6 +164,21 @@ def atualizar_pessoa(request, cpf):
         logger.error(f"Erro ao atualizar pessoa: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+def atualizar_parcial(request, cpf):
+    serializer = PessoaParcialSerializer(data=request.data, partial=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.validated_data:
+        return Response({"error": "Nenhum campo para atualizar"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        pessoa = PessoaService.atualizar_parcial(cpf, serializer.validated_data)
+        if pessoa is None:
+            return Response({"error": "Pessoa não encontrada"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(como_dict(pessoa), status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar pessoa parcialmente: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['DELETE'])
 def excluir_pessoa(request, cpf):
     try:
@@ -91,35 +190,168 @@ def excluir_pessoa(request, cpf):
         logger.error(f"Erro ao excluir pessoa: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@condicional_pessoa
 @api_view(['GET'])
 def pesquisar_por_cpf(request, cpf):
     try:
+        # A entrada do cache tem a pessoa completa; ?fields= só recorta a resposta
+        campos = normalizar_campos(request.query_params.get('fields'), COLUNAS_RESPOSTA)
         pessoa = PessoaService.pesquisar_por_cpf(cpf)
         if pessoa:
-            return Response(pessoa.__dict__, status=status.HTTP_200_OK)
+            return Response(como_dict(pessoa, campos), status=status.HTTP_200_OK)
         return Response({"error": "Pessoa não encontrada"}, status=status.HTTP_404_NOT_FOUND)
+    except CamposInvalidos as e:
+        return Response({"fields": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Erro ao pesquisar pessoa: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@condicional_listagem
 @api_view(['GET'])
 def pesquisar_todos(request):
     try:
-        logger.info("Iniciando busca de todas as pessoas")
-        pessoas = PessoaService.listar_todos()
-        logger.info(f"Encontradas {len(pessoas)} pessoas")
-        return Response([p.__dict__ for p in pessoas], status=status.HTTP_200_OK)
+        logger.info("Iniciando busca paginada de pessoas")
+        status_peso = request.query_params.get('status_peso')
+        if status_peso and status_peso not in STATUS_PESO:
+            return Response(
+                {"status_peso": [f"Valor inválido. Use um de: {', '.join(STATUS_PESO)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # ?fields= reduz tanto as colunas lidas quanto a resposta
+        campos = normalizar_campos(request.query_params.get('fields'), COLUNAS_RESPOSTA)
+        pagina = PessoaService.listar_pagina(
+            cursor=request.query_params.get('cursor'),
+            limite=request.query_params.get('limite'),
+            status_peso=status_peso,
+            busca=request.query_params.get('q', '').strip(),
+            campos=campos
+        )
+        logger.info(f"Encontradas {len(pagina.resultados)} pessoas")
+        return Response({
+            "results": [como_dict(p, campos) for p in pagina.resultados],
+            "next": pagina.proximo,
+            "prev": pagina.anterior
+        }, status=status.HTTP_200_OK)
+    except CamposInvalidos as e:
+        return Response({"fields": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+    except PaginacaoInvalida as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Erro ao listar pessoas: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+def listar_mudancas(request):
+    try:
+        pagina = PessoaService.listar_mudancas(
+            cursor=request.query_params.get('since'),
+            limite=request.query_params.get('limite')
+        )
+        return Response({
+            "results": [como_dict(p) for p in pagina.alteradas],
+            "deleted": [como_dict(e) for e in pagina.excluidas],
+            "next": pagina.proximo,
+            "has_more": pagina.ha_mais
+        }, status=status.HTTP_200_OK)
+    except PaginacaoInvalida as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Erro ao listar mudanças: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def exportar_pessoas(request):
+    formato = request.query_params.get('formato', 'ndjson')
+    if formato not in FORMATOS:
+        return Response(
+            {"formato": [f"Formato inválido. Use um de: {', '.join(FORMATOS)}."]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    compactar = request.query_params.get('gzip') in ('1', 'true')
+
+    logger.info(f"Iniciando exportação de pessoas em {formato}")
+    linhas = PessoaService.exportar_todos()
+    conteudo = gerar(formato, linhas)
+    nome_arquivo = f"pessoas.{formato}"
+    content_type = FORMATOS[formato]
+    if compactar:
+        conteudo = comprimir_gzip(conteudo)
+        nome_arquivo += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+@condicional_peso_ideal
 @api_view(['GET'])
 def calcular_peso_ideal(request, cpf):
     try:
         resultado = PessoaService.calcular_peso_ideal(cpf)
-        return Response(resultado.__dict__, status=status.HTTP_200_OK)
+        return Response(como_dict(resultado), status=status.HTTP_200_OK)
     except ObjectDoesNotExist:
         return Response({"error": "Pessoa não encontrada"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.error(f"Erro ao calcular peso ideal: {str(e)}")
-        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST) 
+
+@api_view(['POST'])
+def calcular_peso_ideal_lote(request):
+    cpfs = request.data.get('cpfs') if isinstance(request.data, dict) else None
+    sexo = request.data.get('sexo') if isinstance(request.data, dict) else None
+    if cpfs is None and not sexo:
+        return Response({"error": "Informe a lista 'cpfs' ou o filtro 'sexo'"}, status=status.HTTP_400_BAD_REQUEST)
+    if cpfs is not None and (not isinstance(cpfs, list) or not all(isinstance(c, str) for c in cpfs)):
+        return Response({"cpfs": ["Deve ser uma lista de CPFs."]}, status=status.HTTP_400_BAD_REQUEST)
+    maximo = getattr(settings, 'PESSOA_LOTE_MAXIMO', 10000)
+    if cpfs is not None and len(cpfs) > maximo:
+        return Response({"error": f"O lote deve ter no máximo {maximo} CPFs"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        resultados = PessoaService.calcular_peso_ideal_lote(
+            cpfs=cpfs, sexo=sexo, limite=request.data.get('limite')
+        )
+        return Response([como_dict(r) for r in resultados], status=status.HTTP_200_OK)
+    except PaginacaoInvalida as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Erro ao calcular peso ideal em lote: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def estatisticas_cache(request):
+    return Response(PessoaService.estatisticas_cache(), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def estatisticas_conexoes(request):
+    return Response(PessoaService.estatisticas_conexoes(), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def estatisticas_admissao(request):
+    return Response(PessoaService.estatisticas_admissao(), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def estatisticas_populacao(request):
+    try:
+        return Response(como_dict(PessoaService.estatisticas_populacao()), status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Erro ao consultar estatísticas da população: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def reconstruir_estatisticas(request):
+    try:
+        return _aceita(PessoaService.enfileirar_reconstrucao_estatisticas())
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar reconstrução das estatísticas: {str(e)}")
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def consultar_tarefa(request, id):
+    tarefa = PessoaService.consultar_tarefa(id)
+    if tarefa is None:
+        return Response({"error": "Tarefa não encontrada"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(como_dict(tarefa), status=status.HTTP_200_OK)
+
+def metricas(request):
+    # Formato texto do Prometheus; fora do DRF para não passar pela negociação de conteúdo
+    return HttpResponse(registro_metricas.exportar(), content_type=CONTENT_TYPE_METRICAS)
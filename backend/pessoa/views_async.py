@@ -0,0 +1,152 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .condicional import aplicar_validadores, resposta_condicional, variante_campos, versao_listagem, versao_pessoa
+from .dto import como_dict
+from .exportacao import FORMATOS, acomprimir_gzip, agerar
+from .paginacao import PaginacaoInvalida
+from .projecao import CamposInvalidos, normalizar_campos
+from .peso_ideal import DESCRICOES as STATUS_PESO
+from .renderizadores import para_json
+from .services import COLUNAS_RESPOSTA, PessoaService
+
+logger = logging.getLogger(__name__)
+
+# Versões nativamente assíncronas dos endpoints de leitura, para servidores
+# ASGI: enquanto a consulta ou o cliente lento não respondem, a requisição
+# não ocupa uma thread
+
+
+def _json(dados, status=200):
+    # Mesmo serializador do renderer das views síncronas
+    return HttpResponse(para_json(dados), status=status, content_type='application/json')
+
+
+@require_GET
+async def pesquisar_por_cpf(request, cpf):
+    try:
+        campos = normalizar_campos(request.GET.get('fields'), COLUNAS_RESPOSTA)
+        pessoa = await PessoaService.apesquisar_por_cpf(cpf)
+        if not pessoa:
+            return _json({"error": "Pessoa não encontrada"}, status=404)
+        etag, ultima_alteracao = versao_pessoa(pessoa)
+        etag = variante_campos(request, f"pessoa-{etag}")
+        return (
+            resposta_condicional(request, etag, ultima_alteracao)
+            or aplicar_validadores(_json(como_dict(pessoa, campos)), etag, ultima_alteracao)
+        )
+    except CamposInvalidos as e:
+        return _json({"fields": [str(e)]}, status=400)
+    except Exception as e:
+        logger.error(f"Erro ao pesquisar pessoa: {str(e)}")
+        return _json({"error": str(e)}, status=400)
+
+
+@require_GET
+async def pesquisar_todos(request):
+    try:
+        status_peso = request.GET.get('status_peso')
+        if status_peso and status_peso not in STATUS_PESO:
+            return _json({"status_peso": [f"Valor inválido. Use um de: {', '.join(STATUS_PESO)}."]}, status=400)
+        campos = normalizar_campos(request.GET.get('fields'), COLUNAS_RESPOSTA)
+        # A página só é consultada quando o cliente não tem a versão atual
+        etag, ultima_alteracao = versao_listagem(request, *await PessoaService.amarca_dagua())
+        nao_modificada = resposta_condicional(request, etag, ultima_alteracao)
+        if nao_modificada:
+            return nao_modificada
+        pagina = await PessoaService.alistar_pagina(
+            cursor=request.GET.get('cursor'),
+            limite=request.GET.get('limite'),
+            status_peso=status_peso,
+            busca=request.GET.get('q', '').strip(),
+            campos=campos
+        )
+        return aplicar_validadores(_json({
+            "results": [como_dict(p, campos) for p in pagina.resultados],
+            "next": pagina.proximo,
+            "prev": pagina.anterior
+        }), etag, ultima_alteracao)
+    except CamposInvalidos as e:
+        return _json({"fields": [str(e)]}, status=400)
+    except PaginacaoInvalida as e:
+        return _json({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Erro ao listar pessoas: {str(e)}")
+        return _json({"error": str(e)}, status=400)
+
+
+@require_GET
+async def calcular_peso_ideal(request, cpf):
+    try:
+        # Validadores antes do cálculo, como no condition da view síncrona: uma
+        # pessoa inexistente (ou excluída entre as duas leituras) responde 404
+        validadores = versao_pessoa(await PessoaService.apesquisar_por_cpf(cpf))
+        if validadores is None:
+            return _json({"error": "Pessoa não encontrada"}, status=404)
+        etag, ultima_alteracao = f"peso-ideal-{validadores[0]}", validadores[1]
+        condicional = resposta_condicional(request, etag, ultima_alteracao)
+        if condicional is not None:
+            return condicional
+        # A segunda leitura é atendida pelo cache de CPF
+        resultado = await PessoaService.acalcular_peso_ideal(cpf)
+        return aplicar_validadores(_json(como_dict(resultado)), etag, ultima_alteracao)
+    except ObjectDoesNotExist:
+        return _json({"error": "Pessoa não encontrada"}, status=404)
+    except Exception as e:
+        logger.error(f"Erro ao calcular peso ideal: {str(e)}")
+        return _json({"error": str(e)}, status=400)
+
+
+@csrf_exempt
+@require_POST
+async def calcular_peso_ideal_lote(request):
+    try:
+        dados = json.loads(request.body or b'{}')
+    except ValueError:
+        return _json({"error": "JSON inválido"}, status=400)
+    cpfs = dados.get('cpfs') if isinstance(dados, dict) else None
+    sexo = dados.get('sexo') if isinstance(dados, dict) else None
+    if cpfs is None and not sexo:
+        return _json({"error": "Informe a lista 'cpfs' ou o filtro 'sexo'"}, status=400)
+    if cpfs is not None and (not isinstance(cpfs, list) or not all(isinstance(c, str) for c in cpfs)):
+        return _json({"cpfs": ["Deve ser uma lista de CPFs."]}, status=400)
+    maximo = getattr(settings, 'PESSOA_LOTE_MAXIMO', 10000)
+    if cpfs is not None and len(cpfs) > maximo:
+        return _json({"error": f"O lote deve ter no máximo {maximo} CPFs"}, status=400)
+    try:
+        resultados = await PessoaService.acalcular_peso_ideal_lote(
+            cpfs=cpfs, sexo=sexo, limite=dados.get('limite')
+        )
+        return _json([como_dict(r) for r in resultados])
+    except PaginacaoInvalida as e:
+        return _json({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Erro ao calcular peso ideal em lote: {str(e)}")
+        return _json({"error": str(e)}, status=400)
+
+
+@require_GET
+async def exportar_pessoas(request):
+    formato = request.GET.get('formato', 'ndjson')
+    if formato not in FORMATOS:
+        return _json({"formato": [f"Formato inválido. Use um de: {', '.join(FORMATOS)}."]}, status=400)
+    compactar = request.GET.get('gzip') in ('1', 'true')
+
+    logger.info(f"Iniciando exportação assíncrona de pessoas em {formato}")
+    conteudo = agerar(formato, PessoaService.aexportar_todos())
+    nome_arquivo = f"pessoas.{formato}"
+    content_type = FORMATOS[formato]
+    if compactar:
+        conteudo = acomprimir_gzip(conteudo)
+        nome_arquivo += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
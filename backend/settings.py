@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,12 +38,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'backend.pessoa',
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir a requisição inteira
+    'backend.pessoa.metricas.MetricasMiddleware',
+    # Recusa com 503 o que passar dos limites, antes de gastar uma conexão
+    'backend.pessoa.admissao.AdmissaoMiddleware',
+    # Antes de qualquer leitura: decide entre réplica e primário
+    'backend.pessoa.roteador.PrimarioMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -79,14 +87,65 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'pessoa_db',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'pessoa_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
     }
 }
 
+# Reuso de conexões, configurável por ambiente:
+# - DB_POOL=1: pool do psycopg 3 (OPTIONS["pool"]), com DB_POOL_MIN/DB_POOL_MAX
+#   conexões por processo e DB_POOL_TIMEOUT segundos de espera por uma conexão livre;
+# - caso contrário, conexões persistentes por DB_CONN_MAX_AGE segundos (0 desliga),
+#   verificadas antes do reuso por CONN_HEALTH_CHECKS. Só no WSGI: sob ASGI
+#   (backend/asgi.py define PESSOA_ASGI) o ORM roda em threads que não recebem os
+#   sinais de início e fim da requisição, e as conexões persistentes ficariam
+#   abertas sem dono. Lá vale sempre 0; para reusar conexões, DB_POOL=1.
+if os.environ.get('DB_POOL', '').lower() in ('1', 'true'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = 0 if os.environ.get('PESSOA_ASGI') else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Réplicas de leitura: DB_REPLICAS=host1,host2:5433 cria uma conexão por réplica
+# (replica_1, replica_2, ...) com as credenciais do primário. As leituras do app
+# pessoa vão para uma delas, sorteada; as escritas e quem escreveu há menos de
+# PESSOA_PRIMARIO_JANELA segundos (cookie pessoa_primario) usam o primário.
+# Sem réplicas, tudo continua no default
+PESSOA_REPLICAS = []
+for numero, endereco in enumerate(filter(None, (e.strip() for e in os.environ.get('DB_REPLICAS', '').split(','))), 1):
+    host, _, porta = endereco.partition(':')
+    DATABASES[f'replica_{numero}'] = {**DATABASES['default'], 'HOST': host, 'PORT': porta or DATABASES['default']['PORT']}
+    PESSOA_REPLICAS.append(f'replica_{numero}')
+PESSOA_PRIMARIO_JANELA = float(os.environ.get('PESSOA_PRIMARIO_JANELA', 5))
+
+# Tabela de pessoas fragmentada (opcional): DB_FRAGMENTOS=host1,host2 cria os
+# bancos fragmento_1, fragmento_2, ... e distribui as pessoas entre o default e
+# eles pelo hash do CPF. Novos fragmentos entram sempre no fim da lista, seguidos
+# de manage.py rebalance_pessoa_shards. Listagens e estatísticas consultam os
+# fragmentos em paralelo com até PESSOA_FRAGMENTOS_THREADS threads
+PESSOA_FRAGMENTOS = []
+for numero, endereco in enumerate(filter(None, (e.strip() for e in os.environ.get('DB_FRAGMENTOS', '').split(','))), 1):
+    host, _, porta = endereco.partition(':')
+    DATABASES[f'fragmento_{numero}'] = {**DATABASES['default'], 'HOST': host, 'PORT': porta or DATABASES['default']['PORT']}
+    PESSOA_FRAGMENTOS.append(f'fragmento_{numero}')
+if PESSOA_FRAGMENTOS:
+    PESSOA_FRAGMENTOS.insert(0, 'default')
+PESSOA_FRAGMENTOS_THREADS = 8
+# O roteamento por fragmento vem antes do das réplicas
+DATABASE_ROUTERS = ['backend.pessoa.fragmentos.RoteadorFragmentos', 'backend.pessoa.roteador.RoteadorReplicas']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -151,6 +210,11 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+# Permite que o frontend leia os validadores das respostas condicionais
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'last-modified',
+]
 
 # Configuração do CSRF
 CSRF_TRUSTED_ORIGINS = [
@@ -183,3 +247,73 @@ LOGGING = {
         },
     },
 }
+
+# Respostas JSON serializadas com orjson, que converte datas e floats nativamente
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.pessoa.renderizadores.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Configuração da paginação por cursor da listagem de pessoas
+PESSOA_LIMITE_PAGINA_PADRAO = 50
+PESSOA_LIMITE_PAGINA_MAXIMO = 500
+
+# Tamanho do bloco lido pelo cursor do servidor na exportação
+PESSOA_EXPORTACAO_CHUNK = 2000
+
+# Criação em lote: máximo de pessoas por requisição e tamanho de cada INSERT
+PESSOA_LOTE_MAXIMO = 10000
+PESSOA_LOTE_BATCH_SIZE = 1000
+
+# Fila de tarefas no banco (manage.py run_pessoa_worker): lotes com pelo menos
+# PESSOA_LOTE_ASSINCRONO pessoas respondem 202 e são gravados pelo trabalhador.
+# Cada tarefa tem até PESSOA_TAREFA_TENTATIVAS tentativas, com espera inicial de
+# PESSOA_TAREFA_ESPERA segundos dobrando a cada falha; um trabalhador que não der
+# sinal de vida em PESSOA_TAREFA_RESERVA segundos perde a tarefa para outro
+PESSOA_LOTE_ASSINCRONO = 1000
+PESSOA_TAREFA_TENTATIVAS = 3
+PESSOA_TAREFA_ESPERA = 5
+PESSOA_TAREFA_RESERVA = 300
+
+# Feed de mudanças (/changes/): só entrega escritas com mais de
+# PESSOA_MUDANCAS_ATRASO segundos, para que uma transação lenta não confirme
+# uma alteração atrás do cursor de um cliente
+PESSOA_MUDANCAS_ATRASO = 5
+
+# Controle de admissão da API, por processo: até 'concorrencia' requisições de
+# cada classe em atendimento e até 'fila' esperando por no máximo 'espera'
+# segundos; o excedente recebe 503 com Retry-After de PESSOA_ADMISSAO_RETRY_AFTER
+# segundos. As pesadas são listagem, busca, exportação, lotes, sincronização e
+# o feed de mudanças. Com vários workers, o limite total é o de cada processo
+# vezes o número de workers e deve caber no pool de conexões (DB_POOL_MAX).
+# PESSOA_ADMISSAO_TAXA = (requisições por segundo, rajada) limita cada cliente,
+# identificado por request.META[PESSOA_ADMISSAO_CLIENTE], com 429
+PESSOA_ADMISSAO = {
+    'pontual': {
+        'concorrencia': int(os.environ.get('PESSOA_ADMISSAO_PONTUAL', 32)),
+        'fila': int(os.environ.get('PESSOA_ADMISSAO_PONTUAL_FILA', 64)),
+        'espera': 0.5,
+    },
+    'pesada': {
+        'concorrencia': int(os.environ.get('PESSOA_ADMISSAO_PESADA', 4)),
+        'fila': int(os.environ.get('PESSOA_ADMISSAO_PESADA_FILA', 8)),
+        'espera': 2.0,
+    },
+}
+PESSOA_ADMISSAO_RETRY_AFTER = 1
+PESSOA_ADMISSAO_TAXA = None
+PESSOA_ADMISSAO_CLIENTE = 'REMOTE_ADDR'
+
+# Cache de leitura por CPF: LRU local ao processo e, opcionalmente, um alias
+# de CACHES compartilhado entre os processos (ex.: Redis ou memcached)
+PESSOA_CACHE_TAMANHO_LOCAL = 10000
+PESSOA_CACHE_TTL = 30
+PESSOA_CACHE_ALIAS = None
+
+# Métricas em /metrics: com vários workers (gunicorn), cada processo grava um
+# instantâneo em PESSOA_METRICAS_DIR a cada PESSOA_METRICAS_INTERVALO segundos
+# e o /metrics soma os de todos. Limpe o diretório ao reiniciar o serviço.
+PESSOA_METRICAS_DIR = os.environ.get('PESSOA_METRICAS_DIR') or None
+PESSOA_METRICAS_INTERVALO = float(os.environ.get('PESSOA_METRICAS_INTERVALO', 5))
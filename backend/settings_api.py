@@ -0,0 +1,45 @@
+"""
+Perfil só-API do backend: os mesmos ajustes de backend.settings, sem admin,
+sessões, autenticação, mensagens, CSRF, clickjacking e templates.
+
+Para os workers que atendem apenas /api/pessoa/ e /metrics:
+    DJANGO_SETTINGS_MODULE=backend.settings_api gunicorn backend.wsgi
+Migrações e o admin continuam no perfil completo (backend.settings).
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+# Apps e middlewares que a API não usa: as views são function-based do DRF,
+# sem login nem sessão, e isentas de CSRF
+APPS_SO_PAINEL = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+MIDDLEWARE_SO_PAINEL = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in APPS_SO_PAINEL]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in MIDDLEWARE_SO_PAINEL]
+
+ROOT_URLCONF = 'backend.urls_api'
+TEMPLATES = []
+
+# Sem o app auth: nenhum autenticador e request.user None; só JSON, sem a
+# API navegável (que precisa de templates)
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['backend.pessoa.renderizadores.OrjsonRenderer'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
+from backend.pessoa.views import metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metricas, name='metricas'),
+    path('api/pessoa/async/', include('backend.pessoa.urls_async', namespace='backend.pessoa.async')),
     path('api/pessoa/', include('backend.pessoa.urls', namespace='backend.pessoa')),
 ]
@@ -0,0 +1,12 @@
+"""
+Rotas do perfil só-API (backend.settings_api): as mesmas de backend.urls,
+sem o admin.
+"""
+from django.urls import path, include
+from backend.pessoa.views import metricas
+
+urlpatterns = [
+    path('metrics', metricas, name='metricas'),
+    path('api/pessoa/async/', include('backend.pessoa.urls_async', namespace='backend.pessoa.async')),
+    path('api/pessoa/', include('backend.pessoa.urls', namespace='backend.pessoa')),
+]
@@ -75,16 +75,21 @@ describe('PessoaService', () => {
     req.flush(mockPessoa);
   });
 
-  it('should list all people', () => {
-    const mockPessoas = [mockPessoa];
+  it('should list all people across pages', () => {
+    const outraPessoa = { ...mockPessoa, nome: 'Maria Souza', cpf: '98765432100' };
 
     service.pesquisarTodos().subscribe(response => {
-      expect(response).toEqual(mockPessoas);
+      expect(response).toEqual([mockPessoa, outraPessoa]);
     });
 
-    const req = httpMock.expectOne(`${environment.apiUrl}/pessoa/pesquisar/`);
-    expect(req.request.method).toBe('GET');
-    req.flush(mockPessoas);
+    const url = `${environment.apiUrl}/pessoa/pesquisar/`;
+    const primeira = httpMock.expectOne(req => req.url === url && !req.params.has('cursor'));
+    expect(primeira.request.method).toBe('GET');
+    expect(primeira.request.params.get('limite')).toBe('500');
+    primeira.flush({ results: [mockPessoa], next: 'c2', prev: null });
+
+    const segunda = httpMock.expectOne(req => req.url === url && req.params.get('cursor') === 'c2');
+    segunda.flush({ results: [outraPessoa], next: null, prev: 'c1' });
   });
 
   it('should calculate ideal weight', () => {
@@ -1,6 +1,7 @@
 import { HttpClient } from '@angular/common/http';
 import { Injectable } from '@angular/core';
-import { Observable } from 'rxjs';
+import { EMPTY, Observable } from 'rxjs';
+import { expand, reduce } from 'rxjs/operators';
 import { environment } from '../../environments/environment';
 import { Pessoa } from '../models/pessoa.model';
 
@@ -10,6 +11,14 @@ interface PesoIdealResponse {
   status_peso: 'adequado' | 'acima' | 'abaixo';
 }
 
+export interface PaginaPessoa {
+  results: Pessoa[];
+  next: string | null;
+  prev: string | null;
+}
+
+const LIMITE_MAXIMO = 500;
+
 @Injectable({
   providedIn: 'root'
 })
@@ -34,8 +43,23 @@ export class PessoaService {
     return this.http.get<Pessoa>(`${this.apiUrl}/pesquisar/${cpf}/`);
   }
 
+  // Segue os cursores até a última página, com o maior limite aceito pela API
   pesquisarTodos(): Observable<Pessoa[]> {
-    return this.http.get<Pessoa[]>(`${this.apiUrl}/pesquisar/`);
+    return this.pesquisarPagina(null, LIMITE_MAXIMO).pipe(
+      expand(pagina => pagina.next ? this.pesquisarPagina(pagina.next, LIMITE_MAXIMO) : EMPTY),
+      reduce((pessoas: Pessoa[], pagina: PaginaPessoa) => pessoas.concat(pagina.results), [])
+    );
+  }
+
+  pesquisarPagina(cursor?: string | null, limite?: number): Observable<PaginaPessoa> {
+    const params: Record<string, string> = {};
+    if (cursor) {
+      params['cursor'] = cursor;
+    }
+    if (limite) {
+      params['limite'] = String(limite);
+    }
+    return this.http.get<PaginaPessoa>(`${this.apiUrl}/pesquisar/`, { params });
   }
 
   calcularPesoIdeal(cpf: string): Observable<PesoIdealResponse> {